@@ -76,11 +76,12 @@ def draw_avg_reply_users_count(data, channel='Random'):
     plt.xticks(size=14); plt.yticks(size=14);
     plt.show()
 
-def draw_wordcloud(msg_content, week):    
-    # word cloud visualization
-    allWords = ' '.join([twts for twts in msg_content])
+def draw_wordcloud(frequencies, week):
+    """word cloud of a {word: count} dict, as WordFrequencies keeps them; message texts are counted first"""
+    if not isinstance(frequencies, dict):
+        frequencies = word_counts(frequencies)
     wordCloud = WordCloud(background_color='#975429', width=500, height=300, random_state=21, max_words=500, mode='RGBA',
-                            max_font_size=140, stopwords=stopwords.words('english')).generate(allWords)
+                            max_font_size=140).generate_from_frequencies(frequencies)
     plt.figure(figsize=(15, 7.5))
     plt.imshow(wordCloud, interpolation="bilinear")
     plt.axis('off')
@@ -104,8 +105,10 @@ if rpath not in sys.path:
 import os
 import pandas as pd
 import glob
-from src.loader import SlackDataLoader, slack_parser, parse_slack_reaction
+from src.loader import SlackDataLoader, slack_parser, parse_slack_reaction, parallel_slack_parser
+from src.extract import categorize
 from src.utils import get_messages_dict
+from src.word_frequencies import word_counts
 
 # Provide the path to the Slack exported data folder
 slack_data_path = os.path.abspath('../anonymized')
@@ -134,19 +137,25 @@ parsed = slack_parser('../anonymized/all-community-building/')
 parsed['channel']
 
 # %%
-def create_combined_dataframe(channel_names):
+def create_combined_dataframe(channel_names, workers=None, cache_dir=None, typed=False):
+    """parse all the channels into one dataframe, in parallel unless workers=1,
+    or from the parquet cache of src.cache when a cache_dir is given.
+    typed gives the memory-optimized dtypes of slack_parser"""
     data_frames = []
     ROOT_DIR = '../anonymized/'
 
+    if cache_dir is None and workers != 1:
+        return parallel_slack_parser(ROOT_DIR, channel_names, workers=workers, typed=typed)
+
     for channel in channel_names:
         channel_path = ROOT_DIR + channel +  '/'
-        channel_dataframe = slack_parser(channel_path)
+        channel_dataframe = slack_parser(channel_path, cache_dir=cache_dir, typed=typed)
         data_frames.append(channel_dataframe)
         
 
     combined_data = pd.concat(data_frames, ignore_index=True)
 
-    return combined_data
+    return categorize(combined_data) if typed else combined_data
 
 combined_data = create_combined_dataframe(channel_names)  
 
@@ -157,63 +166,49 @@ combined_data = create_combined_dataframe(channel_names)
 # Below are some useful questions to answer. Feel free to explore to answer other interesting questions that may be of help to get insight about student's behaviour, need, and future performance 
 
 # %%
-def get_top_10_users_by_reply(df):
-     # Get value counts of 'sender_id' column
-    user_reply_counts = df['sender_name'].value_counts()
-
-    # Get the top 10 users by reply count
-    top_10_users = user_reply_counts.head(10)
+from src.ingest import refresh_all
 
-    return top_10_users
+# the engagement cube, term sketches and word frequencies, refreshed in one pass
+# that only reads the day files added since the last one
+stores, _ = refresh_all(slack_data_path, ['engagement', 'term_sketches', 'word_frequencies'], os.path.abspath('..'))
 
-def get_top_repliers():
-    return get_bottom_10_users_by_reply(combined_data).reset_index()
+# message, reply, reaction, mention and link counts per (channel, day, user)
+engagement = stores['engagement']
+user_directory = slack_data_loader.user_directory
 
-def get_bottom_10_users_by_reply(df):
-    # Get value counts of 'sender_id' column
-    user_reply_counts = df['sender_name'].value_counts()
+# %%
+def get_top_10_users_by_reply(cube):
+    # Top 10 users by number of thread replies
+    return cube.leaderboard('replies', 10, users=user_directory)
 
-    # Get the bottom 10 users by reply count
-    bottom_10_users = user_reply_counts.tail(10)
+def get_top_repliers():
+    bottom_10_users = get_bottom_10_users_by_reply(engagement)
+    return bottom_10_users.rename('sender_name').rename_axis(None).reset_index()
 
-    return bottom_10_users
+def get_bottom_10_users_by_reply(cube):
+    # Bottom 10 users by number of thread replies, among those with any
+    return cube.leaderboard('replies', 10, bottom=True, users=user_directory)
 
 # %%
-get_top_10_users_by_reply(combined_data)
+get_top_10_users_by_reply(engagement)
 
 # %%
-get_bottom_10_users_by_reply(combined_data)
+get_bottom_10_users_by_reply(engagement)
 
 # %%
-def get_top_users_by_message_count(df):
-    # Group the DataFrame by 'sender_name' and calculate the count of unique messages for each user
-    user_message_counts = df.groupby('sender_name')['msg_content'].nunique()
-
-    # Sort the user_message_counts Series in descending order
-    sorted_user_message_counts = user_message_counts.sort_values(ascending=False)
-
-    # Get the top users by message count
-    top_users = sorted_user_message_counts.head(10)
+def get_top_users_by_message_count(cube):
+    # Top 10 users by number of messages, thread replies included
+    return cube.leaderboard('messages', 10, users=user_directory)
 
-    return top_users
-
-def get_bottom_users_by_message_count(df):
-    # Group the DataFrame by 'sender_name' and calculate the count of unique messages for each user
-    user_message_counts = df.groupby('sender_name')['msg_content'].nunique()
-
-    # Sort the user_message_counts Series in ascending order
-    sorted_user_message_counts = user_message_counts.sort_values(ascending=True)
-
-    # Get the bottom users by message count
-    bottom_users = sorted_user_message_counts.head(10)
-
-    return bottom_users
+def get_bottom_users_by_message_count(cube):
+    # Bottom 10 users by number of messages, fewest first
+    return cube.leaderboard('messages', 10, bottom=True, users=user_directory).iloc[::-1]
 
 # %%
-get_top_users_by_message_count(combined_data)
+get_top_users_by_message_count(engagement)
 
 # %%
-get_bottom_users_by_message_count(combined_data)
+get_bottom_users_by_message_count(engagement)
 
 # %%
 def get_top_10_messages_by_replies(df):
@@ -231,8 +226,8 @@ get_top_10_messages_by_replies(combined_data)
 
 # %%
 #plot of highest number of reply counts per user
-def plot_highest_replies_per_user(data):
-    grouped_df = data.groupby('sender_name')['reply_count'].sum()
+def plot_highest_replies_per_user(cube):
+    grouped_df = cube.rollup('user', 'replies_received', users=user_directory)
     grouped_df = grouped_df.sort_values(ascending=False)
     grouped_df.plot(kind='bar', figsize=(15, 7.5))
     
@@ -241,12 +236,12 @@ def plot_highest_replies_per_user(data):
     plt.ylabel('Number of replies')
     plt.show()
 
-plot_highest_replies_per_user(combined_data)
+plot_highest_replies_per_user(engagement)
 
 # %%
 # Visualize reply counts per user per channel
-def reply_per_user_per_channel(data):
-    grouped_df = data.groupby(['channel', 'sender_name'])['reply_count'].sum().unstack()
+def reply_per_user_per_channel(cube):
+    grouped_df = cube.rollup(['channel', 'user'], 'replies_received', users=user_directory).unstack()
     grouped_df.plot(kind='bar', figsize=(15, 7.5), stacked=True)
     
     plt.title('Reply Counts per User per Channel')
@@ -256,7 +251,46 @@ def reply_per_user_per_channel(data):
     plt.show()
 
     
-reply_per_user_per_channel(combined_data)
+reply_per_user_per_channel(engagement)
+
+# %%
+from src.sketches import heavy_hitters
+
+def get_top_items_streaming(what='senders', n=10, capacity=200):
+    """value_counts().head(n) of senders, reactions, emojis, links or domains,
+    streamed over the export with at most capacity counters per channel;
+    each count may be overestimated by at most (total count) / capacity"""
+    return heavy_hitters(slack_data_path, what, capacity).value_counts(n, name=what)
+
+get_top_items_streaming('senders')
+
+# %%
+term_sketches = stores['term_sketches']
+
+def draw_sketched_wordcloud(sketches, channels=None, start=None, end=None, title='all channels'):
+    """word cloud of the estimated word counts of some channels and days"""
+    frequencies = sketches.frequencies('words', 500, channels, start, end, exclude=stopwords.words('english'))
+    draw_wordcloud(frequencies, title)
+
+def draw_top_terms(sketches, kind='emojis', n=10, channel=None):
+    """bar chart of the most used emojis or the most shared link domains"""
+    sketches.top(kind, n, None if channel is None else [channel]).plot.bar(figsize=(15, 7.5))
+    plt.title(f"Most used {kind} in #{channel or 'all'} channels", size=20, fontweight='bold')
+    plt.xlabel(kind.capitalize(), size=18); plt.ylabel("Estimated count", size=18);
+    plt.xticks(size=14); plt.yticks(size=14);
+    plt.show()
+
+draw_top_terms(term_sketches, 'domains')
+
+# %%
+from src.active_users import week_folder
+
+word_frequencies = stores['word_frequencies']
+
+# one groupby for the twelve all-weekN channels, then a dict lookup per cloud
+weekly_clouds = word_frequencies.clouds(week_folder, n=500)
+for week in sorted(weekly_clouds, key=lambda week: int(week.split()[-1])):
+    draw_wordcloud(weekly_clouds[week], week)
 
 # %%
 get_top_20_user(combined_data)
@@ -285,6 +319,16 @@ get_top_20_user(combined_data)
 
 # %%
 # Model topics mentioned in the channel
+from src.topics import topic_trends
+
+def draw_topic_trends(folder='../.slack_topics', channel=None, freq='week'):
+    """topic prevalence over time, from the table kept by python -m src.topics"""
+    trends = topic_trends(folder, freq, channels=None if channel is None else [channel], by_channel=False)
+    trends.set_index('period').drop(columns='n_docs').plot(figsize=(15, 7.5))
+    plt.title(f"Topic prevalence per {freq} in #{channel or 'all'} channels", size=20, fontweight='bold')
+    plt.xlabel(freq.capitalize(), size=18); plt.ylabel("Mean topic weight", size=18);
+    plt.xticks(size=14); plt.yticks(size=14);
+    plt.show()
 
 # %%
 # What are the topics that got the most reactions?
@@ -0,0 +1,77 @@
+"""Compare the JSON decoding backends of src.decode on a whole slack export.
+
+For every installed backend the day files are decoded (and then run
+through src.extract), and the best time, throughput and memory held by
+the decoded messages are reported.
+
+Usage:
+    python benchmarks/bench_json_backends.py --path anonymized
+
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+rpath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if rpath not in sys.path:
+    sys.path.insert(0, rpath)
+
+from src.loader import SlackDataLoader, list_day_files, open_export_file
+from src.decode import available_backends, decode_day
+from src.extract import extract_day
+
+
+def read_day_files(root_dir):
+    """raw bytes of every day file of the export"""
+    raws = []
+    for channel in SlackDataLoader(root_dir).get_channels():
+        channel_path = os.path.join(root_dir, channel['name'])
+        for day_file in list_day_files(channel_path):
+            with open_export_file(os.path.join(channel_path, day_file)) as f:
+                raws.append(f.read())
+    return raws
+
+
+def best_time(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def held_memory(raws, backend):
+    """bytes still allocated once every day file is decoded and kept"""
+    tracemalloc.start()
+    days = [decode_day(raw, backend) for raw in raws]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del days
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the JSON decoding backends')
+    parser.add_argument('--path', default='anonymized', help='slack exported data folder or ZIP file')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per backend')
+    args = parser.parse_args()
+
+    raws = read_day_files(args.path)
+    size = sum(map(len, raws))
+    n_messages = sum(len(decode_day(raw, 'json')) for raw in raws)
+    print(f"{len(raws)} day files, {size / 1e6:.1f} MB, {n_messages} messages")
+
+    print(f"{'backend':>8} {'decode':>9} {'MB/s':>7} {'msgs/s':>10} {'+extract':>9} {'bytes/msg':>10}")
+    for backend in available_backends():
+        decode = best_time(lambda: [decode_day(raw, backend) for raw in raws], args.repeat)
+        extract = best_time(lambda: [extract_day(decode_day(raw, backend)) for raw in raws], args.repeat)
+        memory = held_memory(raws, backend)
+        print(f"{backend:>8} {decode:>8.3f}s {size / 1e6 / decode:>7.1f} {n_messages / decode:>10,.0f} "
+              f"{extract:>8.3f}s {memory / n_messages:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
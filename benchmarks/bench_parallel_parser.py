@@ -0,0 +1,53 @@
+"""Compare serial and parallel parsing of a whole slack export.
+
+Usage:
+    python benchmarks/bench_parallel_parser.py --path anonymized --workers 4
+
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+rpath = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if rpath not in sys.path:
+    sys.path.insert(0, rpath)
+
+from src.loader import SlackDataLoader, slack_parser, parallel_slack_parser
+
+
+def serial_parse(root_dir, channel_names):
+    return pd.concat([slack_parser(os.path.join(root_dir, channel) + '/')
+                      for channel in channel_names], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs parallel slack_parser')
+    parser.add_argument('--path', default='anonymized', help='slack exported data folder')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per mode')
+    args = parser.parse_args()
+
+    channel_names = [channel['name'] for channel in SlackDataLoader(args.path).get_channels()]
+
+    timings = {}
+    for name, run in [('serial', lambda: serial_parse(args.path, channel_names)),
+                      ('parallel', lambda: parallel_slack_parser(args.path, channel_names, args.workers))]:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = run()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, result)
+
+    pd.testing.assert_frame_equal(timings['serial'][1], timings['parallel'][1])
+    rows = len(timings['serial'][1])
+    for name, (best, _) in timings.items():
+        print(f"{name:>8}: {best:.3f}s  ({rows / best:,.0f} rows/s)")
+    print(f" speedup: {timings['serial'][0] / timings['parallel'][0]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
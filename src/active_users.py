@@ -0,0 +1,149 @@
+"""Distinct active users per channel and period, from persisted sketches.
+
+One src.sketches.HyperLogLog of the senders of every (channel, day) is
+kept, so "how many different people posted" is answered for any union
+of channels and days by merging their registers, without holding the
+senders themselves:
+
+    rollup(freq='week')                       per channel and week
+    rollup(freq='month', groups='workspace')  whole workspace per month
+    rollup(freq=None, groups=week_folder)     per all-weekN channel folder
+
+A sender is the user of a message without a subtype, as in
+get_all_channels_messages. The sketches are stored in one parquet file
+next to a src.manifest.Manifest, and a refresh only reads the day files
+that are new or changed:
+
+    <folder>/active_users.parquet
+    <folder>/_manifest.json
+
+Usage:
+    python -m src.ingest --path anonymized --store active_users
+
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.manifest import TableStore
+from src.sketches import HyperLogLog, hll_estimate
+
+
+# bumped whenever the sketches change, so older folders are rebuilt
+ACTIVE_USERS_VERSION = 1
+
+SKETCHES_FILE = 'active_users.parquet'
+WEEK_FOLDER_RE = re.compile(r'^all-(?:[a-z0-9]+-)?week(\d+)$')
+
+
+def day_senders(tables):
+    """users of the messages without a subtype of the extract_day tables of a day file"""
+    rows = tables['messages']
+    return [row['user'] for row in rows if row['subtype'] is None and row['user'] is not None]
+
+
+def week_folder(channel):
+    """'week N' for the all-weekN and all-<track>-weekN channels, None for the others"""
+    match = WEEK_FOLDER_RE.match(channel)
+    return f'week {int(match.group(1))}' if match else None
+
+
+class ActiveUsers(TableStore):
+    """HyperLogLog sketches of the senders of every channel and day.
+
+    Args:
+        folder (str): folder the sketches are stored in
+        precision (int): HyperLogLog precision of new sketches
+
+    Attributes:
+        table (pd.DataFrame): 'channel', 'day' and the 'registers' bytes
+            of every (channel, day) with at least one sender
+
+    """
+
+    FILE = SKETCHES_FILE
+    COLUMNS = {'channel': object, 'day': object, 'registers': object}
+
+    def __init__(self, folder, precision=12):
+        self.precision = precision
+        super().__init__(folder)
+
+    @property
+    def version(self):
+        return f'{ACTIVE_USERS_VERSION}/p{self.precision}'
+
+    def add(self, channel, days, removed):
+        """sketch the senders of the days read, returns the (channel, day) sketches (re)built or dropped"""
+        rows = []
+        for day, tables in days.items():
+            senders = day_senders(tables)
+            if senders:
+                rows.append((channel, day, HyperLogLog(self.precision).update(senders).to_bytes()))
+        keys = [(channel, day) for day in removed + list(days)]
+        return self.replace(keys, pd.DataFrame(rows, columns=list(self.COLUMNS)))
+
+    def sketch(self, channels=None, start=None, end=None):
+        """one HyperLogLog merged from the sketches of the given channels and days"""
+        table = self._select(channels, start, end)
+        registers = self._registers(table).max(axis=0, initial=0)
+        return HyperLogLog(self.precision, registers)
+
+    def rollup(self, freq='week', groups=None, channels=None, start=None, end=None):
+        """estimated distinct senders per group and period
+
+        Args:
+            freq (str): 'day', 'week' (starting on Monday), 'month' or None
+                for the whole range
+            groups: None for one group per channel, 'workspace' for all the
+                channels together, or a dict or function from channel to
+                group (channels it maps to None are left out)
+            channels (list of str): only these channels
+            start, end (str): only the days from start to end, both inclusive
+
+        Returns:
+            pd.DataFrame: 'group', 'period' (unless freq is None) and the
+                estimated number of distinct 'users'
+        """
+        table = self._select(channels, start, end)
+        keys = pd.DataFrame({'group': table['channel'].to_numpy()})
+        if groups == 'workspace':
+            keys['group'] = 'workspace'
+        elif groups is not None:
+            keys['group'] = table['channel'].map(groups).to_numpy()
+
+        if freq is not None:
+            # day files that are not named after a day have no period
+            day = pd.to_datetime(table['day'], format='%Y-%m-%d', errors='coerce')
+            keys['period'] = day.to_numpy()
+            keys = keys[day.notna().to_numpy()].copy()
+            day = keys['period']
+            if freq == 'week':
+                keys['period'] = day - pd.to_timedelta(day.dt.dayofweek, unit='D')
+            elif freq == 'month':
+                keys['period'] = day.dt.to_period('M').dt.start_time
+            elif freq != 'day':
+                raise ValueError(f"freq must be 'day', 'week', 'month' or None, not {freq!r}")
+
+        keys = keys.dropna()
+        grouped = keys.groupby(list(keys.columns), sort=True)
+        result = grouped.size().index.to_frame(index=False)
+        merged = np.zeros((len(result), 1 << self.precision), dtype='uint8')
+        np.maximum.at(merged, grouped.ngroup().to_numpy(), self._registers(table)[keys.index.to_numpy()])
+        result['users'] = hll_estimate(merged) if len(result) else np.zeros(0)
+        return result
+
+    def _select(self, channels, start, end):
+        table = self.table
+        if channels is not None:
+            table = table[table['channel'].isin(channels)]
+        if start is not None:
+            table = table[table['day'] >= str(start)]
+        if end is not None:
+            table = table[table['day'] <= str(end)]
+        return table.reset_index(drop=True)
+
+    def _registers(self, table):
+        data = b''.join(table['registers'])
+        return np.frombuffer(data, dtype='uint8').reshape(len(table), 1 << self.precision)
+
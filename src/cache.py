@@ -0,0 +1,263 @@
+"""Columnar cache of a parsed slack export.
+
+compile_export parses the raw day files once and writes the normalized
+tables of src.extract (messages, replies, reactions, mentions, links,
+emojis and files) as parquet, partitioned by channel and day in the hive
+layout (messages/channel=random/day=2022-08-21/), together with a users
+table. read_table loads any of them back with column projection, and
+filters are pushed down to partition and row group level so a query on
+one channel or one week only touches those files.
+
+The loader functions accept a cache_dir argument and read from here
+whenever the cached copy of the channel is still fresh, falling back to
+the raw JSON otherwise.
+
+What has been compiled is tracked by a src.manifest.Manifest, so running
+compile_export again on a grown export only parses the day files that
+are new or changed and rewrites their partitions.
+
+Usage:
+    python -m src.cache --path anonymized --cache .slack_cache
+
+"""
+import os
+import shutil
+import hashlib
+import argparse
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.loader import SlackDataLoader, open_export_file, to_day
+from src.manifest import Manifest
+from src.decode import decode_day
+from src.extract import SCHEMAS, extract_day, extract_channel
+
+
+# bumped whenever the tables change, so older caches are rebuilt
+CACHE_VERSION = 2
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('channel', pa.string()), ('day', pa.string())]), flavor='hive')
+DAY_PARTITIONING = ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive')
+
+USERS_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('name', pa.string()),
+    ('real_name', pa.string()),
+    ('display_name', pa.string()),
+    ('deleted', pa.bool_()),
+    ('is_bot', pa.bool_()),
+    ('is_admin', pa.bool_()),
+    ('is_owner', pa.bool_()),
+    ('tz', pa.string()),
+])
+
+
+def _write_partition(cache_dir, table, channel, day, rows):
+    path = os.path.join(cache_dir, table, f'channel={channel}', f'day={day}')
+    os.makedirs(path, exist_ok=True)
+    pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMAS[table]),
+                   os.path.join(path, 'part-0.parquet'))
+
+
+def compile_channel(cache_dir, manifest, channel, full=False):
+    """bring the cached tables of a channel up to date with the export
+
+    Args:
+        cache_dir (str): cache folder
+        manifest (Manifest): what has been compiled so far, updated in place
+        channel (str): channel folder name
+        full (bool): re-parse every day file instead of only the changed ones
+
+    Returns:
+        list of str: the day files that were parsed
+    """
+    if full:
+        for table in SCHEMAS:
+            shutil.rmtree(os.path.join(cache_dir, table, f'channel={channel}'), ignore_errors=True)
+        manifest.channels.pop(channel, None)
+
+    changed, removed = manifest.changes(channel)
+    for day_file in removed + changed:
+        day = day_file[:-len('.json')]
+        for table in SCHEMAS:
+            shutil.rmtree(os.path.join(cache_dir, table, f'channel={channel}', f'day={day}'),
+                          ignore_errors=True)
+        manifest.forget(channel, day_file)
+
+    channel_path = os.path.join(manifest.source, channel)
+    for day_file in changed:
+        with open_export_file(os.path.join(channel_path, day_file)) as f:
+            raw = f.read()
+        tables = extract_day(decode_day(raw))
+
+        day = day_file[:-len('.json')]
+        for table, rows in tables.items():
+            if rows:
+                _write_partition(cache_dir, table, channel, day, rows)
+        manifest.record(channel, day_file, sha1=hashlib.sha1(raw).hexdigest())
+
+    manifest.channels.setdefault(channel, {})
+    return changed
+
+
+def compile_export(export_path, cache_dir, channels=None, full=False):
+    """parse a slack export into the columnar cache
+
+    Only day files that are new or changed since the last compile are
+    parsed, unless full is set.
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        cache_dir (str): folder to write the cache to
+        channels (list of str): channels to compile, defaults to all of them
+        full (bool): rebuild the cache of the channels from scratch
+
+    Returns:
+        dict: channel -> list of the day files that were parsed
+    """
+    loader = SlackDataLoader(export_path)
+    channels = channels or [channel['name'] for channel in loader.channels]
+    os.makedirs(cache_dir, exist_ok=True)
+
+    manifest = Manifest.load(cache_dir)
+    if not _matches(manifest, export_path):
+        for table in list(SCHEMAS) + ['users']:
+            shutil.rmtree(os.path.join(cache_dir, table), ignore_errors=True)
+        manifest = Manifest(export_path, version=CACHE_VERSION)
+
+    parsed = {}
+    for channel in channels:
+        parsed[channel] = compile_channel(cache_dir, manifest, channel, full)
+        # saved after every channel so an interrupted refresh keeps its progress
+        manifest.save(cache_dir)
+
+    os.makedirs(os.path.join(cache_dir, 'users'), exist_ok=True)
+    users = loader.user_directory.frame.reset_index()
+    pq.write_table(pa.Table.from_pandas(users[USERS_SCHEMA.names], schema=USERS_SCHEMA, preserve_index=False),
+                   os.path.join(cache_dir, 'users', 'users.parquet'))
+
+    return parsed
+
+
+def _matches(manifest, export_path):
+    """check that a manifest describes this export in the current cache format"""
+    return (manifest is not None and manifest.version == CACHE_VERSION
+            and manifest.source == os.path.abspath(export_path))
+
+
+def is_stale(cache_dir, export_path, channel=None):
+    """check whether the cache no longer matches the export
+
+    Only file sizes and mtimes are compared, nothing is read.
+
+    Args:
+        cache_dir (str): cache folder
+        export_path (str): slack exported data folder or ZIP file
+        channel (str): only check this channel
+
+    Returns:
+        bool: True if the cache is missing or out of date
+    """
+    manifest = Manifest.load(cache_dir)
+    if not _matches(manifest, export_path):
+        return True
+
+    channels = [channel] if channel else list(manifest.channels)
+    return any(manifest.is_stale(name) for name in channels)
+
+
+def read_table(cache_dir, table, columns=None, filters=None, channel=None):
+    """load a cached table as a dataframe
+
+    Args:
+        cache_dir (str): cache folder
+        table (str): one of the src.extract tables, or 'users'
+        columns (list of str): columns to load, defaults to all
+        filters (list of tuple): pyarrow/pandas style filters such as
+            [('day', '>=', '2022-09-01'), ('user', '=', 'U03T89ACUUW')]
+        channel (str): only read the partitions of this channel, without
+            listing the folders of the others
+
+    Returns:
+        pd.DataFrame: rows ordered by channel, day and position in the day file
+    """
+    if table == 'users':
+        return pq.read_table(os.path.join(cache_dir, 'users', 'users.parquet'), columns=columns).to_pandas()
+
+    schema = SCHEMAS[table].append(PARTITIONING.schema.field('day'))
+    path, partitioning = os.path.join(cache_dir, table), PARTITIONING
+    if channel is None:
+        schema = schema.append(PARTITIONING.schema.field('channel'))
+    else:
+        # below channel=... only the day is encoded in the folder names
+        path = os.path.join(path, f'channel={channel}')
+        partitioning = DAY_PARTITIONING
+
+    columns = columns or schema.names + (['channel'] if channel else [])
+    load = [column for column in columns if column in schema.names]
+    load += [key for key in ('channel', 'day', 'seq') if key in schema.names and key not in load]
+
+    if os.path.isdir(path):
+        dataset = ds.dataset(path, schema=schema, format='parquet', partitioning=partitioning)
+        expression = pq.filters_to_expression(filters) if filters else None
+        df = dataset.to_table(columns=load, filter=expression).to_pandas()
+    else:
+        df = schema.empty_table().select(load).to_pandas()
+    if channel is not None:
+        df['channel'] = channel
+
+    # parquet fragments are not guaranteed to come back in path order
+    df = df.sort_values(['channel', 'day', 'seq'], kind='stable', ignore_index=True)
+    return df[columns]
+
+
+def day_filters(start=None, end=None):
+    """read_table filters selecting the days from start to end, both inclusive"""
+    filters = []
+    if start is not None:
+        filters.append(('day', '>=', to_day(start)))
+    if end is not None:
+        filters.append(('day', '<=', to_day(end)))
+    return filters or None
+
+
+def channel_tables(path_channel, tables=tuple(SCHEMAS), cache_dir=None, start=None, end=None):
+    """tables of the channel at path_channel
+
+    They are read from the cache when a cache_dir is given and the channel
+    is fresh in it, and otherwise extracted from the JSON in a single pass
+    over the day files.
+
+    Args:
+        path_channel (str): path to the channel folder, on disk or inside a ZIP
+        tables (iterable of str): names of the tables to return
+        cache_dir (str): cache folder
+        start, end (str, date or datetime): only the days from start to end,
+            both inclusive; the other day files and partitions are not read
+
+    Returns:
+        dict: table name -> dataframe
+    """
+    channel_path = os.path.normpath(path_channel)
+    export_path, channel = os.path.dirname(channel_path), os.path.basename(channel_path)
+    if cache_dir is not None and not is_stale(cache_dir, export_path, channel):
+        filters = day_filters(start, end)
+        return {table: read_table(cache_dir, table, filters=filters, channel=channel) for table in tables}
+
+    extracted = extract_channel(path_channel, start, end)
+    return {table: extracted[table] for table in tables}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compile a slack export into a parquet cache')
+    parser.add_argument('--path', required=True, help='slack exported data folder or ZIP file')
+    parser.add_argument('--cache', default='.slack_cache', help='folder to write the cache to')
+    parser.add_argument('--channel', action='append', help='only compile this channel (repeatable)')
+    parser.add_argument('--full', action='store_true', help='re-parse every day file, not only the changed ones')
+    args = parser.parse_args()
+
+    parsed = compile_export(args.path, args.cache, args.channel, args.full)
+    print(f"parsed {sum(map(len, parsed.values()))} day files from {len(parsed)} channels into {args.cache}")
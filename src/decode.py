@@ -0,0 +1,150 @@
+"""JSON decoding backends for slack export files.
+
+Three backends are supported, and the fastest one installed is used
+unless the SLACK_JSON_BACKEND environment variable names another:
+
+    msgspec  decodes day files straight into the typed structs below,
+             skipping every field that is never read (user_profile images,
+             attachments, edited, bot_profile, ...) without building it
+    orjson   fast decoding into plain dicts
+    json     the standard library, always available
+
+msgspec and orjson are optional (requirements-optional.txt).
+
+loads always returns plain dicts and lists, as json.loads does.
+decode_day returns the messages of a day file as Message structs with
+the msgspec backend and as dicts otherwise; src.extract handles both.
+
+"""
+import os
+import json
+
+try:
+    import msgspec
+except ImportError:  # optional dependency
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+BACKENDS = ('msgspec', 'orjson', 'json')
+
+
+def available_backends():
+    """names of the installed backends, fastest first"""
+    installed = {'msgspec': msgspec is not None, 'orjson': orjson is not None, 'json': True}
+    return [name for name in BACKENDS if installed[name]]
+
+
+def default_backend():
+    """backend named by SLACK_JSON_BACKEND, or the fastest installed one"""
+    name = os.environ.get('SLACK_JSON_BACKEND')
+    if name:
+        return _check_backend(name)
+    return available_backends()[0]
+
+
+def _check_backend(name):
+    if name not in available_backends():
+        raise ValueError(f"JSON backend {name!r} is not available, use one of {available_backends()}")
+    return name
+
+
+if msgspec is not None:
+    class Element(msgspec.Struct):
+        """innermost rich text element: text, emoji, user mention, link, ..."""
+        type: str | None = None
+        name: str | None = None
+        user_id: str | None = None
+        url: str | None = None
+
+    class Section(msgspec.Struct):
+        elements: list[Element] | None = None
+
+    class Block(msgspec.Struct):
+        elements: list[Section] | None = None
+
+    class UserProfile(msgspec.Struct):
+        real_name: str | None = None
+
+    class Reply(msgspec.Struct):
+        user: str
+        ts: str
+
+    class Reaction(msgspec.Struct):
+        name: str
+        count: int
+        users: list[str]
+
+    class File(msgspec.Struct):
+        id: str | None = None
+        name: str | None = None
+        filetype: str | None = None
+        size: int | None = None
+        user: str | None = None
+
+    class Message(msgspec.Struct):
+        """the fields of a slack message that the analysis reads"""
+        ts: str
+        type: str | None = None
+        subtype: str | None = None
+        client_msg_id: str | None = None
+        user: str | None = None
+        bot_id: str | None = None
+        user_profile: UserProfile | None = None
+        text: str | None = None
+        blocks: list[Block] | None = None
+        thread_ts: str | None = None
+        parent_user_id: str | None = None
+        reply_count: int | None = None
+        reply_users_count: int | None = None
+        reply_users: list[str] | None = None
+        latest_reply: str | None = None
+        replies: list[Reply] | None = None
+        reactions: list[Reaction] | None = None
+        files: list[File] | None = None
+
+    _day_decoder = msgspec.json.Decoder(list[Message])
+    _decoder = msgspec.json.Decoder()
+
+
+def loads(raw, backend=None):
+    """decode JSON bytes into plain python objects
+
+    Args:
+        raw (bytes): JSON document
+        backend (str): one of BACKENDS, defaults to default_backend()
+
+    Returns:
+        the decoded document
+    """
+    backend = _check_backend(backend) if backend else default_backend()
+    if backend == 'msgspec':
+        return _decoder.decode(raw)
+    if backend == 'orjson':
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def decode_day(raw, backend=None):
+    """decode the messages of a day file
+
+    Args:
+        raw (bytes): content of a YYYY-MM-DD.json day file
+        backend (str): one of BACKENDS, defaults to default_backend()
+
+    Returns:
+        list: Message structs with msgspec, dicts with the other backends
+    """
+    backend = _check_backend(backend) if backend else default_backend()
+    if backend == 'msgspec':
+        return _day_decoder.decode(raw)
+    return loads(raw, backend)
+
+
+def load(f, backend=None):
+    """decode an open binary file, like json.load"""
+    return loads(f.read(), backend)
@@ -0,0 +1,154 @@
+"""Engagement counts per (channel, user, day), kept up to date incrementally.
+
+The leaderboards of the EDA dashboard used to re-run value_counts and
+groupby over the combined messages of every channel on each call. The
+cube holds, for every channel, day and user, how many
+
+    messages            messages they sent, counted as slack_parser keeps
+                        them (no bots, a sender profile)
+    replies             of those, thread replies
+    replies_received    replies to the threads they started (reply_count)
+    reactions_received  reactions on their messages
+    mentions            users they mentioned
+    mentioned           times they were mentioned
+    links               links they shared
+
+so every leaderboard is a groupby-sum over a few thousand rows. It is
+stored in one parquet file next to a src.manifest.Manifest, and a
+refresh only re-extracts the day files that are new or changed:
+
+    <folder>/engagement.parquet
+    <folder>/_manifest.json
+
+Usage:
+    python -m src.ingest --path anonymized --store engagement
+
+"""
+import pandas as pd
+
+from src.manifest import TableStore
+from src.extract import assemble_tables
+
+
+# bumped whenever the cube's columns change, so older folders are rebuilt
+ENGAGEMENT_VERSION = 1
+
+CUBE_FILE = 'engagement.parquet'
+KEYS = ['channel', 'day', 'user']
+MEASURES = ['messages', 'replies', 'replies_received', 'reactions_received', 'mentions', 'mentioned', 'links']
+
+
+def engagement_counts(tables):
+    """engagement measures per day and user of the tables of one channel
+
+    Args:
+        tables (dict): messages, reactions, mentions and links tables with
+            a day column, as extract_channel returns them
+
+    Returns:
+        pd.DataFrame: 'day', 'user' and the MEASURES columns
+    """
+    messages = tables['messages']
+    sent = messages[messages['bot_id'].isna() & messages['real_name'].notna() & messages['user'].notna()]
+    senders = messages.set_index(['day', 'seq'])['user']
+
+    def by_sender(table):
+        """rows of a table per day and user of the message they belong to"""
+        users = senders.reindex(pd.MultiIndex.from_frame(table[['day', 'seq']])).to_numpy()
+        return table.assign(user=users).groupby(['day', 'user']).size()
+
+    is_reply = sent['thread_ts'].notna() & (sent['ts'] != sent['thread_ts'])
+    columns = {
+        'messages': sent.groupby(['day', 'user']).size(),
+        'replies': sent[is_reply].groupby(['day', 'user']).size(),
+        'replies_received': sent.groupby(['day', 'user'])['reply_count'].sum(),
+        'reactions_received': tables['reactions'].groupby(['day', 'msg_user'])['count'].sum(),
+        'mentions': by_sender(tables['mentions']),
+        'mentioned': tables['mentions'].groupby(['day', 'user_id']).size(),
+        'links': by_sender(tables['links']),
+    }
+    for name, column in columns.items():
+        column.index = column.index.set_names(['day', 'user'])
+        columns[name] = column
+
+    counts = pd.concat(columns, axis=1).reindex(columns=MEASURES).fillna(0).astype('int64')
+    counts = counts[counts.any(axis=1)]
+    return counts.sort_index().reset_index()
+
+
+class EngagementCube(TableStore):
+    """Engagement measures per (channel, day, user) of an export.
+
+    Args:
+        folder (str): folder the cube is stored in
+
+    Attributes:
+        table (pd.DataFrame): the KEYS and MEASURES columns, one row per
+            channel, day and user with any engagement
+
+    """
+
+    version = ENGAGEMENT_VERSION
+    FILE = CUBE_FILE
+    COLUMNS = {column: 'int64' if column in MEASURES else object for column in KEYS + MEASURES}
+    SORT = KEYS
+
+    def add(self, channel, days, removed):
+        """count the days read, returns the (channel, day) rows (re)counted or dropped"""
+        if days:
+            counts = engagement_counts(assemble_tables(list(days.values()), {'day': list(days)}))
+            frame = counts.assign(channel=channel)[KEYS + MEASURES]
+        else:
+            frame = self.table.iloc[:0]
+        return self.replace([(channel, day) for day in removed + list(days)], frame)
+
+    def rollup(self, by=('user',), measures=MEASURES, channels=None, start=None, end=None, users=None):
+        """sum of the measures per group
+
+        Args:
+            by (str or sequence of str): any of 'channel', 'day', 'user'
+            measures (str or list of str): measures to sum
+            channels (list of str): only these channels
+            start, end (str): only the days from start to end, both inclusive
+            users (src.users.UserDirectory): show real names instead of ids
+
+        Returns:
+            pd.DataFrame or pd.Series (for a single measure), indexed by the groups
+        """
+        table = self.table
+        if channels is not None:
+            table = table[table['channel'].isin(channels)]
+        if start is not None:
+            table = table[table['day'] >= str(start)]
+        if end is not None:
+            table = table[table['day'] <= str(end)]
+        by = [by] if isinstance(by, str) else list(by)
+        totals = table.groupby(by)[measures].sum()
+
+        if users is not None and 'user' in by:
+            ids = pd.Series(totals.index.get_level_values('user').unique())
+            # users missing from users.json (USLACKBOT) keep their id
+            names = dict(zip(ids, users.map(ids).fillna(ids)))
+            totals = totals.rename(index=names, level='user' if len(by) > 1 else None)
+            # ids sharing a real name (a user who re-joined) are one row
+            totals = totals.groupby(level=totals.index.names).sum()
+        return totals
+
+    def leaderboard(self, measure='messages', n=10, channels=None, bottom=False, users=None):
+        """the n users with the most of a measure
+
+        Args:
+            measure (str): one of MEASURES
+            n (int): number of users
+            channels (list of str): only count these channels
+            bottom (bool): the last n users of the leaderboard instead, as
+                value_counts().tail(n); users with none are left out
+            users (src.users.UserDirectory): show real names instead of ids
+
+        Returns:
+            pd.Series: measure per user, in leaderboard order
+        """
+        totals = self.rollup('user', measure, channels, users=users)
+        totals = totals[totals > 0].sort_values(ascending=False, kind='stable')
+        return totals.tail(n) if bottom else totals.head(n)
+
@@ -0,0 +1,477 @@
+"""Single-pass extraction of a slack export into normalized tables.
+
+Each day file is decoded exactly once and turned into the rows of seven
+tables at the same time:
+
+    messages   one row per message
+    replies    one row per entry of a thread parent's 'replies'
+    reactions  one row per reaction on a message
+    mentions   one row per user mentioned in a message's rich text blocks
+    links      one row per link in a message's rich text blocks
+    emojis     one row per emoji in a message's rich text blocks
+    files      one row per file shared with a message
+
+Rows point back at their message through (channel, day, seq), seq being
+the position of the message in its day file. The same tables are what
+src.cache stores as parquet, and the functions at the bottom of this
+module are the views that the older loader and utils functions
+(slack_parser, parse_slack_reaction, get_messages_from_channel, ...)
+are computed from.
+
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.loader import list_day_files, open_export_file, msg_dist_type
+from src.decode import decode_day
+
+
+SCHEMAS = {
+    'messages': pa.schema([
+        ('seq', pa.int32()),
+        ('ts', pa.string()),
+        ('msg_id', pa.string()),
+        ('type', pa.string()),
+        ('subtype', pa.string()),
+        ('user', pa.string()),
+        ('bot_id', pa.string()),
+        ('real_name', pa.string()),
+        ('text', pa.string()),
+        ('dist_type', pa.string()),
+        ('has_blocks', pa.bool_()),
+        ('thread_ts', pa.string()),
+        ('parent_user_id', pa.string()),
+        ('reply_count', pa.int32()),
+        ('reply_users_count', pa.int32()),
+        ('reply_users', pa.list_(pa.string())),
+        ('latest_reply', pa.string()),
+    ]),
+    'replies': pa.schema([
+        ('seq', pa.int32()),
+        ('thread_ts', pa.string()),
+        ('message_id', pa.string()),
+        ('user', pa.string()),
+        ('ts', pa.string()),
+    ]),
+    'reactions': pa.schema([
+        ('seq', pa.int32()),
+        ('msg_ts', pa.string()),
+        ('msg_user', pa.string()),
+        ('name', pa.string()),
+        ('count', pa.int32()),
+        ('users', pa.list_(pa.string())),
+    ]),
+    'mentions': pa.schema([
+        ('seq', pa.int32()),
+        ('user_id', pa.string()),
+    ]),
+    'links': pa.schema([
+        ('seq', pa.int32()),
+        ('url', pa.string()),
+    ]),
+    'emojis': pa.schema([
+        ('seq', pa.int32()),
+        ('name', pa.string()),
+    ]),
+    'files': pa.schema([
+        ('seq', pa.int32()),
+        ('file_id', pa.string()),
+        ('name', pa.string()),
+        ('filetype', pa.string()),
+        ('size', pa.int64()),
+        ('user', pa.string()),
+    ]),
+}
+
+
+def extract_day(slack_data):
+    """normalize the messages of one day file into rows of every table
+
+    Args:
+        slack_data (list): messages of a day file, as dicts or as the
+            Message structs of src.decode
+
+    Returns:
+        dict: table name -> list of row dicts
+    """
+    if slack_data and not isinstance(slack_data[0], dict):
+        return _extract_struct_day(slack_data)
+
+    tables = {table: [] for table in SCHEMAS}
+    messages, replies, reactions = tables['messages'], tables['replies'], tables['reactions']
+    mentions, links, emojis, files = tables['mentions'], tables['links'], tables['emojis'], tables['files']
+
+    for seq, msg in enumerate(slack_data):
+        blocks = msg.get('blocks')
+        messages.append({
+            'seq': seq,
+            'ts': msg['ts'],
+            'msg_id': msg.get('client_msg_id'),
+            'type': msg.get('type'),
+            'subtype': msg.get('subtype'),
+            'user': msg.get('user'),
+            'bot_id': msg.get('bot_id'),
+            'real_name': msg['user_profile']['real_name'] if 'user_profile' in msg else None,
+            'text': msg.get('text'),
+            'dist_type': msg_dist_type(msg),
+            'has_blocks': blocks is not None,
+            'thread_ts': msg.get('thread_ts'),
+            'parent_user_id': msg.get('parent_user_id'),
+            'reply_count': msg.get('reply_count'),
+            'reply_users_count': msg.get('reply_users_count'),
+            'reply_users': msg.get('reply_users'),
+            'latest_reply': msg.get('latest_reply'),
+        })
+
+        for reply in msg.get('replies') or []:
+            replies.append({'seq': seq, 'thread_ts': msg.get('thread_ts'),
+                            'message_id': msg.get('client_msg_id'), 'user': reply['user'], 'ts': reply['ts']})
+
+        for reaction in msg.get('reactions') or []:
+            reactions.append({'seq': seq, 'msg_ts': msg['ts'], 'msg_user': msg.get('user'),
+                              'name': reaction['name'], 'count': reaction['count'], 'users': reaction['users']})
+
+        for shared in msg.get('files') or []:
+            files.append({'seq': seq, 'file_id': shared.get('id'), 'name': shared.get('name'),
+                          'filetype': shared.get('filetype'), 'size': shared.get('size'),
+                          'user': shared.get('user')})
+
+        for blk in blocks or []:
+            for elm in blk.get('elements') or []:
+                for elm_ in elm.get('elements') or []:
+                    elm_type = elm_.get('type')
+                    if elm_type == 'emoji':
+                        emojis.append({'seq': seq, 'name': elm_['name']})
+                    elif elm_type == 'user':
+                        mentions.append({'seq': seq, 'user_id': elm_['user_id']})
+                    elif elm_type == 'link':
+                        links.append({'seq': seq, 'url': elm_['url']})
+
+    return tables
+
+
+def _struct_dist_type(msg):
+    """msg_dist_type of a Message struct"""
+    try:
+        return msg.blocks[0].elements[0].elements[0].type
+    except (TypeError, IndexError):
+        return 'reshared'
+
+
+def _extract_struct_day(slack_data):
+    """extract_day for Message structs, reading attributes instead of keys"""
+    tables = {table: [] for table in SCHEMAS}
+    messages, replies, reactions = tables['messages'], tables['replies'], tables['reactions']
+    mentions, links, emojis, files = tables['mentions'], tables['links'], tables['emojis'], tables['files']
+
+    for seq, msg in enumerate(slack_data):
+        profile = msg.user_profile
+        messages.append({
+            'seq': seq,
+            'ts': msg.ts,
+            'msg_id': msg.client_msg_id,
+            'type': msg.type,
+            'subtype': msg.subtype,
+            'user': msg.user,
+            'bot_id': msg.bot_id,
+            'real_name': profile.real_name if profile is not None else None,
+            'text': msg.text,
+            'dist_type': _struct_dist_type(msg),
+            'has_blocks': msg.blocks is not None,
+            'thread_ts': msg.thread_ts,
+            'parent_user_id': msg.parent_user_id,
+            'reply_count': msg.reply_count,
+            'reply_users_count': msg.reply_users_count,
+            'reply_users': msg.reply_users,
+            'latest_reply': msg.latest_reply,
+        })
+
+        for reply in msg.replies or []:
+            replies.append({'seq': seq, 'thread_ts': msg.thread_ts,
+                            'message_id': msg.client_msg_id, 'user': reply.user, 'ts': reply.ts})
+
+        for reaction in msg.reactions or []:
+            reactions.append({'seq': seq, 'msg_ts': msg.ts, 'msg_user': msg.user,
+                              'name': reaction.name, 'count': reaction.count, 'users': reaction.users})
+
+        for shared in msg.files or []:
+            files.append({'seq': seq, 'file_id': shared.id, 'name': shared.name,
+                          'filetype': shared.filetype, 'size': shared.size, 'user': shared.user})
+
+        for blk in msg.blocks or []:
+            for elm in blk.elements or []:
+                for elm_ in elm.elements or []:
+                    if elm_.type == 'emoji':
+                        emojis.append({'seq': seq, 'name': elm_.name})
+                    elif elm_.type == 'user':
+                        mentions.append({'seq': seq, 'user_id': elm_.user_id})
+                    elif elm_.type == 'link':
+                        links.append({'seq': seq, 'url': elm_.url})
+
+    return tables
+
+
+def assemble_tables(results, keys):
+    """build one dataframe per table from the rows of several day files
+
+    Args:
+        results (iterable of dict): extract_day output of each day file
+        keys (dict): key column -> list with one value per day file
+
+    Returns:
+        dict: table name -> dataframe with the key columns in front
+    """
+    rows = {table: [] for table in SCHEMAS}
+    counts = {table: [] for table in SCHEMAS}
+    for day_rows in results:
+        for table, table_rows in day_rows.items():
+            rows[table].extend(table_rows)
+            counts[table].append(len(table_rows))
+
+    frames = {}
+    for table, schema in SCHEMAS.items():
+        df = pd.DataFrame(rows[table], columns=schema.names)
+        for position, (key, values) in enumerate(keys.items()):
+            df.insert(position, key, np.repeat(np.array(values, dtype=object), counts[table]))
+        frames[table] = df
+    return frames
+
+
+def extract_messages(slack_data):
+    """extract every table of a list of messages already in memory
+
+    Args:
+        slack_data (list of dict): slack messages
+
+    Returns:
+        dict: table name -> dataframe
+    """
+    return assemble_tables([extract_day(slack_data)], {})
+
+
+def _extract_day_file(json_file):
+    with open_export_file(json_file) as f:
+        return extract_day(decode_day(f.read()))
+
+
+def extract_channel(path_channel, start=None, end=None):
+    """extract every table of a channel folder
+
+    Args:
+        path_channel (str): path to the channel folder, on disk or inside a ZIP
+        start, end (str, date or datetime): only read the day files from
+            start to end, both inclusive
+
+    Returns:
+        dict: table name -> dataframe with a day column, in day file order
+    """
+    day_files = list_day_files(path_channel, start, end)
+    results = (_extract_day_file(os.path.join(path_channel, day_file)) for day_file in day_files)
+    return assemble_tables(results, {'day': [day_file[:-len('.json')] for day_file in day_files]})
+
+
+def extract_export(export_path, channel_names, workers=1, start=None, end=None):
+    """extract every table of several channels, optionally with a process pool
+
+    Every day file is an independent task, so with workers > 1 the files
+    are spread over a pool and the tables are re-assembled in channel and
+    day order afterwards.
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        channel_names (list of str): channels to extract, in output order
+        workers (int): worker processes, None for the cpu count, 1 to stay serial
+        start, end (str, date or datetime): only read the day files from
+            start to end, both inclusive
+
+    Returns:
+        dict: table name -> dataframe with channel and day columns
+    """
+    tasks = [(channel, day_file)
+             for channel in channel_names
+             for day_file in list_day_files(os.path.join(export_path, channel), start, end)]
+    json_files = [os.path.join(export_path, channel, day_file) for channel, day_file in tasks]
+    keys = {'channel': [channel for channel, _ in tasks],
+            'day': [day_file[:-len('.json')] for _, day_file in tasks]}
+
+    if workers == 1:
+        return assemble_tables(map(_extract_day_file, json_files), keys)
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return assemble_tables(executor.map(_extract_day_file, json_files, chunksize=chunksize), keys)
+
+
+def _message_keys(df):
+    return [key for key in ('channel', 'day', 'seq') if key in df.columns]
+
+
+# Views: the outputs of the older parsing functions computed from the tables
+
+# low-cardinality slack_parser columns stored as categoricals in typed mode
+CATEGORY_COLUMNS = ['msg_type', 'sender_name', 'msg_dist_type', 'channel']
+
+
+def epoch_to_datetime(values):
+    """slack epoch strings ('1661072000.000100') to UTC datetime64
+
+    Missing values and the 0 placeholders of slack_parser become NaT.
+    """
+    seconds = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+    valid = seconds > 0
+    nanos = np.full(len(seconds), np.datetime64('NaT', 'ns').astype('int64'))
+    # float seconds only carry ~0.2us of precision at current epochs, slack ts are whole microseconds
+    nanos[valid] = np.round(seconds[valid] * 1e6).astype('int64') * 1000
+    return pd.Series(nanos.view('datetime64[ns]'), index=values.index).dt.tz_localize('UTC')
+
+
+def list_column(values):
+    """arrow-backed list<string> column (offsets + flat values) from a column of lists"""
+    array = pa.array([None if users is None else list(users) for users in values], pa.list_(pa.string()))
+    return pd.Series(pd.arrays.ArrowExtensionArray(array), index=values.index)
+
+
+def categorize(df):
+    """store the CATEGORY_COLUMNS of a slack_parser frame as categoricals
+
+    pd.concat falls back to object for categoricals with different
+    categories, so this is re-applied after combining channels.
+    """
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def slack_frame(messages, typed=False):
+    """slack_parser columns (without 'channel') from a messages table
+
+    With typed, timestamps are UTC datetime64 with NaT instead of 0,
+    low-cardinality strings are categoricals, counts are int32 and
+    reply_users is a list column instead of a comma-joined string.
+    """
+    messages = messages[messages['bot_id'].isna() & messages['real_name'].notna()]
+    has_replies = messages['reply_count'].notna()
+    if typed:
+        return categorize(pd.DataFrame({
+            'msg_type': messages['type'],
+            'msg_content': messages['text'],
+            'sender_name': messages['real_name'],
+            'msg_sent_time': epoch_to_datetime(messages['ts']),
+            'msg_dist_type': messages['dist_type'],
+            'time_thread_start': epoch_to_datetime(messages['thread_ts']),
+            'reply_count': messages['reply_count'].fillna(0).astype('int32'),
+            'reply_users_count': messages['reply_users_count'].where(has_replies, 0).astype('int32'),
+            'reply_users': list_column(messages['reply_users']),
+            'tm_thread_end': epoch_to_datetime(messages['latest_reply'].where(has_replies)),
+        }).reset_index(drop=True))
+
+    return pd.DataFrame({
+        'msg_type': messages['type'],
+        'msg_content': messages['text'],
+        'sender_name': messages['real_name'],
+        'msg_sent_time': messages['ts'],
+        'msg_dist_type': messages['dist_type'],
+        'time_thread_start': messages['thread_ts'].fillna(0),
+        'reply_count': messages['reply_count'].fillna(0).astype('int64'),
+        'reply_users_count': messages['reply_users_count'].where(has_replies, 0).astype('int64'),
+        'reply_users': messages['reply_users'].map(lambda users: 0 if users is None else ",".join(users)),
+        'tm_thread_end': messages['latest_reply'].where(has_replies, 0),
+    }).reset_index(drop=True).infer_objects()
+
+
+def reaction_frame(reactions, messages):
+    """parse_slack_reaction columns (without 'channel') from the reactions and messages tables"""
+    columns = ['reaction_name', 'reaction_count', 'reaction_users_count', 'message', 'user_id']
+    if reactions.empty:
+        return pd.DataFrame(columns=columns)
+
+    keys = _message_keys(reactions)
+    reactions = reactions.merge(messages[keys + ['text']], on=keys, how='left')
+    return pd.DataFrame({
+        'reaction_name': reactions['name'],
+        'reaction_count': reactions['count'].astype('int64'),
+        'reaction_users_count': reactions['users'].map(",".join),
+        'message': reactions['text'],
+        'user_id': reactions['msg_user'],
+    })
+
+
+def message_texts(messages):
+    """(text, ts) of every message without a subtype, as get_all_channels_messages returns"""
+    messages = messages[messages['subtype'].isna()]
+    return list(zip(messages['text'], messages['ts']))
+
+
+def reply_threads(replies):
+    """replies grouped per thread parent, as get_all_channels_replies returns"""
+    replies = replies[replies['thread_ts'].notna() & replies['message_id'].notna()]
+    records = replies[['user', 'ts', 'thread_ts', 'message_id']].to_dict('records')
+    threads, previous = [], None
+    for key, record in zip(replies[_message_keys(replies)].itertuples(index=False), records):
+        if key != previous:
+            threads.append([])
+            previous = key
+        threads[-1].append(record)
+    return threads
+
+
+def community_participation(replies):
+    """number of thread replies per user, as get_community_participation returns"""
+    return replies.groupby('user', sort=False).size().to_dict()
+
+
+def messages_dict_frame(tables):
+    """get_messages_dict columns, one row per message without a subtype
+
+    Args:
+        tables (dict): the messages, replies, reactions, mentions, emojis
+            and links tables of the same messages
+
+    Returns:
+        pd.DataFrame
+    """
+    messages = tables['messages']
+    messages = messages[messages['subtype'].isna()]
+    keys = _message_keys(messages)
+    # a single key groups into a flat index, several into a MultiIndex
+    index = pd.MultiIndex.from_frame(messages[keys]) if len(keys) > 1 else pd.Index(messages[keys[0]])
+    has_blocks = messages['has_blocks'].to_numpy()
+
+    def collect(table, make):
+        """per message list built from the rows of table, aligned with messages"""
+        if table.empty:
+            return pd.Series([None] * len(index), index=index, dtype=object)
+        values = pd.Series([make(row) for row in table.itertuples(index=False)], index=table.index)
+        grouped = values.groupby([table[key] for key in keys], sort=False).agg(list)
+        return grouped.reindex(index)
+
+    def block_lists(table, make):
+        lists = collect(table, make)
+        return [found if isinstance(found, list) else ([] if blocks else None)
+                for found, blocks in zip(lists, has_blocks)]
+
+    reactions = collect(tables['reactions'], lambda r: {'name': r.name, 'users': list(r.users), 'count': r.count})
+    replies = collect(tables['replies'], lambda r: {'user': r.user, 'ts': r.ts})
+    links = block_lists(tables['links'], lambda r: r.url)
+    in_thread = (messages['thread_ts'].notna() & messages['reply_users'].notna()).to_numpy()
+
+    return pd.DataFrame({
+        'msg_id': messages['msg_id'].to_numpy(),
+        'text': messages['text'].to_numpy(),
+        'user': messages['user'].to_numpy(),
+        'mentions': block_lists(tables['mentions'], lambda r: r.user_id),
+        'emojis': block_lists(tables['emojis'], lambda r: r.name),
+        'reactions': [found if isinstance(found, list) else None for found in reactions],
+        'replies': [(found if isinstance(found, list) else []) if thread else None
+                    for found, thread in zip(replies, in_thread)],
+        'replies_to': messages['ts'].where(messages['parent_user_id'].notna(), None).to_numpy(),
+        'ts': messages['ts'].to_numpy(),
+        'links': links,
+        'link_count': [len(found) if found is not None else 0 for found in links],
+    })
@@ -0,0 +1,100 @@
+"""Refresh the stores built from a slack export in one pass over its day files.
+
+Every store keeps its own folder and manifest (see src.manifest), but a
+refresh through here reads and extracts each new or changed day file once
+for all of them, instead of once per store:
+
+    .slack_engagement         src.engagement.EngagementCube
+    .slack_active_users       src.active_users.ActiveUsers
+    .slack_term_sketches      src.term_sketches.TermSketches
+    .slack_word_frequencies   src.word_frequencies.WordFrequencies
+    .slack_topics             src.topics.TopicCorpus, then its LDA model
+
+Usage:
+    python -m src.ingest --path anonymized
+    python -m src.ingest --path anonymized --store engagement --store term_sketches
+    python -m src.ingest --path anonymized --root .. --retrain --train-workers 3
+
+"""
+import os
+import argparse
+
+from src.manifest import ingest
+from src.engagement import EngagementCube
+from src.active_users import ActiveUsers
+from src.term_sketches import TermSketches
+from src.word_frequencies import WordFrequencies
+from src.topics import TopicCorpus, update_model
+
+
+# store name -> (default folder, class)
+STORES = {
+    'engagement': ('.slack_engagement', EngagementCube),
+    'active_users': ('.slack_active_users', ActiveUsers),
+    'term_sketches': ('.slack_term_sketches', TermSketches),
+    'word_frequencies': ('.slack_word_frequencies', WordFrequencies),
+    'topics': ('.slack_topics', TopicCorpus),
+}
+
+
+def open_stores(names=None, root='.'):
+    """the stores of the given names, in their default folders under root
+
+    Args:
+        names (list of str): keys of STORES, defaults to all of them
+        root (str): folder the store folders are kept in
+
+    Returns:
+        dict: name -> store
+    """
+    return {name: STORES[name][1](os.path.join(root, STORES[name][0])) for name in (names or STORES)}
+
+
+def refresh_all(export_path, names=None, root='.', channels=None, workers=1, retrain=False, train_workers=None):
+    """bring the stores of the given names up to date in one pass and save them
+
+    The topic model is trained or updated after the pass, as refresh_topics does.
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        names (list of str): keys of STORES, defaults to all of them
+        root (str): folder the store folders are kept in
+        channels (list of str): channels to include, defaults to all of them
+        workers (int): worker processes for the text normalization of the topics
+        retrain, train_workers: see src.topics.refresh_topics
+
+    Returns:
+        tuple: (dict name -> store, dict name -> list of the keys (re)built or dropped)
+    """
+    stores = open_stores(names, root)
+    if 'topics' in stores:
+        stores['topics'].workers = workers
+
+    updated = dict(zip(stores, ingest(export_path, list(stores.values()), channels)))
+    for name, store in stores.items():
+        if name == 'topics':
+            update_model(store, updated[name], retrain, train_workers)
+        elif updated[name]:
+            store.save()
+    return stores, updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Refresh the stores built from a slack export in one pass')
+    parser.add_argument('--path', required=True, help='slack exported data folder or ZIP file')
+    parser.add_argument('--root', default='.', help='folder the store folders are kept in')
+    parser.add_argument('--store', action='append', choices=list(STORES),
+                        help='only refresh this store (repeatable), all of them by default')
+    parser.add_argument('--channel', action='append', help='only include this channel (repeatable)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the text normalization')
+    parser.add_argument('--retrain', action='store_true', help='train a new topic model on the whole corpus')
+    parser.add_argument('--train-workers', type=int,
+                        help='LdaMulticore worker processes for the topic model (default: one per core), '
+                             '1 for a single-core LdaModel')
+    args = parser.parse_args()
+
+    stores, updated = refresh_all(args.path, args.store, args.root, args.channel, args.workers, args.retrain,
+                                  args.train_workers)
+    for name, store in stores.items():
+        size = f"{len(store.table)} rows" if hasattr(store, 'table') else f"{len(store.dictionary)} words"
+        print(f"{name}: {len(updated[name])} updated, {size}")
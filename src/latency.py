@@ -0,0 +1,115 @@
+"""Reply latency of the threads of a slack export.
+
+Answers "which messages are replied faster than others?" from the arrays
+of a src.threads.ThreadIndex, without looping over threads or replies:
+
+    first_reply   seconds from the parent message to its first reply
+    last_reply    seconds from the parent message to its last reply, the
+                  time the thread took to settle
+    reply gaps    seconds between consecutive replies of the same thread
+
+thread_latency returns one row per thread with the columns to break the
+latencies down by (channel, kind of parent message, weekday and hour it
+was posted, role of its sender), and latency_summary turns any of them
+into counts and percentiles per group.
+
+"""
+import numpy as np
+import pandas as pd
+
+from src.extract import epoch_to_datetime
+
+
+PERCENTILES = (0.5, 0.75, 0.9, 0.99)
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def sender_roles(messages, users=None):
+    """'bot', 'owner', 'admin' or 'member' for the sender of every message
+
+    Args:
+        messages (pd.DataFrame): messages with user and bot_id columns
+        users (src.users.UserDirectory): gives the admin, owner and bot
+            flags of the users; without it only bot_id marks bots
+    """
+    is_bot = messages['bot_id'].notna().to_numpy()
+    is_owner = is_admin = np.zeros(len(messages), dtype=bool)
+    if users is not None:
+        flags = users.frame[['is_bot', 'is_admin', 'is_owner']].reindex(messages['user']).fillna(False)
+        is_bot = is_bot | flags['is_bot'].to_numpy(dtype=bool)
+        is_admin, is_owner = flags['is_admin'].to_numpy(dtype=bool), flags['is_owner'].to_numpy(dtype=bool)
+    return pd.Categorical(np.select([is_bot, is_owner, is_admin], ['bot', 'owner', 'admin'], 'member'),
+                          categories=['member', 'admin', 'owner', 'bot'])
+
+
+def thread_latency(index, users=None, tz='UTC'):
+    """first and last reply latency of every thread whose parent is loaded
+
+    Args:
+        index (src.threads.ThreadIndex): threads of the messages
+        users (src.users.UserDirectory): to tell admins and owners apart
+        tz (str): time zone of the weekday and hour columns
+
+    Returns:
+        pd.DataFrame: one row per thread with its key, 'parent_user',
+            'n_replies', the 'first_reply' and 'last_reply' latencies in
+            seconds (NaN without replies) and the breakdown columns
+            'subtype', 'dist_type', 'is_question', 'weekday', 'hour' and
+            'role' of the parent message
+    """
+    threads = index.threads[index.threads['parent'] >= 0]
+    parents = index.messages.iloc[threads['parent'].to_numpy()]
+    posted = epoch_to_datetime(threads['thread_ts']).dt.tz_convert(tz)
+
+    table = threads[index.keys + ['parent_user', 'n_replies']].reset_index(drop=True)
+    table['first_reply'] = (threads['first_reply'] - threads['thread_start']).to_numpy()
+    table['last_reply'] = (threads['last_reply'] - threads['thread_start']).to_numpy()
+    table['subtype'] = parents['subtype'].fillna('message').to_numpy()
+    table['dist_type'] = parents['dist_type'].to_numpy()
+    table['is_question'] = parents['text'].str.contains('?', regex=False).fillna(False).to_numpy(dtype=bool)
+    table['weekday'] = pd.Categorical(posted.dt.day_name(), categories=WEEKDAYS, ordered=True)
+    table['hour'] = posted.dt.hour.to_numpy()
+    table['role'] = sender_roles(parents, users)
+    return table
+
+
+def reply_gaps(index):
+    """seconds between consecutive replies of every thread
+
+    Returns:
+        pd.DataFrame: the thread key and 'gap' of every reply after the
+            first one of its thread, in thread and ts order
+    """
+    ts = pd.to_numeric(index.messages['ts'].iloc[index.order], errors='coerce').to_numpy(dtype='float64')
+    thread = index.thread[index.order]
+    # a gap only counts between two replies of the same thread
+    same = thread[1:] == thread[:-1]
+    gaps = index.threads[index.keys].iloc[thread[1:][same]].reset_index(drop=True)
+    gaps['gap'] = np.diff(ts)[same]
+    return gaps
+
+
+def latency_summary(table, column='first_reply', by=None, percentiles=PERCENTILES, unit='s'):
+    """count, mean and percentiles of a latency column, overall or per group
+
+    Args:
+        table (pd.DataFrame): thread_latency or reply_gaps table
+        column (str): 'first_reply', 'last_reply' or 'gap'
+        by (str or list of str): columns to break the latencies down by
+        percentiles (tuple of float): quantiles to report, as p50, p90, ...
+        unit (str): 's', 'min', 'h' or 'd'
+
+    Returns:
+        pd.DataFrame: one row per group ('all' without by)
+    """
+    values = table[column] / pd.Timedelta(1, unit=unit).total_seconds()
+    keys = [table[key] for key in ([by] if isinstance(by, str) else by)] if by else np.zeros(len(table), dtype=int)
+    grouped = values.groupby(keys, observed=True, sort=True)
+
+    summary = pd.DataFrame({'count': grouped.count(), 'mean': grouped.mean()})
+    quantiles = grouped.quantile(list(percentiles)).unstack().reindex(columns=list(percentiles))
+    quantiles.columns = [f'p{round(q * 100):g}' for q in percentiles]
+    summary = summary.join(quantiles)
+    if not by:
+        summary.index = pd.Index(['all'] * len(summary))
+    return summary
@@ -1,3 +1,4 @@
+import re
 import json
 import fnmatch
 import argparse
@@ -7,10 +8,23 @@ import glob
 import io
 import shutil
 import copy
+import zipfile
+import time
 from datetime import datetime
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from functools import lru_cache, cached_property
 from pick import pick
 from time import sleep
 
+try:
+    from src import decode
+except ImportError:  # run as a script from src/
+    import decode
+
+
+DAY_FILE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}\.json$')
+
 
 # Create wrapper classes for using slack_sdk in place of slacker
 class SlackDataLoader:
@@ -28,13 +42,22 @@ class SlackDataLoader:
     These files contain metadata about the conversations, including their names and IDs.
 
     For secruity reason, we have annonymized names - the names you will see are generated using faker library.
+
+    The export can be read either from the extracted folder or straight
+    from the ZIP file, in which case members are streamed one by one
+    without extracting anything to disk.
+
+    The message accessors take an optional start/end date range. The day
+    files of each channel are listed once into a sorted date index, and
+    files outside the range are skipped without being opened.
     
     '''
     def __init__(self, path):
         '''
-        path: path to the slack exported data folder
+        path: path to the slack exported data folder or ZIP file
         '''
         self.path = path
+        self._day_index = {}
         self.channels = self.get_channels()
         self.users = self.get_users()
     
@@ -43,8 +66,8 @@ class SlackDataLoader:
         '''
         write a function to get all the users from the json file
         '''
-        with open(os.path.join(self.path, 'users.json'), 'r') as f:
-            users = json.load(f)
+        with open_export_file(os.path.join(self.path, 'users.json')) as f:
+            users = decode.load(f)
 
         return users
     
@@ -52,63 +75,233 @@ class SlackDataLoader:
         '''
         write a function to get all the channels from the json file
         '''
-        with open(os.path.join(self.path, 'channels.json'), 'r') as f:
-            channels = json.load(f)
+        with open_export_file(os.path.join(self.path, 'channels.json')) as f:
+            channels = decode.load(f)
 
         return channels
 
-    def get_channel_messages(self, channel_name):
+    def get_channel_days(self, channel_name, start=None, end=None):
         '''
-        write a function to get all the messages from a channel
-        
+        Day files of a channel between start and end, both inclusive.
+
+        Args:
+            channel_name (str): name of the channel folder
+            start, end (str, date or datetime): first and last day to keep,
+                unbounded when None
+
+        Returns:
+            list of str: YYYY-MM-DD.json file names in date order
         '''
+        if channel_name not in self._day_index:
+            self._day_index[channel_name] = list_day_files(os.path.join(self.path, channel_name))
+        return select_day_files(self._day_index[channel_name], start, end)
+
+    def get_channel_messages(self, channel_name, chunk_size=None,
+                             exclude_subtypes=False, exclude_bots=False,
+                             start=None, end=None):
+        '''
+        Lazily iterate over the messages of a channel in timestamp order.
+
+        Day files are opened one at a time, in date order, and each one is
+        released before the next is read, so memory stays bounded by the
+        largest day file rather than the whole channel history. Only the
+        YYYY-MM-DD.json day files are read, see list_day_files.
+
+        Args:
+            channel_name (str): name of the channel folder
+            chunk_size (int): if given, yield lists of at most chunk_size
+                messages instead of single messages
+            exclude_subtypes (bool or iterable): drop every message that has
+                a subtype (True) or only those with one of the given subtypes
+            exclude_bots (bool): drop messages posted by bots
+            start, end (str, date or datetime): only read the day files from
+                start to end, both inclusive
+
+        Yields:
+            dict or list of dict: messages, or chunks of messages
+        '''
+        if not isinstance(exclude_subtypes, bool):
+            exclude_subtypes = frozenset(exclude_subtypes)
+
+        day_files = self.get_channel_days(channel_name, start, end)
+        messages = self._iter_channel_messages(channel_name, day_files, exclude_subtypes, exclude_bots)
+        if chunk_size is None:
+            yield from messages
+            return
+
+        while True:
+            chunk = list(islice(messages, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _iter_channel_messages(self, channel_name, day_files, exclude_subtypes, exclude_bots):
+        channel_path = os.path.join(self.path, channel_name)
+        for day_file in day_files:
+            with open_export_file(os.path.join(channel_path, day_file)) as f:
+                day_messages = decode.load(f)
+
+            day_messages.sort(key=lambda msg: float(msg['ts']))
+            for msg in day_messages:
+                if _is_excluded(msg, exclude_subtypes, exclude_bots):
+                    continue
+                yield msg
+
+    @cached_property
+    def user_directory(self):
+        '''
+        Indexed, read-only directory of the users (see src.users), built
+        once per loader from users.json and users_old_new.json.
+        '''
+        from src.users import UserDirectory, read_old_new  # src.users imports this module
+
+        return UserDirectory(self.users, read_old_new(self.path))
 
     # 
     def get_user_map(self):
         '''
         write a function to get a map between user id and user name
+
+        Both maps are read-only views kept by the user directory, so
+        repeated calls cost nothing.
         '''
-        userNamesById = {}
-        userIdsByName = {}
-        for user in self.users:
-            userNamesById[user['id']] = user['name']
-            userIdsByName[user['name']] = user['id']
-        return userNamesById, userIdsByName  
-
-
-
-def parse_slack_reaction(path, channel):
-    """get reactions"""
-    dfall_reaction = pd.DataFrame()
-    combined = []
-
-    for json_file in glob.glob(f"{path}*.json"):
-        with open(json_file, 'r') as slack_data:
-            combined.append(slack_data)
-
-    reaction_name, reaction_count, reaction_users, msg, user_id = [], [], [], [], []
-
-    for k in combined:
-        slack_data = json.load(open(k.name, 'r', encoding="utf-8"))
-        
-        for i_count, i in enumerate(slack_data):
-            if 'reactions' in i.keys():
-                for j in range(len(i['reactions'])):
-                    msg.append(i['text'])
-                    user_id.append(i['user'])
-                    reaction_name.append(i['reactions'][j]['name'])
-                    reaction_count.append(i['reactions'][j]['count'])
-                    reaction_users.append(",".join(i['reactions'][j]['users']))
-                
-    data_reaction = zip(reaction_name, reaction_count, reaction_users, msg, user_id)
-    columns_reaction = ['reaction_name', 'reaction_count', 'reaction_users_count', 'message', 'user_id']
-    df_reaction = pd.DataFrame(data=data_reaction, columns=columns_reaction)
+        return self.user_directory.names_by_id, self.user_directory.ids_by_name
+
+
+
+def _split_zip_path(path):
+    """split 'export.zip/channel/day.json' into ('export.zip', 'channel/day.json')
+
+    Paths that do not go through a ZIP file come back as (None, path).
+    """
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(1, len(parts) + 1):
+        archive = os.sep.join(parts[:i])
+        if archive.endswith('.zip') and os.path.isfile(archive):
+            return archive, '/'.join(parts[i:])
+    return None, path
+
+
+@lru_cache(maxsize=None)
+def _open_archive(archive, pid):
+    """open a ZIP export once per process and locate the folder holding users.json
+
+    The pid is part of the cache key so forked workers never share the
+    parent's file offset.
+    """
+    zf = zipfile.ZipFile(archive)
+    refs = [name for name in zf.namelist()
+            if os.path.basename(name) in ('users.json', 'channels.json')]
+    root = os.path.dirname(min(refs, key=len)) if refs else ''
+    return zf, root
+
+
+def _zip_member(path):
+    """resolve a path inside a ZIP export to (ZipFile, member name), or (None, path)"""
+    archive, inner = _split_zip_path(path)
+    if archive is None:
+        return None, path
+    zf, root = _open_archive(archive, os.getpid())
+    return zf, '/'.join(part for part in (root, inner) if part and part != '.')
+
+
+def open_export_file(path):
+    """open a file of the export for binary reading, from disk or from inside a ZIP"""
+    zf, member = _zip_member(path)
+    if zf is None:
+        return open(path, 'rb')
+    return zf.open(member)
+
+
+def export_file_stat(path):
+    """(size, mtime) of a file of the export, from disk or from inside a ZIP"""
+    zf, member = _zip_member(path)
+    if zf is None:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    info = zf.getinfo(member)
+    return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+
+
+def is_day_file(name):
+    """check that a file name is a YYYY-MM-DD.json day file"""
+    return DAY_FILE_RE.match(name) is not None
+
+
+def list_day_files(path_channel, start=None, end=None):
+    """list the YYYY-MM-DD.json day files of a channel folder in date order
+
+    Other .json files (the tss.json of some channels only repeats
+    messages of the day files) are left out, so they never break the
+    date order. start and end (both inclusive) restrict the list by the
+    dates in the file names, so nothing outside the range is ever opened.
+    """
+    zf, member = _zip_member(path_channel)
+    if zf is None:
+        names = [f for f in os.listdir(path_channel) if f.endswith('.json')]
+    else:
+        prefix = member.rstrip('/') + '/'
+        names = (name[len(prefix):] for name in zf.namelist() if name.startswith(prefix))
+        names = [name for name in names if name.endswith('.json') and '/' not in name]
+    day_files = sorted(name for name in names if is_day_file(name))
+    return select_day_files(day_files, start, end)
+
+
+def to_day(value):
+    """YYYY-MM-DD string of a date, datetime, pandas Timestamp or ISO date string"""
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime('%Y-%m-%d')
+
+
+def select_day_files(day_files, start=None, end=None):
+    """slice of a sorted list of day files between start and end, both inclusive
+
+    The file names start with their date, so the bounds are found by
+    bisection instead of parsing every name.
+    """
+    lo = 0 if start is None else bisect_left(day_files, to_day(start))
+    # '2022-08-21.json' sorts after '2022-08-21' and before '2022-08-21/'
+    hi = len(day_files) if end is None else bisect_right(day_files, to_day(end) + '/')
+    return day_files[lo:hi]
+
+
+def _is_excluded(msg, exclude_subtypes, exclude_bots):
+    """check a message against the subtype/bot filters of get_channel_messages"""
+    if exclude_bots and ('bot_id' in msg or msg.get('subtype') == 'bot_message'):
+        return True
+    if exclude_subtypes is True:
+        return 'subtype' in msg
+    if exclude_subtypes:
+        return msg.get('subtype') in exclude_subtypes
+    return False
+
+
+def parse_slack_reaction(path, channel, cache_dir=None, start=None, end=None):
+    """get reactions
+
+    With a cache_dir (see src.cache) the reactions are read from the
+    columnar cache unless it is stale for this channel. start and end
+    restrict them to the messages of those days, both inclusive.
+    """
+    from src.cache import channel_tables  # src.cache imports this module
+    from src.extract import reaction_frame
+
+    tables = channel_tables(path, ['reactions', 'messages'], cache_dir, start, end)
+    df_reaction = reaction_frame(tables['reactions'], tables['messages'])
     df_reaction['channel'] = channel
     return df_reaction
 
 
+def msg_dist_type(row):
+    """type of the first rich text element of a message, 'reshared' if it has none"""
+    if 'blocks' in row and row['blocks'] and len(row['blocks']) > 0 and 'elements' in row['blocks'][0] and row['blocks'][0]['elements'] and len(row['blocks'][0]['elements']) > 0 and 'elements' in row['blocks'][0]['elements'][0] and row['blocks'][0]['elements'][0]['elements'] and len(row['blocks'][0]['elements'][0]['elements']) > 0:
+        return row['blocks'][0]['elements'][0]['elements'][0]['type']
+    return 'reshared'
+
+
 # combine all json file in all-weeks8-9
-def slack_parser(path_channel):
+def slack_parser(path_channel, cache_dir=None, start=None, end=None, typed=False):
     """ parse slack data to extract useful informations from the json file
         step of execution
         1. Import the required modules
@@ -117,83 +310,70 @@ def slack_parser(path_channel):
         4. extract all required informations from the slack data
         5. convert to dataframe and merge all
         6. reset the index and return dataframe
+
+        Steps 2-4 are the single-pass extraction of src.extract, or a read
+        of the columnar cache when a fresh cache_dir (see src.cache) is given.
+        With start and/or end only the day files in that range (both
+        inclusive) are read.
+
+        typed returns memory-optimized columns instead: categoricals,
+        UTC datetime64 timestamps with NaT for missing ones and a list
+        column of reply_users (see src.extract.slack_frame).
     """
-    
-    json_files = [f"{path_channel}/{pos_json}" for pos_json in os.listdir(path_channel) if pos_json.endswith('.json')]
-    combined = []
-
-    for json_file in json_files:
-        with open(json_file, 'r', encoding="utf8") as slack_data:
-            json_content = json.load(slack_data)
-            combined.append(json_content)
-        
-
-    # print(combined)
-    # loop through all json files and extract required informations
-    dflist = []
-
-    for slack_data in combined:
-        
-        msg_type, msg_content, sender_id, time_msg, msg_dist, time_thread_st, reply_users, \
-        reply_count, reply_users_count, tm_thread_end = [],[],[],[],[],[],[],[],[],[]
-        
-        for row in slack_data:
-            if 'bot_id' in row.keys():
-                continue
-            else:
-                msg_type.append(row['type'])
-                msg_content.append(row['text'])
-
-                if 'user_profile' in row.keys(): sender_id.append(row['user_profile']['real_name'])
-                else: sender_id.append('Not provided')
-
-                time_msg.append(row['ts'])
-                if 'blocks' in row and row['blocks'] and len(row['blocks']) > 0 and 'elements' in row['blocks'][0] and row['blocks'][0]['elements'] and len(row['blocks'][0]['elements']) > 0 and 'elements' in row['blocks'][0]['elements'][0] and row['blocks'][0]['elements'][0]['elements'] and len(row['blocks'][0]['elements'][0]['elements']) > 0:
-                    msg_dist.append(row['blocks'][0]['elements'][0]['elements'][0]['type'])
-                else: msg_dist.append('reshared')
-
-                if 'thread_ts' in row.keys():
-                    time_thread_st.append(row['thread_ts'])
-                else:
-                    time_thread_st.append(0)
-
-                if 'reply_users' in row.keys():
-                    reply_users.append(",".join(row['reply_users']))                        
-                else:    
-                    reply_users.append(0)
-
-                if 'reply_count' in row.keys():
-                    reply_count.append(row['reply_count'])
-                    reply_users_count.append(row['reply_users_count'])
-                    tm_thread_end.append(row['latest_reply'])
-                else:
-                    reply_count.append(0)
-                    reply_users_count.append(0)
-                    tm_thread_end.append(0)
-        
-
-        data = zip(msg_type, msg_content, sender_id, time_msg, msg_dist, time_thread_st,
-        reply_count, reply_users_count, reply_users, tm_thread_end)
-
-        columns = ['msg_type', 'msg_content', 'sender_name', 'msg_sent_time', 'msg_dist_type',
-        'time_thread_start', 'reply_count', 'reply_users_count', 'reply_users', 'tm_thread_end']
-
-        df = pd.DataFrame(data=data, columns=columns)
-        # print(df['channel'])
-
-        df = df[df['sender_name'] != 'Not provided']
-        dflist.append(df)
-    
+    from src.cache import channel_tables  # src.cache imports this module
+    from src.extract import slack_frame, categorize
 
-    # print(len(dflist))
-    dfall = pd.concat(dflist, ignore_index=True)
+    messages = channel_tables(path_channel, ['messages'], cache_dir, start, end)['messages']
+    dfall = slack_frame(messages, typed)
     dfall['channel'] = path_channel.split('/')[-2].split('.')[0]        
     dfall = dfall.reset_index(drop=True)
+    if typed:
+        dfall = categorize(dfall)
     
     return dfall
-    
+
+
+def parallel_slack_parser(root_dir, channel_names, workers=None, start=None, end=None, typed=False):
+    """parse several channels with a process pool
+
+    Every day file of every channel is an independent task, so the work is
+    spread over the pool at day-file granularity and re-assembled per
+    channel afterwards. The result is the same dataframe as concatenating
+    slack_parser(root_dir + channel + '/') for each channel in order.
+
+    Args:
+        root_dir (str): path to the slack exported data folder
+        channel_names (list of str): channel folders to parse
+        workers (int): number of worker processes, defaults to the cpu count
+        start, end (str, date or datetime): only parse the day files from
+            start to end, both inclusive
+        typed (bool): memory-optimized dtypes, as in slack_parser
+
+    Returns:
+        pd.DataFrame: combined slack_parser output of all the channels
+    """
+    from src.extract import extract_export, slack_frame, categorize
+
+    messages = extract_export(root_dir, channel_names, workers, start, end)['messages']
+    data_frames = []
+    for channel in channel_names:
+        dfall = slack_frame(messages[messages['channel'] == channel], typed)
+        dfall['channel'] = channel
+        data_frames.append(dfall)
+
+    combined = pd.concat(data_frames, ignore_index=True)
+    return categorize(combined) if typed else combined
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Export Slack history')
 
     parser.add_argument('--zip', help="Name of a zip file to import")
     args = parser.parse_args()
+
+    if args.zip:
+        loader = SlackDataLoader(args.zip)
+        print(f"{len(loader.users)} users, {len(loader.channels)} channels")
+        for channel in loader.channels:
+            n_messages = sum(len(chunk) for chunk in loader.get_channel_messages(channel['name'], chunk_size=1000))
+            print(f"{channel['name']}: {n_messages} messages")
@@ -0,0 +1,324 @@
+"""Manifest of the day files ingested from a slack export.
+
+For every channel the manifest records the size, modification time and
+content hash of each YYYY-MM-DD.json day file that has been parsed. A
+refresh compares the export against it and only re-parses the day files
+that are new or whose content changed, so a nightly refresh costs time
+proportional to the new data rather than to the whole history.
+
+The stores built from the day files (engagement counts, sketches, word
+counts, the topic corpus) are DayStore subclasses, each with its own
+manifest. ingest brings any number of them up to date in one pass: every
+new or changed day file is read and extracted once, and its tables are
+handed to each store that needs them:
+
+    refresh_stores('anonymized', [EngagementCube(folder), TermSketches(other_folder)])
+
+"""
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from src.loader import SlackDataLoader, list_day_files, open_export_file, export_file_stat
+from src.decode import decode_day
+from src.extract import extract_day
+
+
+MANIFEST_FILE = '_manifest.json'
+
+
+def file_digest(path):
+    """sha1 of a file of the export, read in blocks"""
+    digest = hashlib.sha1()
+    with open_export_file(path) as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Record of what has been ingested from an export.
+
+    Attributes:
+        source (str): absolute path of the export the manifest describes
+        channels (dict): channel -> day file -> {'size', 'mtime', 'sha1'}
+        version (int): format version of whatever was produced from the files
+
+    """
+
+    def __init__(self, source, channels=None, version=None):
+        self.source = os.path.abspath(source)
+        self.channels = channels or {}
+        self.version = version
+
+    @classmethod
+    def load(cls, folder):
+        """load the manifest saved in folder, or None if there is none"""
+        try:
+            with open(os.path.join(folder, MANIFEST_FILE), 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(data['source'], data['channels'], data.get('version'))
+
+    def save(self, folder):
+        with open(os.path.join(folder, MANIFEST_FILE), 'w') as f:
+            json.dump({'source': self.source, 'version': self.version, 'channels': self.channels}, f, indent=1)
+
+    def changes(self, channel):
+        """find the day files of a channel that need to be (re)parsed
+
+        Files whose size and mtime match the manifest are skipped without
+        being read. Files that were only touched (same size and hash, new
+        mtime) get their entry refreshed in place rather than reported.
+
+        Args:
+            channel (str): channel folder name
+
+        Returns:
+            tuple: (list of new or modified day files, list of removed day files)
+        """
+        recorded = self.channels.get(channel, {})
+        channel_path = os.path.join(self.source, channel)
+        current = list_day_files(channel_path)
+
+        changed = []
+        for day_file in current:
+            path = os.path.join(channel_path, day_file)
+            size, mtime = export_file_stat(path)
+            entry = recorded.get(day_file)
+            if entry is not None and entry['size'] == size:
+                if entry['mtime'] == mtime:
+                    continue
+                if entry['sha1'] == file_digest(path):
+                    entry['mtime'] = mtime
+                    continue
+            changed.append(day_file)
+
+        removed = sorted(set(recorded) - set(current))
+        return changed, removed
+
+    def is_stale(self, channel):
+        """cheap check, from file stats only, that a channel changed since it was recorded"""
+        recorded = self.channels.get(channel)
+        if recorded is None:
+            return True
+
+        channel_path = os.path.join(self.source, channel)
+        current = list_day_files(channel_path)
+        if len(current) != len(recorded):
+            return True
+        for day_file in current:
+            entry = recorded.get(day_file)
+            if entry is None:
+                return True
+            size, mtime = export_file_stat(os.path.join(channel_path, day_file))
+            if (entry['size'], entry['mtime']) != (size, mtime):
+                return True
+        return False
+
+    def record(self, channel, day_file, sha1=None):
+        """store the current size, mtime and hash of a day file
+
+        Pass the sha1 when the caller already read the file, to avoid
+        reading it a second time.
+        """
+        path = os.path.join(self.source, channel, day_file)
+        size, mtime = export_file_stat(path)
+        self.channels.setdefault(channel, {})[day_file] = {
+            'size': size, 'mtime': mtime, 'sha1': sha1 or file_digest(path)}
+
+    def forget(self, channel, day_file):
+        self.channels.get(channel, {}).pop(day_file, None)
+
+
+def day_name(day_file):
+    """day of a YYYY-MM-DD.json day file"""
+    return day_file[:-len('.json')]
+
+
+class DayStore:
+    """Something built from the day files of an export and kept up to date by ingest.
+
+    The store keeps a Manifest of the day files it was built from in its
+    folder, and is rebuilt from scratch when its version or export change.
+    Subclasses set version and implement
+
+        reset()                     forget everything built so far
+        add(channel, days, removed) build from the extract_day tables of
+                                    the days read ({day: tables}) and drop
+                                    the removed days; returns the keys
+                                    (re)built or dropped
+        save()                      write what was built, then the manifest
+
+    and may override wanted() to be handed more than the changed days, and
+    finish() to act once all the channels were added.
+
+    Args:
+        folder (str): folder the store is kept in
+
+    """
+
+    version = None
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest = Manifest.load(folder)
+
+    @classmethod
+    def refresh(cls, export_path, folder, channels=None, **kwargs):
+        """load the store of a folder, bring it up to date with the export and save it"""
+        store = cls(folder, **kwargs)
+        refresh_stores(export_path, [store], channels)
+        return store
+
+    def update(self, export_path, channels=None):
+        """add the new, changed and removed day files of an export
+
+        Args:
+            export_path (str): slack exported data folder or ZIP file
+            channels (list of str): channels to add, defaults to all of them
+
+        Returns:
+            list of tuple: the keys that were (re)built or dropped
+        """
+        return ingest(export_path, [self], channels)[0]
+
+    def start(self, export_path):
+        """reset the store unless it was built from this export and version"""
+        if self.manifest is None or self.manifest.version != self.version \
+                or self.manifest.source != os.path.abspath(export_path):
+            os.makedirs(self.folder, exist_ok=True)
+            self.manifest = Manifest(export_path, version=self.version)
+            self.reset()
+
+    def reset(self):
+        raise NotImplementedError
+
+    def wanted(self, channel, changed, removed):
+        """day files of a channel to hand to add, the changed ones by default"""
+        return changed
+
+    def add(self, channel, days, removed):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def save(self):
+        self.manifest.save(self.folder)
+
+
+class TableStore(DayStore):
+    """DayStore that keeps one parquet table, with rows replaced per KEY.
+
+    Subclasses set FILE, COLUMNS ({column: dtype}), KEY (the columns of
+    the rows that are rebuilt together) and SORT, and call replace from add.
+
+    Attributes:
+        table (pd.DataFrame): the COLUMNS, sorted by SORT
+
+    """
+
+    FILE = None
+    COLUMNS = {}
+    KEY = ['channel', 'day']
+    SORT = ['channel', 'day']
+
+    def __init__(self, folder):
+        super().__init__(folder)
+        path = os.path.join(folder, self.FILE)
+        if self.manifest is not None and os.path.exists(path):
+            self.table = pd.read_parquet(path)
+        else:
+            self.table = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in self.COLUMNS.items()})
+        self._stale, self._frames = [], []
+
+    def reset(self):
+        self.table = self.table.iloc[:0]
+
+    def replace(self, keys, frame):
+        """queue the rows of frame in place of those of keys, until finish
+
+        Returns:
+            list of tuple: keys
+        """
+        self._stale.extend(keys)
+        if len(frame):
+            self._frames.append(frame)
+        return keys
+
+    def finish(self):
+        if self._stale:
+            table = self.table[~pd.MultiIndex.from_frame(self.table[self.KEY]).isin(self._stale)]
+            self.table = pd.concat([table] + self._frames, ignore_index=True).astype(self.COLUMNS)\
+                .sort_values(self.SORT, ignore_index=True)
+        self._stale, self._frames = [], []
+
+    def save(self):
+        self.table.to_parquet(os.path.join(self.folder, self.FILE), index=False)
+        super().save()
+
+
+def ingest(export_path, stores, channels=None):
+    """bring stores up to date with an export, reading each day file once
+
+    For every channel, each store's manifest lists its new, changed and
+    removed day files. The day files any store wants are read and
+    extracted once, handed to the stores that want them, and recorded in
+    the manifests of the stores they changed for.
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        stores (list of DayStore): stores to update
+        channels (list of str): channels to add, defaults to all of them
+
+    Returns:
+        list of list: the keys each store (re)built or dropped
+    """
+    for store in stores:
+        store.start(export_path)
+    source = os.path.abspath(export_path)
+
+    channels = channels or [channel['name'] for channel in SlackDataLoader(export_path).channels]
+    updated = [[] for _ in stores]
+    for channel in channels:
+        plans = []
+        for store in stores:
+            changed, removed = store.manifest.changes(channel)
+            for day_file in removed:
+                store.manifest.forget(channel, day_file)
+            plans.append((changed, removed, sorted(set(changed) | set(store.wanted(channel, changed, removed)))))
+
+        tables, digests = {}, {}
+        for day_file in sorted({day_file for _, _, wanted in plans for day_file in wanted}):
+            with open_export_file(os.path.join(source, channel, day_file)) as f:
+                raw = f.read()
+            tables[day_file] = extract_day(decode_day(raw))
+            digests[day_file] = hashlib.sha1(raw).hexdigest()
+
+        for store, (changed, removed, wanted), keys in zip(stores, plans, updated):
+            days = {day_name(day_file): tables[day_file] for day_file in wanted}
+            keys.extend(store.add(channel, days, [day_name(day_file) for day_file in removed]))
+            for day_file in changed:
+                store.manifest.record(channel, day_file, sha1=digests[day_file])
+            store.manifest.channels.setdefault(channel, {})
+
+    for store in stores:
+        store.finish()
+    return updated
+
+
+def refresh_stores(export_path, stores, channels=None):
+    """ingest an export into stores and save the ones that changed
+
+    Returns:
+        list of list: the keys each store (re)built or dropped
+    """
+    updated = ingest(export_path, stores, channels)
+    for store, keys in zip(stores, updated):
+        if keys:
+            store.save()
+    return updated
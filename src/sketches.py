@@ -0,0 +1,414 @@
+"""Bounded-memory streaming summaries of slack messages.
+
+SpaceSaving keeps the approximate top-k of a stream of items (senders,
+emojis, reactions, links, ...) in at most `capacity` counters, however
+long the stream is. With N the total count added:
+
+    - every item counted more than N / capacity times is in the summary
+    - an item's estimate never undercounts it and overcounts it by at
+      most its `error`, itself at most N / capacity
+    - estimate - error is a guaranteed lower bound of the true count
+
+Subtracting the smallest counter from every counter gives the
+Misra-Gries summary of the same stream, so the same bounds hold for it.
+Summaries of disjoint streams (channels, worker processes) merge into a
+summary of the whole with the same capacity and the same guarantees
+(Agarwal et al., Mergeable Summaries, 2012).
+
+heavy_hitters runs one summary per channel over
+SlackDataLoader.get_channel_messages, optionally in worker processes,
+and merges them.
+
+HyperLogLog estimates how many distinct items (users, ...) a stream has
+in 2**precision one-byte registers, with a relative standard error of
+about 1.04 / sqrt(2**precision) (1.6% with the default 4 KiB). Merging
+two of them is an element-wise max, so the distinct count of any union
+of (channel, day) groups is read from their sketches alone.
+
+CountMinSketch estimates the count of any item (word, emoji, ...) from a
+depth x width table of counters. An estimate never undercounts, and with
+probability 1 - exp(-depth) it overcounts by at most e / width of the
+total count. Merging two of them is an element-wise sum.
+
+"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.loader import SlackDataLoader
+from src.markup import tokenize
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent items of a stream.
+
+    Args:
+        capacity (int): number of counters; the count of any item is
+            overestimated by at most total / capacity
+
+    Attributes:
+        total (int): sum of the counts added so far
+
+    """
+
+    def __init__(self, capacity=100):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        # (count, item) of every counter, plus stale entries of counts that
+        # have grown since; the smallest live entry is the one to evict
+        self._heap = []
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def __getitem__(self, item):
+        """estimated count of an item, 0 if it has no counter"""
+        return self._counts.get(item, 0)
+
+    def error(self, item):
+        """by how much the estimate of an item may overcount it"""
+        return self._errors.get(item, self.min_count())
+
+    def min_count(self):
+        """smallest counter once the summary is full (an upper bound for the items it dropped), else 0"""
+        if len(self._counts) < self.capacity:
+            return 0
+        self._clean_heap()
+        return self._heap[0][0]
+
+    def add(self, item, count=1):
+        """count an item; a new item takes over the smallest counter when the summary is full"""
+        self.total += count
+        counts = self._counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self._errors[item] = 0
+        else:
+            self._clean_heap()
+            smallest, evicted = heapq.heappop(self._heap)
+            del counts[evicted], self._errors[evicted]
+            counts[item] = smallest + count
+            self._errors[item] = smallest
+        heapq.heappush(self._heap, (counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(value, key) for key, value in counts.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, items):
+        """count every item of an iterable, or of a mapping of item -> count"""
+        if hasattr(items, 'items'):
+            for item, count in items.items():
+                self.add(item, count)
+        else:
+            for item in items:
+                self.add(item)
+        return self
+
+    def _clean_heap(self):
+        heap, counts = self._heap, self._counts
+        while heap and counts.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def merge(self, other):
+        """summary of the two streams together, with the capacity of self
+
+        An item missing from a full summary may still have been counted up
+        to its min_count there, so that is added to its estimate and error.
+        """
+        floor_self, floor_other = self.min_count(), other.min_count()
+        merged = SpaceSaving(self.capacity)
+        merged.total = self.total + other.total
+        estimates = {}
+        for item in self._counts.keys() | other._counts.keys():
+            estimates[item] = (
+                self._counts.get(item, floor_self) + other._counts.get(item, floor_other),
+                self._errors.get(item, floor_self) + other._errors.get(item, floor_other),
+            )
+        for item, (count, error) in heapq.nlargest(self.capacity, estimates.items(),
+                                                   key=lambda entry: entry[1][0]):
+            merged._counts[item] = count
+            merged._errors[item] = error
+        merged._heap = [(count, item) for item, count in merged._counts.items()]
+        heapq.heapify(merged._heap)
+        return merged
+
+    def __or__(self, other):
+        return self.merge(other)
+
+    def top(self, n=None):
+        """(item, estimate, error) of the n items with the highest estimates"""
+        ranked = sorted(self._counts.items(), key=lambda entry: entry[1], reverse=True)
+        return [(item, count, self._errors[item]) for item, count in ranked[:n]]
+
+    def value_counts(self, n=None, name=None):
+        """the top n estimates as a Series, like value_counts().head(n)"""
+        top = self.top(n)
+        return pd.Series([count for _, count, _ in top], index=[item for item, _, _ in top],
+                         name=name, dtype='int64')
+
+    def frame(self, n=None):
+        """top n items with their estimate, error and guaranteed lower bound"""
+        top = pd.DataFrame(self.top(n), columns=['item', 'count', 'error'])
+        top['lower_bound'] = top['count'] - top['error']
+        return top.set_index('item')
+
+
+def message_senders(msg):
+    """real name of a message's sender, as the sender_name of slack_parser"""
+    if msg.get('bot_id') is None:
+        real_name = (msg.get('user_profile') or {}).get('real_name')
+        if real_name is not None:
+            yield real_name
+
+
+def message_reactions(msg):
+    """(reaction name, count) of a message's reactions"""
+    for reaction in msg.get('reactions') or []:
+        yield reaction['name'], reaction.get('count', 1)
+
+
+def message_emojis(msg):
+    """emoji names written in a message's text"""
+    return (token.value for token in tokenize(msg.get('text')) if token.kind == 'emoji')
+
+
+def message_links(msg):
+    """urls linked in a message's text"""
+    return (token.value for token in tokenize(msg.get('text')) if token.kind == 'link')
+
+
+def message_domains(msg):
+    """host names of the urls linked in a message's text"""
+    return (urlsplit(url).hostname or url for url in message_links(msg))
+
+
+ITEMS = {
+    'senders': message_senders,
+    'reactions': message_reactions,
+    'emojis': message_emojis,
+    'links': message_links,
+    'domains': message_domains,
+}
+
+
+def channel_summary(path, channel, what='senders', capacity=100, start=None, end=None):
+    """SpaceSaving summary of one kind of ITEMS over the messages of a channel"""
+    items = ITEMS[what]
+    summary = SpaceSaving(capacity)
+    for msg in SlackDataLoader(path).get_channel_messages(channel, start=start, end=end):
+        for item in items(msg):
+            if isinstance(item, tuple):
+                summary.add(*item)
+            else:
+                summary.add(item)
+    return summary
+
+
+def _channel_summary(task):
+    return channel_summary(*task)
+
+
+def heavy_hitters(path, what='senders', capacity=100, channels=None, workers=1, start=None, end=None):
+    """merged SpaceSaving summary of one kind of ITEMS over the channels of an export
+
+    Each channel is streamed one day file at a time into its own summary,
+    so memory stays at capacity counters per channel whatever the export
+    size, and the summaries are merged at the end.
+
+    Args:
+        path (str): slack exported data folder or ZIP file
+        what (str): 'senders', 'reactions', 'emojis', 'links' or 'domains'
+        capacity (int): counters per summary
+        channels (list of str): channels to read, defaults to all of them
+        workers (int): worker processes, None for the cpu count, 1 to stay serial
+        start, end (str, date or datetime): only the days from start to
+            end, both inclusive
+
+    Returns:
+        SpaceSaving
+    """
+    if what not in ITEMS:
+        raise ValueError(f"what must be one of {', '.join(ITEMS)}, not {what!r}")
+    channels = channels or [channel['name'] for channel in SlackDataLoader(path).channels]
+    tasks = [(path, channel, what, capacity, start, end) for channel in channels]
+    if workers == 1:
+        summaries = map(_channel_summary, tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            summaries = list(executor.map(_channel_summary, tasks))
+
+    merged = SpaceSaving(capacity)
+    for summary in summaries:
+        merged = merged.merge(summary)
+    return merged
+
+
+def _leading_zeros(words, bits):
+    """leading zero bits of every value of a uint64 array, as a bits wide word"""
+    zeros = np.zeros(len(words), dtype='uint8')
+    words = words.copy()
+    shift = 32
+    while shift:
+        # a value shorter than bits - shift bits has at least shift leading zeros
+        short = words < (np.uint64(1) << np.uint64(bits - shift))
+        zeros[short] += shift
+        words[short] <<= np.uint64(shift)
+        shift //= 2
+    return zeros
+
+
+def hll_estimate(registers):
+    """distinct count estimates of one or a stack of HyperLogLog register arrays"""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.exp2(-registers.astype('float64')).sum(axis=1)
+    empty = (registers == 0).sum(axis=1)
+    # linear counting is more accurate while many registers are still empty
+    small = (raw <= 2.5 * m) & (empty > 0)
+    raw[small] = m * np.log(m / empty[small])
+    return raw
+
+
+class HyperLogLog:
+    """Approximate count of the distinct items of a stream.
+
+    Args:
+        precision (int): 2**precision registers of one byte, from 4 to 16
+
+    """
+
+    def __init__(self, precision=12, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8') if registers is None \
+            else np.frombuffer(registers, dtype='uint8').copy() if isinstance(registers, bytes) \
+            else np.asarray(registers, dtype='uint8')
+
+    def update(self, items):
+        """add every item of an iterable, hashed as strings"""
+        items = np.asarray([str(item) for item in items], dtype=object)
+        if len(items):
+            hashes = pd.util.hash_array(items)
+            bits = 64 - self.precision
+            # the first precision bits pick the register, the rest give the rank
+            index = (hashes >> np.uint64(bits)).astype('int64')
+            rest = hashes & np.uint64((1 << bits) - 1)
+            rank = np.minimum(_leading_zeros(rest, bits), bits) + 1
+            np.maximum.at(self.registers, index, rank.astype('uint8'))
+        return self
+
+    def add(self, item):
+        return self.update([item])
+
+    def count(self):
+        """estimated number of distinct items"""
+        return float(hll_estimate(self.registers)[0])
+
+    def merge(self, other):
+        """sketch of the union of both streams"""
+        if other.precision != self.precision:
+            raise ValueError('only sketches of the same precision can be merged')
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def __or__(self, other):
+        return self.merge(other)
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(int(np.log2(len(data))), data)
+
+
+def _hash_items(items):
+    """64-bit hashes of items, as strings"""
+    return pd.util.hash_array(np.asarray([str(item) for item in items], dtype=object))
+
+
+class CountMinSketch:
+    """Approximate counts of every item of a stream in a fixed table.
+
+    Args:
+        width (int): counters per row; items are overcounted by at most
+            e / width of the total count
+        depth (int): rows, each hashing items differently; that bound
+            holds with probability 1 - exp(-depth)
+        table (np.ndarray or bytes): counters to start from
+
+    Attributes:
+        total (int): sum of the counts added so far
+
+    """
+
+    def __init__(self, width=2048, depth=4, table=None, total=0):
+        self.width, self.depth = width, depth
+        self.total = total
+        if table is None:
+            self.table = np.zeros((depth, width), dtype='uint32')
+        elif isinstance(table, bytes):
+            self.table = np.frombuffer(table, dtype='uint32').reshape(depth, width).copy()
+        else:
+            self.table = np.asarray(table, dtype='uint32').reshape(depth, width)
+
+    def _columns(self, items):
+        # double hashing: row i uses h1 + i * h2, both halves of one 64-bit hash
+        hashes = _hash_items(items)
+        low, high = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype='uint64')[:, None]
+        return ((low[None, :] + rows * high[None, :]) % np.uint64(self.width)).astype('int64')
+
+    def update(self, items, counts=None):
+        """add items, each once or with its count; a mapping of item -> count also works"""
+        if hasattr(items, 'items'):
+            items, counts = list(items.keys()), list(items.values())
+        items = list(items)
+        if not items:
+            return self
+        counts = np.ones(len(items), dtype='uint32') if counts is None else np.asarray(counts, dtype='uint32')
+        columns = self._columns(items)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+        self.total += int(counts.sum())
+        return self
+
+    def query(self, items):
+        """estimated counts of items, as an int64 array"""
+        items = list(items)
+        if not items:
+            return np.zeros(0, dtype='int64')
+        columns = self._columns(items)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0).astype('int64')
+
+    def __getitem__(self, item):
+        return int(self.query([item])[0])
+
+    def merge(self, other):
+        """sketch of both streams; the widths and depths must match"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('only sketches of the same width and depth can be merged')
+        return CountMinSketch(self.width, self.depth, self.table + other.table, self.total + other.total)
+
+    def __or__(self, other):
+        return self.merge(other)
+
+    def error_bound(self):
+        """the most an estimate overcounts, with probability 1 - exp(-depth)"""
+        return np.e / self.width * self.total
+
+    def to_bytes(self):
+        return self.table.tobytes()
@@ -0,0 +1,159 @@
+"""Word, emoji and link domain counts per channel and day, from persisted sketches.
+
+The word cloud of the EDA dashboard joined every message of a period into
+one string and re-tokenized it, and the emoji and domain charts scanned the
+same texts again. Here each day file is tokenized once, with
+src.markup.tokenize, while it is ingested, and for every (channel, day)
+and kind
+
+    words    lower-cased words of the message texts
+    emojis   emoji names written in the texts
+    domains  host names of the linked urls
+
+a src.sketches.CountMinSketch of the counts is kept, along with the most
+frequent items of that day as candidates. A query sums the sketches of the
+selected channels and days and estimates the counts of their candidates,
+so the charts never read the texts again:
+
+    top('words', 200, exclude=stopwords)    word cloud frequencies
+    top('emojis', 10, channels=[...])       emoji chart of some channels
+    top('domains', 10, start='2022-09-01')  most shared domains since then
+
+Only messages without a subtype are counted, as in get_all_channels_messages.
+An item that is never among the candidates of any of its days is missed,
+and every estimate may overcount by e / width of the kind's total count.
+The sketches are stored in one parquet file next to a src.manifest.Manifest,
+and a refresh only reads the day files that are new or changed:
+
+    <folder>/term_sketches.parquet
+    <folder>/_manifest.json
+
+Usage:
+    python -m src.ingest --path anonymized --store term_sketches
+
+"""
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.manifest import TableStore
+from src.markup import tokenize
+from src.sketches import CountMinSketch
+
+
+# bumped whenever the sketches change, so older folders are rebuilt
+TERM_SKETCHES_VERSION = 1
+
+SKETCHES_FILE = 'term_sketches.parquet'
+KINDS = ('words', 'emojis', 'domains')
+
+
+def day_terms(tables):
+    """counts of the words, emojis and link domains of the messages without a subtype of a day
+
+    Args:
+        tables (dict): extract_day tables of a day file
+    """
+    counts = {kind: Counter() for kind in KINDS}
+    for row in tables['messages']:
+        if row['subtype'] is not None:
+            continue
+        for token in tokenize(row['text']):
+            if token.kind == 'word':
+                counts['words'][token.value.lower()] += 1
+            elif token.kind == 'emoji':
+                counts['emojis'][token.value] += 1
+            elif token.kind == 'link':
+                counts['domains'][urlsplit(token.value).hostname or token.value] += 1
+    return counts
+
+
+class TermSketches(TableStore):
+    """Count-Min sketches of the words, emojis and link domains of every channel and day.
+
+    Args:
+        folder (str): folder the sketches are stored in
+        width, depth (int): CountMinSketch shape of new sketches
+        candidates (int): most frequent items of each (channel, day) and
+            kind kept as candidates for the top items
+
+    Attributes:
+        table (pd.DataFrame): 'channel', 'day', 'kind', the 'total' count,
+            the sketch 'counts' bytes and the 'candidates' of every
+            (channel, day) and kind with at least one item
+
+    """
+
+    FILE = SKETCHES_FILE
+    COLUMNS = {'channel': object, 'day': object, 'kind': object, 'total': 'int64', 'counts': object,
+               'candidates': object}
+    SORT = ['channel', 'day', 'kind']
+
+    def __init__(self, folder, width=2048, depth=4, candidates=200):
+        self.width, self.depth, self.candidates = width, depth, candidates
+        super().__init__(folder)
+
+    @property
+    def version(self):
+        return f'{TERM_SKETCHES_VERSION}/w{self.width}d{self.depth}c{self.candidates}'
+
+    def add(self, channel, days, removed):
+        """sketch the terms of the days read, returns the (channel, day) sketches (re)built or dropped"""
+        rows = []
+        for day, tables in days.items():
+            for kind, counts in day_terms(tables).items():
+                if counts:
+                    sketch = CountMinSketch(self.width, self.depth).update(counts)
+                    candidates = [item for item, _ in counts.most_common(self.candidates)]
+                    rows.append((channel, day, kind, sketch.total, sketch.to_bytes(), candidates))
+        keys = [(channel, day) for day in removed + list(days)]
+        return self.replace(keys, pd.DataFrame(rows, columns=list(self.COLUMNS)))
+
+    def sketch(self, kind, channels=None, start=None, end=None):
+        """one CountMinSketch summed from the sketches of a kind of the given channels and days"""
+        table = self._select(kind, channels, start, end)
+        counts = np.zeros((self.depth, self.width), dtype='uint32')
+        for data in table['counts']:
+            counts += np.frombuffer(data, dtype='uint32').reshape(self.depth, self.width)
+        return CountMinSketch(self.width, self.depth, counts, int(table['total'].sum()))
+
+    def top(self, kind, n=10, channels=None, start=None, end=None, exclude=()):
+        """the n most frequent items of a kind, with their estimated counts
+
+        Args:
+            kind (str): one of KINDS
+            n (int): number of items, None for all the candidates
+            channels (list of str): only these channels
+            start, end (str): only the days from start to end, both inclusive
+            exclude (iterable of str): items to leave out, such as stop words
+
+        Returns:
+            pd.Series: estimated count per item, in descending order
+        """
+        if kind not in KINDS:
+            raise ValueError(f'kind must be one of {KINDS}, not {kind!r}')
+        table = self._select(kind, channels, start, end)
+        exclude = set(exclude)
+        candidates = pd.unique(np.array([item for items in table['candidates'] for item in items
+                                         if item not in exclude], dtype=object))
+        estimates = pd.Series(self.sketch(kind, channels, start, end).query(candidates),
+                              index=pd.Index(candidates, name=kind), name='count', dtype='int64')
+        estimates = estimates.sort_values(ascending=False, kind='stable')
+        return estimates if n is None else estimates.head(n)
+
+    def frequencies(self, kind='words', n=200, channels=None, start=None, end=None, exclude=()):
+        """top items as a dict, for WordCloud.generate_from_frequencies"""
+        return self.top(kind, n, channels, start, end, exclude).to_dict()
+
+    def _select(self, kind, channels, start, end):
+        table = self.table[self.table['kind'] == kind]
+        if channels is not None:
+            table = table[table['channel'].isin(channels)]
+        if start is not None:
+            table = table[table['day'] >= str(start)]
+        if end is not None:
+            table = table[table['day'] <= str(end)]
+        return table.reset_index(drop=True)
+
@@ -0,0 +1,114 @@
+"""Batched text normalization for topic modeling.
+
+TextNormalizer does what preprocess_text always did (drop links and
+mentions, lowercase, strip punctuation and digits, drop stop words, stem,
+lemmatize) on the word tokens of src.markup.tokenize, so the topic model,
+the word clouds and the markup tables agree on what a word is; links,
+mentions, channels, emojis and code are left out. The stop words, stemmer
+and lemmatizer are loaded once, and the stem/lemma of every token seen is
+remembered. normalize_texts runs it over a whole batch of messages,
+optionally across worker processes.
+
+"""
+import string
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer, WordNetLemmatizer
+
+from src.markup import tokenize
+
+
+# apostrophes and underscores of word tokens, and digits, are stripped
+STRIP = str.maketrans('', '', string.punctuation + string.digits)
+
+
+class TextNormalizer:
+    """Normalize message texts into stemmed and lemmatized tokens.
+
+    Args:
+        stop_words (set of str): words to drop, NLTK's english stop words by default
+        stemmer: object with a stem(word) method, a PorterStemmer by default
+        lemmatize (bool): lemmatize the stems with WordNet
+
+    """
+
+    def __init__(self, stop_words=None, stemmer=None, lemmatize=True):
+        self.stop_words = frozenset(stopwords.words('english') if stop_words is None else stop_words)
+        self.stemmer = stemmer or PorterStemmer()
+        self.lemmatizer = WordNetLemmatizer() if lemmatize else None
+        self._memo = {}
+
+    def _normalize_token(self, token):
+        """stem and lemma of a token, None for a stop word"""
+        if token in self.stop_words:
+            return None
+        word = self.stemmer.stem(token)
+        if self.lemmatizer is not None:
+            word = self.lemmatizer.lemmatize(word)
+        return word
+
+    def tokens(self, text):
+        """normalized tokens of one message"""
+        memo = self._memo
+        tokens = []
+        for kind, value in tokenize(text):
+            if kind != 'word':
+                continue
+            token = value.lower().translate(STRIP)
+            if not token:
+                continue
+            try:
+                word = memo[token]
+            except KeyError:
+                word = memo[token] = self._normalize_token(token)
+            if word is not None:
+                tokens.append(word)
+        return tokens
+
+    def normalize(self, text):
+        """normalized tokens of one message joined by spaces"""
+        return ' '.join(self.tokens(text))
+
+
+@lru_cache(maxsize=None)
+def default_normalizer():
+    """the shared TextNormalizer with NLTK's stop words, stemmer and lemmatizer"""
+    return TextNormalizer()
+
+
+_worker_normalizer = None
+
+
+def _init_worker(normalizer):
+    global _worker_normalizer
+    _worker_normalizer = normalizer or default_normalizer()
+
+
+def _tokens_chunk(texts):
+    return [_worker_normalizer.tokens(text) for text in texts]
+
+
+def normalize_texts(texts, workers=1, normalizer=None, chunksize=1000):
+    """normalize a batch of message texts
+
+    Args:
+        texts (iterable of str): message texts
+        workers (int): worker processes, None for the cpu count, 1 to stay serial
+        normalizer (TextNormalizer): defaults to default_normalizer()
+        chunksize (int): texts sent to a worker at a time
+
+    Returns:
+        tuple: (list of token lists, list of the tokens joined by spaces)
+    """
+    texts = list(texts)
+    if workers == 1:
+        normalizer = normalizer or default_normalizer()
+        tokens = [normalizer.tokens(text) for text in texts]
+    else:
+        chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(normalizer,)) as executor:
+            tokens = [doc for chunk in executor.map(_tokens_chunk, chunks) for doc in chunk]
+    return tokens, [' '.join(doc) for doc in tokens]
@@ -0,0 +1,180 @@
+"""Index of the threads of a messages table.
+
+Slack spreads a thread over several fields: the parent message has
+thread_ts == ts, reply_count, reply_users and latest_reply, and every
+reply is a message of its own carrying the parent's thread_ts and
+parent_user_id. ThreadIndex joins them once, in a few vectorized passes
+over a messages table of src.extract, into flat arrays:
+
+    parent   row of the parent message of every thread, -1 if not loaded
+    order    rows of all the replies, grouped by thread and sorted by ts
+    starts   order[starts[t]:starts[t + 1]] are the replies of thread t
+
+so the parent, replies, participants and timings of any thread are found
+in O(1) from its key, and the reply counts, response times and reply
+graphs are all computed from the same arrays.
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.loader import SlackDataLoader
+from src.cache import channel_tables
+
+
+class ThreadIndex:
+    """Parent and replies of every thread of a messages table.
+
+    Threads are numbered 0..len-1 in (channel, thread_ts) order, the
+    channel being left out of the key when the table has no channel
+    column (the tables of a single channel).
+
+    Attributes:
+        messages (pd.DataFrame): the indexed messages, rows numbered from 0
+        keys (list of str): columns identifying a thread
+        threads (pd.DataFrame): one row per thread with its key, the
+            'parent' row (-1 when the parent message is not loaded), the
+            'parent_user', 'n_replies', 'n_repliers' and the epoch seconds
+            of the 'thread_start', 'first_reply' and 'last_reply' (NaN
+            without replies)
+        parent (np.ndarray): parent row of every thread
+        order (np.ndarray): reply rows grouped by thread, in ts order
+        starts (np.ndarray): len + 1 offsets of every thread into order
+        thread (np.ndarray): thread number of every message row, -1 if
+            it is not in a thread
+
+    """
+
+    def __init__(self, messages):
+        """
+        Args:
+            messages (pd.DataFrame): messages table of src.extract or
+                src.cache, with at least ts, thread_ts, user and
+                parent_user_id columns
+        """
+        self.messages = messages = messages.reset_index(drop=True)
+        self.keys = ['channel', 'thread_ts'] if 'channel' in messages else ['thread_ts']
+
+        ts = pd.to_numeric(messages['ts'], errors='coerce').to_numpy(dtype='float64')
+        in_thread = messages['thread_ts'].notna().to_numpy()
+        is_parent = in_thread & (messages['ts'] == messages['thread_ts']).to_numpy()
+        is_reply = in_thread & ~is_parent
+
+        grouped = messages[in_thread].groupby(self.keys, sort=True)
+        threads = grouped.size().index.to_frame(index=False)
+        n_threads = len(threads)
+        self.thread = np.full(len(messages), -1, dtype='int64')
+        self.thread[in_thread] = grouped.ngroup().to_numpy()
+
+        self.parent = np.full(n_threads, -1, dtype='int64')
+        parent_rows = np.flatnonzero(is_parent)
+        self.parent[self.thread[parent_rows]] = parent_rows
+
+        reply_rows = np.flatnonzero(is_reply)
+        self.order = reply_rows[np.lexsort((ts[reply_rows], self.thread[reply_rows]))]
+        n_replies = np.bincount(self.thread[self.order], minlength=n_threads)
+        self.starts = np.zeros(n_threads + 1, dtype='int64')
+        np.cumsum(n_replies, out=self.starts[1:])
+
+        has_replies = n_replies > 0
+        reply_ts = ts[self.order]
+        first, last = np.full(n_threads, np.nan), np.full(n_threads, np.nan)
+        first[has_replies] = reply_ts[self.starts[:-1][has_replies]]
+        last[has_replies] = reply_ts[self.starts[1:][has_replies] - 1]
+
+        # the parent's own user, or the parent_user_id its replies point at
+        users = messages['user'].to_numpy(dtype=object)
+        parent_user = np.full(n_threads, None, dtype=object)
+        replied = messages['parent_user_id'].to_numpy(dtype=object)[self.order]
+        parent_user[has_replies] = replied[self.starts[:-1][has_replies]]
+        loaded = self.parent >= 0
+        parent_user[loaded] = users[self.parent[loaded]]
+
+        repliers = pd.DataFrame({'thread': self.thread[self.order], 'user': users[self.order]})
+        n_repliers = np.bincount(repliers.drop_duplicates()['thread'], minlength=n_threads)
+
+        threads['parent'] = self.parent
+        threads['parent_user'] = parent_user
+        threads['n_replies'] = n_replies
+        threads['n_repliers'] = n_repliers
+        threads['thread_start'] = pd.to_numeric(threads['thread_ts'], errors='coerce').to_numpy(dtype='float64')
+        threads['first_reply'] = first
+        threads['last_reply'] = last
+        self.threads = threads
+        self._numbers = {key: number for number, key in enumerate(
+            threads['thread_ts'] if len(self.keys) == 1 else zip(threads['channel'], threads['thread_ts']))}
+
+    @classmethod
+    def from_export(cls, export_path, channels=None, cache_dir=None, start=None, end=None):
+        """index the threads of every channel of an export
+
+        Args:
+            export_path (str): slack exported data folder or ZIP file
+            channels (list of str): channels to read, defaults to all of them
+            cache_dir (str): read the messages from this src.cache folder
+                when the channel is fresh in it
+            start, end (str, date or datetime): only the days from start to
+                end, both inclusive
+
+        Returns:
+            ThreadIndex
+        """
+        channels = channels or [channel['name'] for channel in SlackDataLoader(export_path).channels]
+        frames = []
+        for channel in channels:
+            messages = channel_tables(os.path.join(export_path, channel), ['messages'], cache_dir,
+                                      start, end)['messages']
+            frames.append(messages.assign(channel=channel))
+        return cls(pd.concat(frames, ignore_index=True))
+
+    def __len__(self):
+        return len(self.threads)
+
+    def __contains__(self, key):
+        return key in self._numbers
+
+    def locate(self, thread_ts, channel=None):
+        """number of the thread started at thread_ts (in channel if the index has channels)"""
+        return self._numbers[thread_ts if len(self.keys) == 1 else (channel, thread_ts)]
+
+    def parent_row(self, number):
+        """messages row of the parent of a thread, -1 if it is not loaded"""
+        return int(self.parent[number])
+
+    def reply_rows(self, number):
+        """messages rows of the replies of a thread, in ts order"""
+        return self.order[self.starts[number]:self.starts[number + 1]]
+
+    def replies(self, number):
+        """the reply messages of a thread, in ts order"""
+        return self.messages.iloc[self.reply_rows(number)]
+
+    def participants(self, number):
+        """users of a thread, its parent's first and then its repliers in order of first reply"""
+        users = self.messages['user'].to_numpy(dtype=object)[self.reply_rows(number)]
+        parent_user = self.threads['parent_user'].iat[number]
+        return list(pd.unique(np.concatenate([[parent_user], users]) if parent_user is not None else users))
+
+    def timings(self, number):
+        """thread_start, first_reply and last_reply epoch seconds of a thread"""
+        row = self.threads.iloc[number]
+        return row['thread_start'], row['first_reply'], row['last_reply']
+
+    def reply_counts(self):
+        """number of thread replies sent by every user, most active first"""
+        return self.messages['user'].iloc[self.order].value_counts()
+
+    def reply_edges(self):
+        """who replies to whom: replies per (user, parent_user) pair, most frequent first
+
+        Returns:
+            pd.DataFrame: 'user', 'parent_user' and 'replies' columns
+        """
+        edges = pd.DataFrame({
+            'user': self.messages['user'].to_numpy(dtype=object)[self.order],
+            'parent_user': self.threads['parent_user'].to_numpy(dtype=object)[self.thread[self.order]],
+        })
+        edges = edges.groupby(['user', 'parent_user'], sort=False).size().rename('replies').reset_index()
+        return edges.sort_values('replies', ascending=False, kind='stable', ignore_index=True)
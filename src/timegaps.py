@@ -0,0 +1,176 @@
+"""Time gaps between messages as NumPy arrays and histograms.
+
+The time-distribution notebook used to collect (text, ts) tuples of every
+message, sort them with a float() key and diff them pair by pair. Here
+only the ts, channel and user columns are loaded (straight from the
+parquet cache when it is fresh, without reading the texts), ts becomes
+an int64 array of microseconds, and everything after that is array
+operations:
+
+    message_times   ts, channel and user of every message
+    time_gaps       one sort, one diff, gaps across groups masked out
+    gap_histogram   counts over linear or log-spaced bins
+    gap_histograms  the same bins for every channel or user at once
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.loader import SlackDataLoader
+from src.cache import is_stale, read_table, day_filters
+from src.extract import extract_channel
+
+
+UNITS = {'s': 1, 'min': 60, 'h': 3600, 'd': 86400}
+
+
+def to_micros(ts):
+    """slack ts strings ('1661072000.000100') to int64 epoch microseconds, -1 where missing"""
+    seconds = pd.to_numeric(pd.Series(ts, copy=False), errors='coerce').to_numpy(dtype='float64')
+    micros = np.full(len(seconds), -1, dtype='int64')
+    valid = ~np.isnan(seconds)
+    # float seconds carry ~0.2us of precision at current epochs, slack ts are whole microseconds
+    micros[valid] = np.round(seconds[valid] * 1e6).astype('int64')
+    return micros
+
+
+def message_times(export_path, channels=None, cache_dir=None, start=None, end=None, subtypes=False):
+    """ts, channel and user of the messages of an export, without their texts
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        channels (list of str): channels to read, defaults to all of them
+        cache_dir (str): read the channels that are fresh in this src.cache
+            folder from it, loading only the needed columns
+        start, end (str, date or datetime): only the days from start to
+            end, both inclusive
+        subtypes (bool): keep the messages with a subtype (joins, ...),
+            which get_all_channels_messages leaves out
+
+    Returns:
+        pd.DataFrame: 'ts' as int64 epoch microseconds and categorical
+            'channel' and 'user' columns
+    """
+    channels = channels or [channel['name'] for channel in SlackDataLoader(export_path).channels]
+    columns = ['ts', 'user', 'subtype']
+    frames = []
+    for channel in channels:
+        if cache_dir is not None and not is_stale(cache_dir, export_path, channel):
+            messages = read_table(cache_dir, 'messages', columns, day_filters(start, end), channel)[columns]
+        else:
+            messages = extract_channel(os.path.join(export_path, channel), start, end)['messages'][columns]
+        if not subtypes:
+            messages = messages[messages['subtype'].isna()]
+        frames.append(pd.DataFrame({'ts': to_micros(messages['ts']), 'channel': channel,
+                                    'user': messages['user'].to_numpy()}))
+
+    times = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['ts', 'channel', 'user'])
+    times = times[times['ts'] >= 0].reset_index(drop=True)
+    return times.astype({'ts': 'int64', 'channel': 'category', 'user': 'category'})
+
+
+def time_gaps(ts, groups=None, unit='h'):
+    """gaps between consecutive timestamps, overall or within each group
+
+    Args:
+        ts (array-like of int): epoch microseconds, in any order
+        groups (array-like): group of every timestamp (a channel or user
+            column); gaps are only taken between timestamps of one group
+        unit (str): 's', 'min', 'h' or 'd'
+
+    Returns:
+        tuple: (gaps as a float64 array, group of every gap or None)
+    """
+    ts = np.asarray(ts, dtype='int64')
+    if groups is None:
+        ordered = np.sort(ts)
+        return np.diff(ordered) / (UNITS[unit] * 1e6), None
+
+    groups = pd.Categorical(groups)
+    codes = groups.codes.astype('int64')
+    if ts.size and len(groups.categories) * (int(ts.max()) - int(ts.min()) + 1) < 2 ** 62:
+        # group and time packed into one int64 key: a plain sort instead of a lexsort
+        span = int(ts.max()) - int(ts.min()) + 1
+        keys = np.sort(codes * span + (ts - ts.min()))
+        codes, ordered = np.divmod(keys, span)
+    else:
+        order = np.lexsort((ts, codes))
+        ordered, codes = ts[order], codes[order]
+    # missing groups (messages without a user) have code -1 and no gaps
+    same = (codes[1:] == codes[:-1]) & (codes[1:] >= 0)
+    gaps = np.diff(ordered)[same] / (UNITS[unit] * 1e6)
+    return gaps, pd.Categorical.from_codes(codes[1:][same], groups.categories)
+
+
+def gap_bins(gaps, bins=50, log=False):
+    """bin edges for gaps, log-spaced from the smallest positive gap if log"""
+    gaps = np.asarray(gaps)
+    if not log:
+        return np.histogram_bin_edges(gaps, bins)
+    positive = gaps[gaps > 0]
+    if positive.size == 0:
+        return np.histogram_bin_edges(gaps, bins)
+    low, high = positive.min(), positive.max()
+    return np.geomspace(low, high if high > low else low * 10, bins + 1)
+
+
+def _bin_index(gaps, edges, log=False):
+    """bin of every gap, -1 for the gaps np.histogram would leave out
+
+    As in np.histogram the last bin includes its right edge. With log bins
+    the zero gaps, which a log scale cannot show, are counted in the first bin.
+    """
+    last = len(edges) - 2
+    index = np.searchsorted(edges, gaps, side='right') - 1
+    index[gaps == edges[-1]] = last
+    index[(index < 0) | (index > last)] = -1
+    if log:
+        index[gaps == 0] = 0
+    return index
+
+
+def gap_histogram(gaps, bins=50, log=False):
+    """counts of gaps per bin
+
+    Args:
+        gaps (array-like of float): time gaps
+        bins (int or array-like): number of bins or the bin edges; as with
+            np.histogram, gaps outside the edges are not counted
+        log (bool): log-spaced bins, the zero gaps counted in the first one
+
+    Returns:
+        tuple: (counts, edges) as np.histogram returns them
+    """
+    gaps = np.asarray(gaps, dtype='float64')
+    edges = np.asarray(bins, dtype='float64') if np.ndim(bins) else gap_bins(gaps, bins, log)
+    index = _bin_index(gaps, edges, log)
+    counts = np.bincount(index[index >= 0], minlength=len(edges) - 1)
+    return counts, edges
+
+
+def gap_histograms(times, by='channel', bins=50, log=False, unit='h'):
+    """gap histogram of every channel or user, over the same bins
+
+    Args:
+        times (pd.DataFrame): message_times table
+        by (str): 'channel' or 'user'; gaps are taken within each group
+        bins (int or array-like): number of bins or the bin edges; gaps
+            outside the edges are not counted
+        log (bool): log-spaced bins, the zero gaps counted in the first one
+        unit (str): 's', 'min', 'h' or 'd'
+
+    Returns:
+        pd.DataFrame: one row per group, one column per bin labelled by
+            its left edge
+    """
+    gaps, groups = time_gaps(times['ts'], times[by], unit)
+    edges = np.asarray(bins, dtype='float64') if np.ndim(bins) else gap_bins(gaps, bins, log)
+    n_bins, n_groups = len(edges) - 1, len(groups.categories)
+    index = _bin_index(gaps, edges, log)
+    inside = index >= 0
+    cells = groups.codes.astype('int64')[inside] * n_bins + index[inside]
+    counts = np.bincount(cells, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+    return pd.DataFrame(counts, index=pd.Index(groups.categories, name=by),
+                        columns=pd.Index(edges[:-1], name=f'gap ({unit})'))
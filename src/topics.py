@@ -0,0 +1,513 @@
+"""Persisted, incrementally updated corpus and LDA model for topic modeling.
+
+The messages of every day file are normalized (src.text) and stored as
+one Matrix Market shard per channel and day, next to the timestamps of
+its documents, and their words are added to a gensim Dictionary saved
+with them:
+
+    <folder>/dictionary.gensim
+    <folder>/corpus/<channel>/<YYYY-MM-DD>.mm     bag of words per message
+    <folder>/corpus/<channel>/<YYYY-MM-DD>.json   ts of each message
+    <folder>/lda.model                            the trained model
+    <folder>/topic_trends.parquet                 topic weights per channel and day
+    <folder>/_manifest.json                       src.manifest.Manifest
+
+The manifest ties the folder to one export and one format version. A
+refresh only normalizes the day files that are new or changed since the
+last one, appends their shards and words, and feeds the new documents to
+the model as an online update instead of retraining it. Words first seen
+after the model was trained are kept in the dictionary but ignored by
+the model until it is retrained with retrain=True.
+
+Every refresh also infers the topic distribution of the documents of the
+new shards in one batch and adds their summed topic weights to a small
+per (channel, day) table, so topic_trends can chart topic prevalence per
+day or week without touching the corpus or the model. Retraining the
+model re-infers the whole corpus.
+
+sweep_topics trains models for a range of topic counts on the stored
+corpus, per channel or per week if asked, spreading every (group, topic
+count) pair over a process pool, and scores each with topic coherence
+so the topic count can be picked from one results table.
+
+Usage:
+    python -m src.topics --path anonymized --folder .slack_topics
+    python -m src.topics --path anonymized --folder .slack_topics --sweep 2 12 --by channel
+    python -m src.topics --path anonymized --folder .slack_topics --retrain --train-workers 3
+
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.models import LdaModel, LdaMulticore, CoherenceModel
+
+from src.manifest import DayStore
+from src.text import normalize_texts
+
+
+# bumped whenever the shards change, so older folders are rebuilt
+TOPICS_VERSION = 2
+
+DICTIONARY_FILE = 'dictionary.gensim'
+MODEL_FILE = 'lda.model'
+TRENDS_FILE = 'topic_trends.parquet'
+
+# the training parameters of the topic modeling notebook
+LDA_PARAMS = dict(num_topics=5, random_state=100, update_every=1, chunksize=100,
+                  passes=10, alpha='auto', per_word_topics=True)
+
+
+def day_messages(tables):
+    """(text, ts) of the messages without a subtype of the extract_day tables of a day file,
+    as get_all_channels_messages"""
+    rows = tables['messages']
+    return [(row['text'], row['ts']) for row in rows if row['subtype'] is None]
+
+
+class TopicCorpus(DayStore):
+    """Streamed bag-of-words corpus of an export, stored in shards.
+
+    Iterating yields the documents of every shard in channel and day
+    order, reading one shard at a time.
+
+    Args:
+        folder (str): folder the corpus is stored in
+        normalizer (src.text.TextNormalizer): defaults to the shared one
+        workers (int): worker processes for the text normalization
+
+    """
+
+    version = TOPICS_VERSION
+
+    def __init__(self, folder, normalizer=None, workers=1):
+        super().__init__(folder)
+        self.normalizer = normalizer
+        self.workers = workers
+        path = os.path.join(folder, DICTIONARY_FILE)
+        self.dictionary = corpora.Dictionary.load(path) if os.path.exists(path) else corpora.Dictionary()
+
+    def _shard_path(self, channel, day, ext):
+        return os.path.join(self.folder, 'corpus', channel, f'{day}.{ext}')
+
+    def shards(self):
+        """(channel, day) of every stored shard, in order"""
+        if self.manifest is None:
+            return []
+        return [(channel, day_file[:-len('.json')])
+                for channel in sorted(self.manifest.channels)
+                for day_file in sorted(self.manifest.channels[channel])]
+
+    def shard(self, channel, day):
+        """bag-of-words documents of one shard"""
+        return list(corpora.MmCorpus(self._shard_path(channel, day, 'mm')))
+
+    def __iter__(self):
+        for channel, day in self.shards():
+            yield from corpora.MmCorpus(self._shard_path(channel, day, 'mm'))
+
+    def __len__(self):
+        return len(self.documents())
+
+    def documents(self, shards=None):
+        """channel, day and ts of every document, aligned with iteration
+
+        Args:
+            shards (list of tuple): only these (channel, day) shards
+        """
+        frames = []
+        for channel, day in (self.shards() if shards is None else shards):
+            with open(self._shard_path(channel, day, 'json')) as f:
+                ts = json.load(f)
+            frames.append(pd.DataFrame({'channel': channel, 'day': day, 'ts': ts}))
+        if not frames:
+            return pd.DataFrame(columns=['channel', 'day', 'ts'])
+        return pd.concat(frames, ignore_index=True)
+
+    def add(self, channel, days, removed):
+        """write the shards of the days read and remove those of the removed days
+
+        Returns:
+            list of tuple: the (channel, day) shards that were (re)written
+        """
+        for day in removed:
+            self._remove_shard(channel, day)
+        if not days:
+            return []
+
+        messages = {day: day_messages(tables) for day, tables in days.items()}
+        # one batch per channel, so the worker pool is started once
+        tokens, _ = normalize_texts([text for rows in messages.values() for text, _ in rows], workers=self.workers,
+                                    normalizer=self.normalizer)
+        start = 0
+        for day, rows in messages.items():
+            self._write_shard(channel, day, tokens[start:start + len(rows)], [ts for _, ts in rows])
+            start += len(rows)
+        return [(channel, day) for day in days]
+
+    def save(self):
+        """persist the dictionary and the manifest; shards are written as they are added"""
+        self.dictionary.save(os.path.join(self.folder, DICTIONARY_FILE))
+        super().save()
+
+    def reset(self):
+        shutil.rmtree(os.path.join(self.folder, 'corpus'), ignore_errors=True)
+        for name in os.listdir(self.folder):
+            if name.startswith(MODEL_FILE) or name == TRENDS_FILE:
+                os.remove(os.path.join(self.folder, name))
+        self.dictionary = corpora.Dictionary()
+
+    def _write_shard(self, channel, day, tokens, ts):
+        os.makedirs(os.path.join(self.folder, 'corpus', channel), exist_ok=True)
+        # allow_update grows the dictionary in place, existing ids never change
+        bows = [self.dictionary.doc2bow(doc, allow_update=True) for doc in tokens]
+        corpora.MmCorpus.serialize(self._shard_path(channel, day, 'mm'), bows)
+        with open(self._shard_path(channel, day, 'json'), 'w') as f:
+            json.dump(ts, f)
+
+    def _remove_shard(self, channel, day):
+        for ext in ('mm', 'mm.index', 'json'):
+            path = self._shard_path(channel, day, ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def train_lda(bows, dictionary, workers=1, **params):
+    """train an LDA model, on several cores unless workers is 1
+
+    Args:
+        bows (iterable of list): bag-of-words documents
+        dictionary (gensim.corpora.Dictionary): their dictionary
+        workers (int): LdaMulticore worker processes, None for the cpu count - 1
+        **params: LdaModel parameters overriding LDA_PARAMS
+
+    Returns:
+        LdaModel or LdaMulticore
+    """
+    params = dict(LDA_PARAMS, **params)
+    if workers == 1:
+        return LdaModel(bows, id2word=dictionary, **params)
+
+    # LdaMulticore learns neither alpha nor in batches of update_every
+    params.pop('update_every', None)
+    if params.get('alpha') == 'auto':
+        params['alpha'] = 'symmetric'
+    return LdaMulticore(bows, id2word=dictionary, workers=workers, **params)
+
+
+def load_model(folder):
+    """the LDA model saved in a topics folder, or None"""
+    path = os.path.join(folder, MODEL_FILE)
+    return LdaModel.load(path) if os.path.exists(path) else None
+
+
+def known_terms(bows, num_terms):
+    """drop the words a model was not trained with from bag-of-words documents"""
+    return [[(word_id, count) for word_id, count in bow if word_id < num_terms] for bow in bows]
+
+
+def refresh_topics(export_path, folder, channels=None, retrain=False, workers=1, normalizer=None, train_workers=None,
+                   **params):
+    """bring the corpus and the LDA model of a topics folder up to date
+
+    The first run trains the model on the whole corpus. Later runs only
+    normalize the new day files and update the model online with their
+    documents.
+
+    Args:
+        export_path (str): slack exported data folder or ZIP file
+        folder (str): topics folder
+        channels (list of str): channels to include, defaults to all of them
+        retrain (bool): train a new model on the whole corpus
+        workers (int): worker processes for the text normalization
+        normalizer (src.text.TextNormalizer): defaults to the shared one
+        train_workers (int): LdaMulticore worker processes when the model
+            is (re)trained, None (the default) for the cpu count - 1, 1 for
+            a single-core LdaModel; see train_lda
+        **params: LdaModel parameters overriding LDA_PARAMS
+
+    Returns:
+        tuple: (LdaModel, TopicCorpus, list of the (channel, day) shards added)
+    """
+    corpus = TopicCorpus(folder, normalizer, workers)
+    written = corpus.update(export_path, channels)
+    return update_model(corpus, written, retrain, train_workers, **params), corpus, written
+
+
+def update_model(corpus, written, retrain=False, train_workers=None, **params):
+    """train or update the LDA model of a corpus that was just updated, then save the corpus
+
+    Args:
+        corpus (TopicCorpus): the corpus, updated but not saved
+        written (list of tuple): the (channel, day) shards its update wrote
+        retrain, train_workers, **params: as for refresh_topics
+
+    Returns:
+        LdaModel
+    """
+    model = None if retrain else load_model(corpus.folder)
+    if model is None:
+        model = train_lda(corpus, corpus.dictionary, train_workers, **params)
+        inferred = None
+    else:
+        inferred = written
+        if written:
+            new_documents = [bow for channel, day in written for bow in corpus.shard(channel, day)]
+            model.update(known_terms(new_documents, model.num_terms))
+
+    model.save(os.path.join(corpus.folder, MODEL_FILE))
+    update_topic_trends(corpus.folder, model, corpus, inferred)
+    # saved last, so an interrupted refresh redoes the files it had not finished
+    corpus.save()
+    return model
+
+
+def infer_topics(model, bows):
+    """topic distribution of every document, inferred in one batch
+
+    Args:
+        model (LdaModel): trained model
+        bows (list of list): bag-of-words documents
+
+    Returns:
+        np.ndarray: (documents, topics) array, each row summing to 1;
+            rows of documents without a known word are all zeros
+    """
+    bows = known_terms(bows, model.num_terms)
+    if not bows:
+        return np.zeros((0, model.num_topics))
+    gamma, _ = model.inference(bows)
+    weights = gamma / gamma.sum(axis=1, keepdims=True)
+    # an empty document only gets the prior back, it says nothing about the day
+    weights[[not bow for bow in bows]] = 0
+    return weights
+
+
+def _read_trends(folder):
+    path = os.path.join(folder, TRENDS_FILE)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def update_topic_trends(folder, model, corpus, shards=None):
+    """infer the topics of the given shards and store their daily totals
+
+    Rows of shards no longer in the corpus are dropped and shards missing
+    from the table are inferred as well, so the table always covers the
+    corpus.
+
+    Args:
+        folder (str): topics folder
+        model (LdaModel): model to infer with
+        corpus (TopicCorpus): stored corpus
+        shards (list of tuple): (channel, day) shards to (re)infer, None
+            for the whole corpus
+
+    Returns:
+        pd.DataFrame: one row per channel and day with the number of
+            documents with known words ('n_docs') and the summed weight
+            of every topic ('topic_0', 'topic_1', ...)
+    """
+    topics = [f'topic_{topic}' for topic in range(model.num_topics)]
+    table = None if shards is None else _read_trends(folder)
+    if table is None or list(table.columns[3:]) != topics:
+        table, shards = pd.DataFrame(columns=['channel', 'day', 'n_docs'] + topics), corpus.shards()
+
+    stored = set(corpus.shards())
+    keys = list(zip(table['channel'], table['day']))
+    shards = set(shards) | (stored - set(keys))
+    table = table[np.array([key in stored and key not in shards for key in keys], dtype=bool)]
+
+    rows = []
+    for channel, day in sorted(shards):
+        weights = infer_topics(model, corpus.shard(channel, day))
+        rows.append([channel, day, int(weights.any(axis=1).sum()), *weights.sum(axis=0)])
+    if rows:
+        table = pd.concat([table, pd.DataFrame(rows, columns=table.columns)], ignore_index=True)
+
+    table = table.astype({'n_docs': 'int64', **dict.fromkeys(topics, 'float64')})
+    table = table.sort_values(['channel', 'day'], ignore_index=True)
+    table.to_parquet(os.path.join(folder, TRENDS_FILE), index=False)
+    return table
+
+
+def topic_trends(folder, freq='day', channels=None, by_channel=True):
+    """topic prevalence over time from the table kept by refresh_topics
+
+    Args:
+        folder (str): topics folder
+        freq (str): 'day' or 'week' (weeks start on Monday)
+        channels (list of str): only these channels, defaults to all of them
+        by_channel (bool): one series per channel, or all channels summed
+
+    Returns:
+        pd.DataFrame: one row per (channel,) period with 'n_docs' and the
+            mean weight of every topic over its documents
+    """
+    table = _read_trends(folder)
+    if table is None:
+        raise FileNotFoundError(f'no {TRENDS_FILE} in {folder}, run refresh_topics first')
+    if channels is not None:
+        table = table[table['channel'].isin(channels)]
+
+    # day files that are not named after a day have no place on a time axis
+    table = table.assign(period=pd.to_datetime(table['day'], format='%Y-%m-%d', errors='coerce'))
+    table = table.dropna(subset=['period'])
+    if freq == 'week':
+        table['period'] -= pd.to_timedelta(table['period'].dt.dayofweek, unit='D')
+    elif freq != 'day':
+        raise ValueError(f"freq must be 'day' or 'week', not {freq!r}")
+
+    keys = ['channel', 'period'] if by_channel else ['period']
+    totals = table[keys + list(table.columns[2:-1])].groupby(keys, observed=True).sum()
+    topics = totals.columns.drop('n_docs')
+    totals[topics] = totals[topics].div(totals['n_docs'].where(totals['n_docs'] > 0), axis=0)
+    return totals.reset_index()
+
+
+def _group_key(channel, day, by):
+    if by == 'channel':
+        return channel
+    if by == 'week':
+        try:
+            year, week, _ = date.fromisoformat(day).isocalendar()
+        except ValueError:  # a .json file that is not named after a day
+            return None
+        return f'{year}-W{week:02d}'
+    return 'all'
+
+
+def corpus_groups(corpus, by=None):
+    """bag-of-words documents of a TopicCorpus split into groups
+
+    Args:
+        corpus (TopicCorpus): stored corpus
+        by (str): 'channel', 'week' (ISO week of the day file) or None for
+            a single 'all' group
+
+    Returns:
+        dict: group -> list of bag-of-words documents
+    """
+    groups = {}
+    for channel, day in corpus.shards():
+        key = _group_key(channel, day, by)
+        if key is not None:
+            groups.setdefault(key, []).extend(corpus.shard(channel, day))
+    return groups
+
+
+_sweep_state = None
+
+
+def _init_sweep(folder, by, min_docs):
+    """load the corpus groups once per process"""
+    global _sweep_state
+    corpus = TopicCorpus(folder)
+    groups = {group: bows for group, bows in corpus_groups(corpus, by).items()
+              if sum(1 for bow in bows if bow) >= min_docs}
+    _sweep_state = (corpus.dictionary, groups)
+
+
+def _sweep_task(task):
+    group, num_topics, measure, train_workers, params = task
+    dictionary, groups = _sweep_state
+    bows = [bow for bow in groups[group] if bow]
+    # the shards keep counts, not word order; messages are shorter than the
+    # c_v sliding window (110 words) so every message is a single window anyway
+    texts = [[dictionary[word_id] for word_id, count in bow for _ in range(int(count))] for bow in bows]
+
+    start = time.perf_counter()
+    model = train_lda(bows, dictionary, train_workers, **dict(params, num_topics=num_topics))
+    seconds = time.perf_counter() - start
+    coherence = CoherenceModel(model=model, texts=texts, corpus=bows, dictionary=dictionary,
+                               coherence=measure, processes=1).get_coherence()
+    return {
+        'group': group,
+        'num_topics': num_topics,
+        'coherence': coherence,
+        'log_perplexity': model.log_perplexity(bows),
+        'n_docs': len(bows),
+        'train_seconds': seconds,
+        'top_words': ' '.join(word for word, _ in model.show_topic(0, 5)),
+    }
+
+
+def sweep_topics(folder, topic_counts=range(2, 11), by=None, measure='c_v', workers=None, min_docs=20,
+                 train_workers=None, **params):
+    """train and score one model per group and topic count
+
+    Every (group, topic count) pair is an independent task, so they are
+    all spread over a single process pool, and by default the cores are
+    shared out between the pool processes and the LdaMulticore workers
+    of each model.
+
+    Args:
+        folder (str): topics folder filled by refresh_topics
+        topic_counts (iterable of int): topic counts to try
+        by (str): one model per 'channel' (all-week1..12 are channels),
+            per 'week', or None for the whole corpus
+        measure (str): CoherenceModel measure, 'c_v', 'u_mass', 'c_npmi', ...
+        workers (int): worker processes, None for the cpu count, 1 to stay serial
+        min_docs (int): skip groups with fewer non-empty documents
+        train_workers (int): LdaMulticore worker processes of every model,
+            None for the cpu count divided by the pool size, 1 for a
+            single-core LdaModel; see train_lda
+        **params: LdaModel parameters overriding LDA_PARAMS
+
+    Returns:
+        pd.DataFrame: one row per group and topic count, with the
+            coherence, log perplexity, number of documents, training time
+            and the top words of the first topic
+    """
+    columns = ['group', 'num_topics', 'coherence', 'log_perplexity', 'n_docs', 'train_seconds', 'top_words']
+    if train_workers is None:
+        train_workers = max(1, (os.cpu_count() or 1) // (workers or os.cpu_count() or 1))
+    _init_sweep(folder, by, min_docs)
+    tasks = [(group, num_topics, measure, train_workers, params)
+             for group in _sweep_state[1] for num_topics in topic_counts]
+
+    if workers == 1:
+        rows = list(map(_sweep_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep,
+                                 initargs=(folder, by, min_docs)) as executor:
+            rows = list(executor.map(_sweep_task, tasks))
+    return pd.DataFrame(rows, columns=columns)
+
+
+def best_topic_counts(results):
+    """row of the most coherent topic count of every group of a sweep_topics table"""
+    return results.loc[results.groupby('group', sort=False)['coherence'].idxmax()].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Refresh the topic model of a slack export')
+    parser.add_argument('--path', required=True, help='slack exported data folder or ZIP file')
+    parser.add_argument('--folder', default='.slack_topics', help='folder the corpus and model are kept in')
+    parser.add_argument('--channel', action='append', help='only include this channel (repeatable)')
+    parser.add_argument('--retrain', action='store_true', help='train a new model on the whole corpus')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes for the text normalization and the sweep pool')
+    parser.add_argument('--train-workers', type=int,
+                        help='LdaMulticore worker processes per trained model (default: one per core), '
+                             '1 for a single-core LdaModel')
+    parser.add_argument('--sweep', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                        help='also score every topic count from MIN to MAX by coherence')
+    parser.add_argument('--by', choices=['channel', 'week'], help='one sweep per channel or per week')
+    args = parser.parse_args()
+
+    model, corpus, written = refresh_topics(args.path, args.folder, args.channel, args.retrain, args.workers,
+                                            train_workers=args.train_workers)
+    print(f"added {len(written)} day files, {len(corpus.dictionary)} words, {model.num_topics} topics")
+
+    if args.sweep:
+        results = sweep_topics(args.folder, range(args.sweep[0], args.sweep[1] + 1), args.by, workers=args.workers,
+                               train_workers=args.train_workers)
+        print(results.drop(columns='top_words').to_string(index=False))
+        print(best_topic_counts(results)[['group', 'num_topics', 'coherence']].to_string(index=False))
@@ -0,0 +1,137 @@
+"""Indexed directory of the users of a slack export.
+
+users.json holds the current profiles and users_old_new.json, when the
+export has one, maps the handles users had before the workspace was
+anonymized/renamed to their current record. UserDirectory reads both
+once and keeps:
+
+    - an immutable User record per id
+    - read-only id lookups by handle, real name and old handle
+    - a DataFrame indexed by id, so whole id columns are mapped to names
+      with a single vectorized index lookup instead of a Python loop
+
+"""
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+import pandas as pd
+
+from src import decode
+from src.loader import open_export_file
+
+
+User = namedtuple('User', ['id', 'name', 'real_name', 'display_name', 'deleted',
+                           'is_bot', 'is_admin', 'is_owner', 'tz'])
+
+
+def _user_record(user):
+    """User from a users.json entry, profile fields taking precedence"""
+    profile = user.get('profile') or {}
+    return User(
+        id=user['id'],
+        name=user.get('name'),
+        real_name=profile.get('real_name', user.get('real_name')),
+        display_name=profile.get('display_name'),
+        deleted=user.get('deleted', False),
+        is_bot=user.get('is_bot', False),
+        is_admin=user.get('is_admin', False),
+        is_owner=user.get('is_owner', False),
+        tz=user.get('tz'),
+    )
+
+
+def read_old_new(path):
+    """content of the users_old_new.json of an export, or None if it has none"""
+    try:
+        with open_export_file(os.path.join(path, 'users_old_new.json')) as f:
+            return decode.load(f)
+    except (FileNotFoundError, KeyError):  # KeyError: missing ZIP member
+        return None
+
+
+def _first_ids(pairs):
+    """key -> id of the first user with that key, skipping empty keys"""
+    index = {}
+    for key, user_id in pairs:
+        if key and key not in index:
+            index[key] = user_id
+    return MappingProxyType(index)
+
+
+class UserDirectory:
+    """Read-only index of the users of an export.
+
+    Attributes:
+        frame (pd.DataFrame): one row per user, indexed by id, with the
+            User fields as columns
+        names_by_id (Mapping): id -> handle
+        ids_by_name (Mapping): handle -> id
+        ids_by_real_name (Mapping): real name -> id (first user with it)
+        ids_by_old_name (Mapping): handle from users_old_new.json -> id
+
+    """
+
+    __slots__ = ('_users', 'frame', 'names_by_id', 'ids_by_name', 'ids_by_real_name', 'ids_by_old_name')
+
+    def __init__(self, users, old_new=None):
+        """
+        Args:
+            users (list of dict or pd.DataFrame): users.json entries, or a
+                DataFrame of them with at least an id column
+            old_new (dict): users_old_new.json content, old handle -> user
+        """
+        if isinstance(users, pd.DataFrame):
+            users = users.to_dict('records')
+        records = [_user_record(user) for user in users]
+
+        self._users = MappingProxyType({user.id: user for user in records})
+        self.frame = pd.DataFrame(records, columns=User._fields).set_index('id')
+        self.names_by_id = MappingProxyType({user.id: user.name for user in records})
+        self.ids_by_name = _first_ids((user.name, user.id) for user in records)
+        self.ids_by_real_name = _first_ids((user.real_name, user.id) for user in records)
+        self.ids_by_old_name = _first_ids((old, user['id']) for old, user in (old_new or {}).items())
+
+    @classmethod
+    def from_export(cls, path):
+        """read users.json, and users_old_new.json if present, from an export folder or ZIP"""
+        with open_export_file(os.path.join(path, 'users.json')) as f:
+            users = decode.load(f)
+        return cls(users, read_old_new(path))
+
+    def __len__(self):
+        return len(self._users)
+
+    def __iter__(self):
+        return iter(self._users.values())
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    def __getitem__(self, user_id):
+        return self._users[user_id]
+
+    def get(self, user_id, default=None):
+        return self._users.get(user_id, default)
+
+    def resolve(self, key):
+        """User for an id, handle, old handle or real name, or None"""
+        for index in (self._users, self.ids_by_name, self.ids_by_old_name, self.ids_by_real_name):
+            found = index.get(key)
+            if found is not None:
+                return found if index is self._users else self._users[found]
+        return None
+
+    def map(self, ids, field='real_name'):
+        """vectorized lookup of a User field for a whole column of ids
+
+        Args:
+            ids (pd.Series or array-like): user ids, unknown ones map to NaN
+            field (str): User field to return
+
+        Returns:
+            pd.Series: aligned with ids
+        """
+        if not isinstance(ids, pd.Series):
+            ids = pd.Series(ids)
+        return ids.map(self.frame[field])
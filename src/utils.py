@@ -25,6 +25,13 @@ import pyLDAvis
 
 from collections import Counter
 
+from src.cache import channel_tables
+from src.users import UserDirectory
+from src.text import default_normalizer, normalize_texts
+from src.markup import markup_frame
+from src.extract import (extract_messages, message_texts, reply_threads,
+                         community_participation, messages_dict_frame, epoch_to_datetime)
+
 
 import pandas as pd
 from matplotlib import pyplot as plt
@@ -65,92 +72,18 @@ def get_msgs_df_info(df):
 
 
 def get_messages_dict(msgs):
-    msg_list = {
-            "msg_id":[],
-            "text":[],
-            "attachments":[],
-            "user":[],
-            "mentions":[],
-            "emojis":[],
-            "reactions":[],
-            "replies":[],
-            "replies_to":[],
-            "ts":[],
-            "links":[],
-            "link_count":[]
-            }
-
-
-    for msg in msgs:
-        if "subtype" not in msg:
-            try:
-                msg_list["msg_id"].append(msg["client_msg_id"])
-            except:
-                msg_list["msg_id"].append(None)
-            
-            msg_list["text"].append(msg["text"])
-            msg_list["user"].append(msg["user"])
-            msg_list["ts"].append(msg["ts"])
-            
-            if "reactions" in msg:
-                msg_list["reactions"].append(msg["reactions"])
-            else:
-                msg_list["reactions"].append(None)
-
-            if "parent_user_id" in msg:
-                msg_list["replies_to"].append(msg["ts"])
-            else:
-                msg_list["replies_to"].append(None)
-
-            if "thread_ts" in msg and "reply_users" in msg:
-                msg_list["replies"].append(msg["replies"])
-            else:
-                msg_list["replies"].append(None)
-            
-            if "blocks" in msg:
-                emoji_list = []
-                mention_list = []
-                link_count = 0
-                links = []
-                
-                for blk in msg["blocks"]:
-                    if "elements" in blk:
-                        for elm in blk["elements"]:
-                            if "elements" in elm:
-                                for elm_ in elm["elements"]:
-                                    
-                                    if "type" in elm_:
-                                        if elm_["type"] == "emoji":
-                                            emoji_list.append(elm_["name"])
-
-                                        if elm_["type"] == "user":
-                                            mention_list.append(elm_["user_id"])
-                                        
-                                        if elm_["type"] == "link":
-                                            link_count += 1
-                                            links.append(elm_["url"])
-
-
-                msg_list["emojis"].append(emoji_list)
-                msg_list["mentions"].append(mention_list)
-                msg_list["links"].append(links)
-                msg_list["link_count"].append(link_count)
-            else:
-                msg_list["emojis"].append(None)
-                msg_list["mentions"].append(None)
-                msg_list["links"].append(None)
-                msg_list["link_count"].append(0)
-    
-    return msg_list
+    """per message columns (msg_id, text, user, mentions, emojis, reactions,
+    replies, replies_to, ts, links, link_count) of the messages without a
+    subtype, computed from the tables of src.extract"""
+    return messages_dict_frame(extract_messages(msgs)).to_dict('list')
 
 def from_msg_get_replies(msg):
     replies = []
     if "thread_ts" in msg and "replies" in msg:
         try:
             for reply in msg["replies"]:
-                reply["thread_ts"] = msg["thread_ts"]
-                reply["message_id"] = msg["client_msg_id"]
-                replies.append(reply)
+                # copies, the replies of msg are left as they were
+                replies.append(dict(reply, thread_ts=msg["thread_ts"], message_id=msg["client_msg_id"]))
         except:
             pass
     return replies
@@ -174,126 +107,84 @@ def process_msgs(msg):
     return msg_list, rply_list
 
 
-def get_messages_from_channel(channel_path):
+def get_messages_from_channel(channel_path, cache_dir=None, start=None, end=None):
     '''
-    get all the messages from a channel        
+    get all the messages from a channel, or only those of the days from
+    start to end (both inclusive)
     '''
-    json_files = [
-        f"{channel_path}/{pos_json}" 
-        for pos_json in os.listdir(channel_path) 
-        if pos_json.endswith('.json')
-    ]    
-    combined = []
-
-    for json_file in json_files:
-        with open(json_file, 'r', encoding="utf8") as slack_data:
-            json_content = json.load(slack_data)
-            combined.extend(json_content)
-        
-    msg_list = get_messages_dict(combined)
-    df = pd.DataFrame(msg_list)
-    
-    return df
+    tables = channel_tables(channel_path, ['messages', 'replies', 'reactions', 'mentions', 'emojis', 'links'],
+                            cache_dir, start, end)
+    return messages_dict_frame(tables)
 
-def get_all_channels_messages(channels):
+def get_all_channels_messages(channels, cache_dir=None):
+    """(text, ts) of every message without a subtype, read from the columnar
+    cache of src.cache when cache_dir is given and the channel is fresh"""
     messages = []
     for channel in channels:
-        # print(channel)
         base_path = "../anonymized/" + channel['name'] + '/'
+        messages.extend(message_texts(channel_tables(base_path, ['messages'], cache_dir)['messages']))
 
-        json_files = [f"{base_path}/{pos_json}"  for pos_json in os.listdir(base_path) if pos_json.endswith('.json')]  
-
-        combined = []
-
-        for json_file in json_files:
-            with open(json_file, 'r', encoding="utf8") as slack_data:
-                json_content = json.load(slack_data)
-            combined.extend(json_content)
-        
-        for msg in combined:
-            if "subtype" not in msg:
-                text = msg.get("text", None)
-                ts = msg.get("ts", None)
-
-                messages.append((text, ts))
-        
     return messages
 
-def get_all_channels_replies(channels):
+def get_all_channels_replies(channels, cache_dir=None):
+    """replies of every thread, one list per parent message, read from the
+    columnar cache of src.cache when cache_dir is given and the channel is fresh"""
     replies = []
     for channel in channels:
-        # print(channel)
         base_path = "../anonymized/" + channel['name'] + '/'
-
-        json_files = [f"{base_path}/{pos_json}"  for pos_json in os.listdir(base_path) if pos_json.endswith('.json')]  
-
-        combined = []
-
-        for json_file in json_files:
-            with open(json_file, 'r', encoding="utf8") as slack_data:
-                json_content = json.load(slack_data)
-            combined.extend(json_content)
-
-        reply_timestamps = []
-
-        for msg in combined:    
-            msg_reply = from_msg_get_replies(msg) 
-            if msg_reply: 
-                reply_timestamps.append(msg_reply)
-
-        replies.extend(reply_timestamps)
+        replies.extend(reply_threads(channel_tables(base_path, ['replies'], cache_dir)['replies']))
 
     return replies
 
-def convert_2_timestamp(column, data):
-    """convert from unix time to readable timestamp
-        args: column: columns that needs to be converted to timestamp
+def convert_2_timestamp(column, data, tz='UTC'):
+    """convert from unix time to timezone-aware timestamps, a whole column at a time
+        args: column: column, or list of columns, that needs to be converted to timestamp
                 data: data that has the specified column
+                tz: timezone of the result, UTC by default
+        returns: a datetime64 Series for one column, a DataFrame for a list of
+                columns; missing values and 0 placeholders become NaT
     """
-    if column in data.columns.values:
-        timestamp_ = []
-        for time_unix in data[column]:
-            if time_unix == 0:
-                timestamp_.append(0)
-            else:
-                a = datetime.datetime.fromtimestamp(float(time_unix))
-                timestamp_.append(a.strftime('%Y-%m-%d %H:%M:%S'))
-        return timestamp_
-    else: print(f"{column} not in data")
+    columns = [column] if isinstance(column, str) else list(column)
+    missing = [name for name in columns if name not in data.columns.values]
+    for name in missing:
+        print(f"{name} not in data")
+    if len(missing) == len(columns):
+        return None
+
+    converted = pd.DataFrame({name: epoch_to_datetime(data[name]).dt.tz_convert(tz)
+                              for name in columns if name not in missing})
+    return converted[column] if isinstance(column, str) else converted
 
 
 def get_tagged_users(df):
-    """get all @ in the messages"""
+    """get all @ in the messages, as '@' + user id, from the markup tokens of src.markup"""
 
-    return df['msg_content'].map(lambda x: re.findall(r'@U\w+', x))
+    return markup_frame(df['msg_content'])['mentions'].map(lambda ids: ['@' + user_id for user_id in ids])
 
 
-def map_userid_2_realname(user_profile: dict, comm_dict: dict, plot=False):
+def map_userid_2_realname(user_profile, comm_dict, plot=False, id_column='user'):
     """
-    map slack_id to realnames
-    user_profile: a dictionary that contains users info such as real_names
-    comm_dict: a dictionary that contains slack_id and total_message sent by that slack_id
+    map slack_id to realnames with a single join
+    user_profile: users info such as real_names, as the users.json list, a
+        DataFrame of it or a src.users.UserDirectory
+    comm_dict: slack_id -> total_message sent by that slack_id, as a dict or
+        a Series, or a DataFrame with the slack_ids in its id_column
+    returns: the LearnerName / '# of Msg sent in Threads' table for counts,
+        or the DataFrame with a real_name column added
     """
-    user_dict = {} # to store the id
-    real_name = [] # to store the real name
-    ac_comm_dict = {} # to store the mapping
-    count = 0
-    # collect all the real names
-    for i in range(len(user_profile['profile'])):
-        real_name.append(dict(user_profile['profile'])[i]['real_name'])
-
-    # loop the slack ids
-    for i in user_profile['id']:
-        user_dict[i] = real_name[count]
-        count += 1
-
-    # to store mapping
-    for i in comm_dict:
-        if i in user_dict:
-            ac_comm_dict[user_dict[i]] = comm_dict[i]
-
-    ac_comm_dict = pd.DataFrame(data= zip(ac_comm_dict.keys(), ac_comm_dict.values()),
-    columns=['LearnerName', '# of Msg sent in Threads']).sort_values(by='# of Msg sent in Threads', ascending=False)
+    directory = user_profile if isinstance(user_profile, UserDirectory) else UserDirectory(user_profile)
+    real_names = directory.frame['real_name'].rename_axis('_id').reset_index()
+
+    if isinstance(comm_dict, pd.DataFrame):
+        merged = comm_dict.merge(real_names, how='left', left_on=id_column, right_on='_id')
+        return merged.drop(columns='_id').set_axis(comm_dict.index)
+
+    counts = pd.Series(comm_dict) if len(comm_dict) else pd.Series(dtype='int64')
+    counts = counts.rename_axis('_id').rename('# of Msg sent in Threads').reset_index()
+    ac_comm_dict = counts.merge(real_names, on='_id', how='inner')
+    ac_comm_dict = ac_comm_dict.rename(columns={'real_name': 'LearnerName'})
+    ac_comm_dict = ac_comm_dict[['LearnerName', '# of Msg sent in Threads']]
+    ac_comm_dict = ac_comm_dict.sort_values(by='# of Msg sent in Threads', ascending=False, kind='stable')
     
     if plot:
         ac_comm_dict.plot.bar(figsize=(15, 7.5), x='LearnerName', y='# of Msg sent in Threads')
@@ -301,61 +192,24 @@ def map_userid_2_realname(user_profile: dict, comm_dict: dict, plot=False):
         
     return ac_comm_dict
 
-def get_community_participation(path):
+def get_community_participation(path, cache_dir=None):
     """ specify path to get json files"""
-    combined = []
-    comm_dict = {}
-    for json_file in glob.glob(f"{path}*.json"):
-        with open(json_file, 'r') as slack_data:
-            combined.append(slack_data)
-    # print(f"Total json files is {len(combined)}")
-
-    for i in combined:
-        a = json.load(open(i.name, 'r', encoding='utf-8'))
-
-        for msg in a:
-            if 'replies' in msg.keys():
-                for i in msg['replies']:
-                    comm_dict[i['user']] = comm_dict.get(i['user'], 0)+1
-
-    return comm_dict
+    return community_participation(channel_tables(path, ['replies'], cache_dir)['replies'])
 
 
 def preprocess_text(text):
+    """normalize one message text, see src.text.TextNormalizer
 
-    # print("here")
-    # Extract and remove URLs
-    urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
-    for url in urls:
-        text = text.replace(url, '')
-
-    text = re.sub(r'<@.*?>', '', text)
-
-    # Convert to lowercase
-    text = text.lower()
-
-    # Remove punctuation
-    text = ''.join([char for char in text if char not in string.punctuation])
-
-    # Remove numbers
-    text = re.sub(r'\d+', '', text)
-
-    # Tokenize
-    tokens = word_tokenize(text)
-
-    # Remove stop words
-    stop_words = set(stopwords.words('english'))
-    tokens = [word for word in tokens if word not in stop_words]
-
-    # Perform stemming
-    stemmer = PorterStemmer()
-    tokens = [stemmer.stem(word) for word in tokens]
+    The stop words, stemmer and lemmatizer are loaded once and shared by
+    every call; use preprocess_texts for a whole column.
+    """
+    return default_normalizer().normalize(text)
 
-    # Perform lemmatization
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(word) for word in tokens]
 
-    # Join the tokens back into a string
-    text = ' '.join(tokens)
+def preprocess_texts(texts, workers=1):
+    """normalize a batch of message texts, optionally over worker processes
 
-    return text
+    Returns:
+        tuple: (list of token lists, list of the tokens joined by spaces)
+    """
+    return normalize_texts(texts, workers=workers)
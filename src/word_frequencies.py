@@ -0,0 +1,185 @@
+"""Word frequencies per channel and week, for word clouds.
+
+draw_wordcloud used to join every message of a week into one string and
+let WordCloud tokenize it and drop the stop words again, once per cloud.
+Here the messages of every (channel, week) are tokenized once, with a
+src.text.TextNormalizer (the project's stop words, links, mentions,
+emojis, code, punctuation and digits dropped, lower-cased) that keeps words unstemmed
+so they stay readable, and only the word counts are stored:
+
+    frequencies(channels=['all-week3'])   {word: count} of some channels
+    clouds(week_folder)                   the same for the twelve all-weekN
+                                          channels, in one groupby
+
+Both feed WordCloud.generate_from_frequencies. Weeks start on Monday, and
+only messages without a subtype are counted, as in get_all_channels_messages.
+The counts are stored in one parquet file next to a src.manifest.Manifest;
+a refresh re-counts only the weeks that have a new or changed day file:
+
+    <folder>/word_frequencies.parquet
+    <folder>/_manifest.json
+
+Usage:
+    python -m src.ingest --path anonymized --store word_frequencies
+
+"""
+import os
+import datetime
+from collections import Counter
+from functools import lru_cache
+
+import pandas as pd
+
+from src.loader import list_day_files
+from src.manifest import TableStore, day_name
+from src.text import TextNormalizer
+
+
+# bumped whenever the counting changes, so older folders are rebuilt
+WORD_FREQUENCIES_VERSION = 2
+
+FREQUENCIES_FILE = 'word_frequencies.parquet'
+
+
+class _Unstemmed:
+    """stemmer that keeps words as they are"""
+
+    @staticmethod
+    def stem(word):
+        return word
+
+
+@lru_cache(maxsize=None)
+def cloud_normalizer():
+    """the shared TextNormalizer of word clouds: NLTK's stop words, no stemming or lemmatizing"""
+    return TextNormalizer(stemmer=_Unstemmed(), lemmatize=False)
+
+
+def word_counts(texts, normalizer=None):
+    """counts of the normalized words of message texts
+
+    Args:
+        texts (iterable of str): message texts
+        normalizer (TextNormalizer): defaults to cloud_normalizer()
+
+    Returns:
+        Counter: word -> count
+    """
+    normalizer = normalizer or cloud_normalizer()
+    counts = Counter()
+    for text in texts:
+        counts.update(normalizer.tokens(text))
+    return counts
+
+
+def week_start(day):
+    """Monday of the week of a 'YYYY-MM-DD' day, as a string, None for other names"""
+    try:
+        date = datetime.date.fromisoformat(day)
+    except ValueError:
+        return None
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+def day_texts(tables):
+    """texts of the messages without a subtype of the extract_day tables of a day file"""
+    return [row['text'] for row in tables['messages'] if row['subtype'] is None]
+
+
+class WordFrequencies(TableStore):
+    """Word counts of every channel and week of an export.
+
+    Args:
+        folder (str): folder the counts are stored in
+        normalizer (TextNormalizer): tokenizes the messages, defaults to
+            cloud_normalizer(); pass the same one for every update of a folder
+
+    Attributes:
+        table (pd.DataFrame): 'channel', 'week' (its Monday), 'word' and
+            'count', one row per word used in a channel and week
+
+    """
+
+    version = WORD_FREQUENCIES_VERSION
+    FILE = FREQUENCIES_FILE
+    COLUMNS = {'channel': object, 'week': object, 'word': object, 'count': 'int32'}
+    KEY = ['channel', 'week']
+    SORT = ['channel', 'week', 'word']
+
+    def __init__(self, folder, normalizer=None):
+        self.normalizer = normalizer
+        super().__init__(folder)
+
+    def wanted(self, channel, changed, removed):
+        """all the day files of the weeks with a new, changed or removed day file"""
+        weeks = {week_start(day_name(day_file)) for day_file in changed + removed}
+        return [day_file for day_file in list_day_files(os.path.join(self.manifest.source, channel))
+                if week_start(day_name(day_file)) in weeks]
+
+    def add(self, channel, days, removed):
+        """re-count the weeks of the days read, returns the (channel, week) counts (re)built or dropped"""
+        counts = {week_start(day): Counter() for day in removed + list(days)}
+        for day, tables in days.items():
+            counts[week_start(day)].update(word_counts(day_texts(tables), self.normalizer))
+        counts.pop(None, None)
+
+        frames = [pd.DataFrame({'channel': channel, 'week': week, 'word': list(words.keys()),
+                                'count': list(words.values())})
+                  for week, words in sorted(counts.items()) if words]
+        frame = pd.concat(frames, ignore_index=True) if frames else self.table.iloc[:0]
+        return self.replace([(channel, week) for week in sorted(counts)], frame)
+
+    def frequencies(self, channels=None, start=None, end=None, n=None):
+        """word counts summed over some channels and weeks
+
+        Args:
+            channels (list of str): only these channels
+            start, end (str): only the weeks starting from start to end, both inclusive
+            n (int): only the n most frequent words
+
+        Returns:
+            dict: word -> count, most frequent first
+        """
+        table = self._select(channels, start, end)
+        totals = table.groupby('word')['count'].sum().sort_values(ascending=False, kind='stable')
+        return (totals if n is None else totals.head(n)).to_dict()
+
+    def clouds(self, groups=None, start=None, end=None, n=None):
+        """word counts of every group of channels, in one pass over the table
+
+        Args:
+            groups: None for one group per channel, 'workspace' for all the
+                channels together, or a dict or function from channel to
+                group (channels it maps to None are left out), such as
+                src.active_users.week_folder
+            start, end (str): only the weeks starting from start to end, both inclusive
+            n (int): only the n most frequent words of each group
+
+        Returns:
+            dict: group -> {word: count}, most frequent first
+        """
+        table = self._select(None, start, end)
+        if groups == 'workspace':
+            group = pd.Series('workspace', index=table.index)
+        elif groups is not None:
+            group = table['channel'].map(groups)
+        else:
+            group = table['channel']
+        totals = table.groupby([group.rename('group'), 'word'])['count'].sum()
+
+        clouds = {}
+        for name, counts in totals.groupby(level='group'):
+            counts = counts.droplevel('group').sort_values(ascending=False, kind='stable')
+            clouds[name] = (counts if n is None else counts.head(n)).to_dict()
+        return clouds
+
+    def _select(self, channels, start, end):
+        table = self.table
+        if channels is not None:
+            table = table[table['channel'].isin(channels)]
+        if start is not None:
+            table = table[table['week'] >= str(start)]
+        if end is not None:
+            table = table[table['week'] <= str(end)]
+        return table.reset_index(drop=True)
+
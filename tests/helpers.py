@@ -0,0 +1,57 @@
+"""Fixtures shared by the test modules: messages and small slack exports on disk."""
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+
+BLOCKS = [{'type': 'rich_text', 'elements': [{'type': 'rich_text_section', 'elements': [
+    {'type': 'text', 'text': 'see '},
+    {'type': 'link', 'url': 'https://example.com'},
+    {'type': 'user', 'user_id': 'U2'},
+    {'type': 'emoji', 'name': 'tada'},
+]}]}]
+
+
+def message(text, ts, **fields):
+    return dict({'type': 'message', 'user': 'U1', 'text': text, 'ts': ts,
+                 'user_profile': {'real_name': 'Ann A'}}, **fields)
+
+
+def write_export(root, days):
+    """write a minimal slack export with a single 'general' channel"""
+    with open(os.path.join(root, 'users.json'), 'w') as f:
+        json.dump([{'id': 'U1', 'name': 'ann', 'profile': {'real_name': 'Ann A'}}], f)
+    with open(os.path.join(root, 'channels.json'), 'w') as f:
+        json.dump([{'id': 'C1', 'name': 'general'}], f)
+
+    os.makedirs(os.path.join(root, 'general'))
+    for day, messages in days.items():
+        write_day(root, day, messages)
+
+
+def write_day(root, day, messages, channel='general'):
+    """write (or overwrite) the day file of a channel of an export"""
+    with open(os.path.join(root, channel, f'{day}.json'), 'w') as f:
+        json.dump(messages, f)
+
+
+class ExportTestCase(unittest.TestCase):
+    """Test case with DAYS written to a temporary export.
+
+    Attributes:
+        export (str): the export, with a single 'general' channel
+        folder (str): an empty path next to it for what the tests build
+
+    """
+
+    DAYS = {}
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.export = os.path.join(self.root, 'export')
+        self.folder = os.path.join(self.root, 'output')
+        os.makedirs(self.export)
+        write_export(self.export, self.DAYS)
@@ -0,0 +1,54 @@
+import unittest
+
+from src.active_users import ActiveUsers, week_folder
+from src.sketches import HyperLogLog
+from tests.helpers import ExportTestCase, message, write_day
+
+
+class HyperLogLogTestCase(unittest.TestCase):
+    def test_estimate_and_merge(self):
+        first, second = HyperLogLog().update(range(3000)), HyperLogLog().update(range(2000, 5000))
+        self.assertAlmostEqual(first.count(), 3000, delta=3000 * 0.05)
+        self.assertAlmostEqual((first | second).count(), 5000, delta=5000 * 0.05)
+        self.assertEqual(round(HyperLogLog().update(['U1', 'U2', 'U1']).count()), 2)
+        self.assertEqual(HyperLogLog.from_bytes(first.to_bytes()).count(), first.count())
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(10))
+
+
+class ActiveUsersTestCase(ExportTestCase):
+    # 2022-08-21 is a Sunday, 2022-08-22 a Monday
+    DAYS = {
+        '2022-08-21': [message('a', '1661072000.000100'), message('b', '1661072100.000100', user='U2'),
+                       message('joined', '1661072200.000100', user='U3', subtype='channel_join')],
+        '2022-08-22': [message('c', '1661158700.000200', user='U2')],
+    }
+
+    def test_rollups(self):
+        sketches = ActiveUsers.refresh(self.export, self.folder)
+        weekly = sketches.rollup('week')
+        self.assertEqual(list(weekly['group']), ['general', 'general'])
+        self.assertEqual([str(period.date()) for period in weekly['period']], ['2022-08-15', '2022-08-22'])
+        self.assertEqual([round(users) for users in weekly['users']], [2, 1])
+        self.assertEqual(round(sketches.rollup(None, 'workspace')['users'][0]), 2)
+        self.assertEqual(round(sketches.rollup('month', {'general': 'all'})['users'][0]), 2)
+        self.assertTrue(sketches.rollup(None, week_folder).empty)
+        self.assertEqual(round(sketches.sketch(start='2022-08-22').count()), 1)
+
+    def test_incremental_update(self):
+        ActiveUsers.refresh(self.export, self.folder)
+        write_day(self.export, '2022-08-23', [message('d', '1661245100.000100', user='U4')])
+
+        sketches = ActiveUsers(self.folder)
+        self.assertEqual(sketches.update(self.export), [('general', '2022-08-23')])
+        self.assertEqual(len(sketches.table), 3)
+        self.assertEqual(round(sketches.rollup(None)['users'][0]), 3)
+
+    def test_week_folder(self):
+        self.assertEqual(week_folder('all-week1'), 'week 1')
+        self.assertEqual(week_folder('all-ml-week12'), 'week 12')
+        self.assertIsNone(week_folder('week-11-group4'))
+
+
+if __name__ == '__main__':
+    unittest.main()
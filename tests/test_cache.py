@@ -0,0 +1,79 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.cache import compile_export, is_stale, read_table
+from src.loader import slack_parser, parse_slack_reaction
+from tests.helpers import message, write_export
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.export = os.path.join(self.root, 'export')
+        self.cache = os.path.join(self.root, 'cache')
+        os.makedirs(self.export)
+        write_export(self.export, {
+            '2022-08-21': [
+                message('question', '1661072000.000100', thread_ts='1661072000.000100', client_msg_id='m1',
+                        reply_count=1, reply_users_count=1, reply_users=['U2'], latest_reply='1661072100.000100',
+                        replies=[{'user': 'U2', 'ts': '1661072100.000100'}],
+                        reactions=[{'name': 'tada', 'count': 2, 'users': ['U1', 'U2']}]),
+                message('answer', '1661072100.000100', thread_ts='1661072000.000100', parent_user_id='U1'),
+            ],
+            '2022-08-22': [message('hello', '1661158700.000200'),
+                           {'type': 'message', 'bot_id': 'B1', 'text': 'bot', 'ts': '1661158800.000200'}],
+        })
+        compile_export(self.export, self.cache)
+
+    def test_views_match_json(self):
+        path = f"{self.export}/general/"
+        pd.testing.assert_frame_equal(slack_parser(path), slack_parser(path, cache_dir=self.cache))
+        pd.testing.assert_frame_equal(parse_slack_reaction(path, 'general'),
+                                      parse_slack_reaction(path, 'general', cache_dir=self.cache))
+        pd.testing.assert_frame_equal(slack_parser(path, start='2022-08-22'),
+                                      slack_parser(path, cache_dir=self.cache, start='2022-08-22'))
+        pd.testing.assert_frame_equal(slack_parser(path, typed=True),
+                                      slack_parser(path, cache_dir=self.cache, typed=True))
+
+    def test_read_table_pushdown(self):
+        df = read_table(self.cache, 'messages', columns=['text'], filters=[('day', '=', '2022-08-22')])
+        self.assertEqual(list(df.columns), ['text'])
+        self.assertEqual(list(df['text']), ['hello', 'bot'])
+        self.assertEqual(list(read_table(self.cache, 'replies', channel='general')['user']), ['U2'])
+
+    def test_stale_after_new_day_file(self):
+        self.assertFalse(is_stale(self.cache, self.export))
+        with open(os.path.join(self.export, 'general', '2022-08-23.json'), 'w') as f:
+            json.dump([message('new', '1661245100.000100')], f)
+        self.assertTrue(is_stale(self.cache, self.export, 'general'))
+
+        # a stale cache falls back to the raw json
+        df = slack_parser(f"{self.export}/general/", cache_dir=self.cache)
+        self.assertEqual(df['msg_content'].iloc[-1], 'new')
+
+    def test_refresh_only_parses_changed_files(self):
+        day_path = os.path.join(self.export, 'general', '2022-08-22.json')
+        with open(day_path, 'w') as f:
+            json.dump([message('edited', '1661158700.000200')], f)
+        with open(os.path.join(self.export, 'general', '2022-08-23.json'), 'w') as f:
+            json.dump([message('new', '1661245100.000100')], f)
+
+        parsed = compile_export(self.export, self.cache)
+        self.assertEqual(parsed, {'general': ['2022-08-22.json', '2022-08-23.json']})
+        self.assertFalse(is_stale(self.cache, self.export))
+        self.assertEqual(list(read_table(self.cache, 'messages', columns=['text'])['text']),
+                         ['question', 'answer', 'edited', 'new'])
+
+        # touching a file without changing it does not trigger a re-parse
+        os.utime(day_path, (0, 0))
+        self.assertEqual(compile_export(self.export, self.cache), {'general': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import unittest
+
+from src.decode import available_backends, decode_day, loads
+from src.extract import extract_day
+from tests.helpers import BLOCKS, message
+
+
+class DecodeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.raw = json.dumps([
+            message('see', '1661072000.000100', client_msg_id='m1', blocks=BLOCKS,
+                    user_profile={'real_name': 'Ann A', 'image_72': 'https://example.com/a.png'},
+                    replies=[{'user': 'U2', 'ts': '1661072100.000100'}],
+                    reactions=[{'name': 'tada', 'count': 1, 'users': ['U2']}],
+                    files=[{'id': 'F1', 'name': 'a.png', 'filetype': 'png', 'size': 10, 'user': 'U1'}],
+                    attachments=[{'fallback': 'unused'}]),
+            message('plain', '1661072200.000100', blocks=None, subtype='channel_join'),
+        ]).encode()
+
+    def test_backends_extract_the_same_rows(self):
+        expected = extract_day(json.loads(self.raw))
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                self.assertEqual(loads(self.raw, backend), json.loads(self.raw))
+                self.assertEqual(extract_day(decode_day(self.raw, backend)), expected)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            loads(self.raw, 'simplejson')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from src.engagement import EngagementCube, MEASURES
+from src.users import UserDirectory
+from tests.helpers import ExportTestCase, message, write_day
+
+
+MENTION = [{'type': 'rich_text', 'elements': [{'type': 'rich_text_section', 'elements': [
+    {'type': 'user', 'user_id': 'U2'}, {'type': 'link', 'url': 'https://example.com'}]}]}]
+
+
+class EngagementCubeTestCase(ExportTestCase):
+    DAYS = {
+        '2022-08-21': [
+            message('question', '1661072000.000100', thread_ts='1661072000.000100', reply_count=1,
+                    blocks=MENTION, reactions=[{'name': 'tada', 'count': 2, 'users': ['U2', 'U3']}]),
+            message('answer', '1661072100.000100', user='U2', thread_ts='1661072000.000100',
+                    parent_user_id='U1'),
+            message('joined', '1661072200.000100', user='U3', subtype='channel_join'),
+            {'type': 'message', 'bot_id': 'B1', 'text': 'bot', 'ts': '1661072300.000100'},
+        ],
+        '2022-08-22': [message('hello', '1661158700.000200')],
+    }
+
+    def test_counts(self):
+        cube = EngagementCube.refresh(self.export, self.folder)
+        self.assertEqual(list(cube.table['user']), ['U1', 'U2', 'U3', 'U1'])
+        first = cube.table.iloc[0][MEASURES].to_dict()
+        self.assertEqual(first, {'messages': 1, 'replies': 0, 'replies_received': 1, 'reactions_received': 2,
+                                 'mentions': 1, 'mentioned': 0, 'links': 1})
+        self.assertEqual(cube.table.iloc[1][['messages', 'replies', 'mentioned']].tolist(), [1, 1, 1])
+        # the join message has a sender profile, as slack_parser counts it
+        self.assertEqual(cube.table.iloc[2]['messages'], 1)
+
+        self.assertEqual(cube.rollup('user', 'messages').to_dict(), {'U1': 2, 'U2': 1, 'U3': 1})
+        self.assertEqual(cube.rollup('day', 'messages', start='2022-08-22').to_dict(), {'2022-08-22': 1})
+        self.assertEqual(list(cube.leaderboard('messages', 2).index), ['U1', 'U2'])
+        self.assertEqual(list(cube.leaderboard('replies', 2, bottom=True)), [1])
+        users = UserDirectory([{'id': 'U1', 'name': 'ann', 'real_name': 'Ann A'}])
+        self.assertEqual(list(cube.leaderboard('messages', 2, users=users).index), ['Ann A', 'U2'])
+        self.assertEqual(cube.rollup(['channel', 'user'], 'messages', users=users)[('general', 'Ann A')], 2)
+
+        # two ids with the same real name are summed into one row
+        users = UserDirectory([{'id': 'U1', 'name': 'ann', 'real_name': 'Ann A'},
+                               {'id': 'U2', 'name': 'ann2', 'real_name': 'Ann A'}])
+        self.assertEqual(cube.leaderboard('messages', users=users).to_dict(), {'Ann A': 3, 'U3': 1})
+        by_channel = cube.rollup(['channel', 'user'], 'messages', users=users)
+        self.assertEqual(by_channel.to_dict(), {('general', 'Ann A'): 3, ('general', 'U3'): 1})
+        self.assertEqual(by_channel.unstack().shape, (1, 2))
+
+    def test_incremental_update(self):
+        EngagementCube.refresh(self.export, self.folder)
+        write_day(self.export, '2022-08-22', [message('hello', '1661158700.000200'),
+                                              message('again', '1661158800.000200')])
+        write_day(self.export, '2022-08-23', [message('new', '1661245100.000100', user='U2')])
+
+        cube = EngagementCube(self.folder)
+        self.assertEqual(sorted(cube.update(self.export)), [('general', '2022-08-22'), ('general', '2022-08-23')])
+        cube.save()
+        cube = EngagementCube(self.folder)
+        self.assertEqual(cube.rollup('day', 'messages').to_dict(),
+                         {'2022-08-21': 3, '2022-08-22': 2, '2022-08-23': 1})
+        self.assertEqual(cube.update(self.export), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
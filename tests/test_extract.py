@@ -0,0 +1,45 @@
+import unittest
+
+from src.extract import extract_day, extract_messages, reply_threads
+from src.utils import get_messages_dict
+from tests.helpers import BLOCKS, message
+
+
+class ExtractTestCase(unittest.TestCase):
+    def setUp(self):
+        self.messages = [
+            message('see', '1661072000.000100', client_msg_id='m1', blocks=BLOCKS,
+                    thread_ts='1661072000.000100', reply_users=['U2'],
+                    replies=[{'user': 'U2', 'ts': '1661072100.000100'}],
+                    reactions=[{'name': 'tada', 'count': 1, 'users': ['U2']}],
+                    files=[{'id': 'F1', 'name': 'a.png', 'filetype': 'png', 'size': 10, 'user': 'U1'}]),
+            message('joined', '1661072050.000100', subtype='channel_join'),
+            message('plain', '1661072200.000100', blocks=None),
+        ]
+
+    def test_one_pass_fills_every_table(self):
+        tables = extract_day(self.messages)
+        self.assertEqual({table: len(rows) for table, rows in tables.items()},
+                         {'messages': 3, 'replies': 1, 'reactions': 1, 'mentions': 1,
+                          'links': 1, 'emojis': 1, 'files': 1})
+        self.assertEqual(tables['links'], [{'seq': 0, 'url': 'https://example.com'}])
+        self.assertEqual([row['has_blocks'] for row in tables['messages']], [True, False, False])
+
+    def test_messages_dict_view(self):
+        msg_list = get_messages_dict(self.messages)
+        self.assertEqual(msg_list['text'], ['see', 'plain'])
+        self.assertEqual(msg_list['mentions'], [['U2'], None])
+        self.assertEqual(msg_list['emojis'], [['tada'], None])
+        self.assertEqual(msg_list['links'], [['https://example.com'], None])
+        self.assertEqual(msg_list['link_count'], [1, 0])
+        self.assertEqual(msg_list['replies'], [[{'user': 'U2', 'ts': '1661072100.000100'}], None])
+        self.assertEqual(msg_list['reactions'], [[{'name': 'tada', 'users': ['U2'], 'count': 1}], None])
+
+    def test_reply_threads_view(self):
+        threads = reply_threads(extract_messages(self.messages)['replies'])
+        self.assertEqual(threads, [[{'user': 'U2', 'ts': '1661072100.000100',
+                                     'thread_ts': '1661072000.000100', 'message_id': 'm1'}]])
+
+
+if __name__ == '__main__':
+    unittest.main()
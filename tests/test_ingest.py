@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from src import manifest
+from src.manifest import DayStore, ingest, refresh_stores
+from src.engagement import EngagementCube
+from src.word_frequencies import WordFrequencies
+from src.ingest import refresh_all
+from tests.helpers import ExportTestCase, message, write_day
+from tests.test_word_frequencies import NORMALIZER
+
+
+class DaysStore(DayStore):
+    """store that only remembers the days it was handed"""
+
+    version = 1
+
+    def __init__(self, folder):
+        super().__init__(folder)
+        self.days = []
+
+    def reset(self):
+        self.days = []
+
+    def add(self, channel, days, removed):
+        self.days.extend(days)
+        return [(channel, day) for day in removed + list(days)]
+
+
+class IngestTestCase(ExportTestCase):
+    # 2022-08-21 is a Sunday, 2022-08-22 a Monday
+    DAYS = {
+        '2022-08-21': [message('The models', '1661072000.000100')],
+        '2022-08-22': [message('models data', '1661158700.000200', user='U2')],
+    }
+
+    def setUp(self):
+        super().setUp()
+        decode_day, self.decoded = manifest.decode_day, []
+
+        def counting_decode_day(raw):
+            self.decoded.append(raw)
+            return decode_day(raw)
+
+        manifest.decode_day = counting_decode_day
+        self.addCleanup(setattr, manifest, 'decode_day', decode_day)
+
+    def stores(self):
+        return [EngagementCube(os.path.join(self.folder, 'engagement')),
+                WordFrequencies(os.path.join(self.folder, 'word_frequencies'), NORMALIZER),
+                DaysStore(os.path.join(self.folder, 'days'))]
+
+    def test_each_day_file_read_once(self):
+        cube, frequencies, days = self.stores()
+        updated = refresh_stores(self.export, [cube, frequencies, days])
+        self.assertEqual(len(self.decoded), 2)
+        self.assertEqual(updated[0], [('general', '2022-08-21'), ('general', '2022-08-22')])
+        self.assertEqual(updated[1], [('general', '2022-08-15'), ('general', '2022-08-22')])
+        self.assertEqual(cube.rollup('user', 'messages').to_dict(), {'U1': 1, 'U2': 1})
+        self.assertEqual(frequencies.frequencies(), {'models': 2, 'data': 1})
+
+        alone = EngagementCube.refresh(self.export, os.path.join(self.folder, 'alone'))
+        self.assertTrue(alone.table.equals(cube.table))
+
+    def test_incremental(self):
+        refresh_stores(self.export, self.stores())
+        write_day(self.export, '2022-08-23', [message('data', '1661245100.000100')])
+        self.decoded.clear()
+
+        cube, frequencies, days = self.stores()
+        updated = refresh_stores(self.export, [cube, frequencies, days])
+        # the week of the new day is re-counted from all of its day files
+        self.assertEqual(len(self.decoded), 2)
+        self.assertEqual(days.days, ['2022-08-23'])
+        self.assertEqual(updated[:2], [[('general', '2022-08-23')], [('general', '2022-08-22')]])
+        self.assertEqual(frequencies.frequencies(start='2022-08-22'), {'data': 2, 'models': 1})
+        self.assertEqual(ingest(self.export, self.stores()), [[], [], []])
+
+    def test_refresh_all(self):
+        stores, updated = refresh_all(self.export, ['engagement', 'active_users', 'term_sketches'], self.folder)
+        self.assertEqual(len(self.decoded), 2)
+        self.assertEqual({name: len(keys) for name, keys in updated.items()},
+                         {'engagement': 2, 'active_users': 2, 'term_sketches': 2})
+        self.assertEqual(round(stores['active_users'].rollup(None, 'workspace')['users'][0]), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.folder, '.slack_term_sketches', 'term_sketches.parquet')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.latency import thread_latency, reply_gaps, latency_summary
+from src.threads import ThreadIndex
+from src.users import UserDirectory
+from tests.helpers import message, write_export
+
+
+class LatencyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_export(self.root, {
+            # 2022-08-22 is a Monday
+            '2022-08-22': [
+                message('why?', '1661160000.000000', thread_ts='1661160000.000000'),
+                message('because', '1661160060.000000', user='U2', thread_ts='1661160000.000000'),
+                message('thanks', '1661160360.000000', thread_ts='1661160000.000000'),
+                message('fyi', '1661163600.000000', user='U2', thread_ts='1661163600.000000'),
+                message('ok', '1661167200.000000', thread_ts='1661163600.000000'),
+                message('unanswered', '1661170000.000000', thread_ts='1661170000.000000'),
+            ],
+        })
+        self.index = ThreadIndex.from_export(self.root)
+
+    def test_thread_latency(self):
+        table = thread_latency(self.index)
+        self.assertEqual(list(table['first_reply'][:2]), [60.0, 3600.0])
+        self.assertEqual(list(table['last_reply'][:2]), [360.0, 3600.0])
+        self.assertTrue(np.isnan(table['first_reply'][2]))
+        self.assertEqual(list(table['is_question']), [True, False, False])
+        self.assertEqual(list(table['weekday'].astype(str)), ['Monday'] * 3)
+        self.assertEqual(list(table['hour']), [9, 10, 12])
+        self.assertEqual(list(table['role']), ['member'] * 3)
+
+        users = UserDirectory([{'id': 'U1', 'name': 'ann', 'is_admin': True}, {'id': 'U2', 'name': 'bob'}])
+        self.assertEqual(list(thread_latency(self.index, users)['role']), ['admin', 'member', 'admin'])
+        self.assertEqual(list(thread_latency(self.index, tz='Africa/Addis_Ababa')['hour']), [12, 13, 15])
+
+    def test_reply_gaps(self):
+        gaps = reply_gaps(self.index)
+        self.assertEqual(list(gaps['thread_ts']), ['1661160000.000000'])
+        self.assertEqual(list(gaps['gap']), [300.0])
+
+    def test_latency_summary(self):
+        table = thread_latency(self.index)
+        summary = latency_summary(table, unit='min', percentiles=(0.5, 1))
+        self.assertEqual(summary.loc['all'].to_dict(), {'count': 2, 'mean': 30.5, 'p50': 30.5, 'p100': 60.0})
+        by_question = latency_summary(table, 'last_reply', by='is_question')
+        self.assertEqual(list(by_question.index), [False, True])
+        self.assertEqual(list(by_question['p50']), [3600.0, 360.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import date
+
+import pandas as pd
+
+from src.loader import SlackDataLoader, list_day_files, slack_parser, parallel_slack_parser, parse_slack_reaction
+from tests.helpers import write_export
+
+
+class GetChannelMessagesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        write_export(self.root, {
+            '2022-08-22': [
+                {'type': 'message', 'user': 'U1', 'text': 'c', 'ts': '1661158800.000300',
+                 'user_profile': {'real_name': 'Ann A'}},
+                {'type': 'message', 'user': 'U1', 'text': 'b', 'ts': '1661158700.000200',
+                 'user_profile': {'real_name': 'Ann A'}},
+            ],
+            '2022-08-21': [
+                {'type': 'message', 'subtype': 'channel_join', 'user': 'U1', 'text': 'joined',
+                 'ts': '1661072000.000100'},
+                {'type': 'message', 'bot_id': 'B1', 'text': 'bot', 'ts': '1661072100.000100'},
+            ],
+        })
+        self.loader = SlackDataLoader(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_day_files_in_date_order(self):
+        self.assertEqual(list_day_files(os.path.join(self.root, 'general')),
+                         ['2022-08-21.json', '2022-08-22.json'])
+
+    def test_other_files_left_out(self):
+        # like anonymized/all-week5/tss.json: a copy of a message of a later day
+        with open(os.path.join(self.root, 'general', 'tss.json'), 'w') as f:
+            json.dump([{'type': 'message', 'user': 'U1', 'text': 'b', 'ts': '1661158700.000200'}], f)
+        self.assertEqual(list_day_files(os.path.join(self.root, 'general')),
+                         ['2022-08-21.json', '2022-08-22.json'])
+        ts = [msg['ts'] for msg in SlackDataLoader(self.root).get_channel_messages('general')]
+        self.assertEqual(ts, sorted(set(ts), key=float))
+        self.assertEqual(len(ts), 4)
+
+    def test_messages_in_timestamp_order(self):
+        texts = [msg['text'] for msg in self.loader.get_channel_messages('general')]
+        self.assertEqual(texts, ['joined', 'bot', 'b', 'c'])
+
+    def test_filters(self):
+        messages = self.loader.get_channel_messages('general', exclude_subtypes=True, exclude_bots=True)
+        self.assertEqual([msg['text'] for msg in messages], ['b', 'c'])
+
+        messages = self.loader.get_channel_messages('general', exclude_subtypes=['channel_join'])
+        self.assertEqual([msg['text'] for msg in messages], ['bot', 'b', 'c'])
+
+    def test_chunks(self):
+        chunks = list(self.loader.get_channel_messages('general', chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 1])
+
+    def test_date_range(self):
+        messages = self.loader.get_channel_messages('general', start='2022-08-22')
+        self.assertEqual([msg['text'] for msg in messages], ['b', 'c'])
+        messages = self.loader.get_channel_messages('general', end=date(2022, 8, 21))
+        self.assertEqual([msg['text'] for msg in messages], ['joined', 'bot'])
+        self.assertEqual(self.loader.get_channel_days('general', '2022-08-23', '2022-08-30'), [])
+
+        # files not named after a day are in no range
+        with open(os.path.join(self.root, 'general', 'tss.json'), 'w') as f:
+            json.dump([{'type': 'message', 'text': 'stray', 'ts': '1661072000.000100'}], f)
+        loader = SlackDataLoader(self.root)
+        self.assertEqual(loader.get_channel_days('general', start='2022-08-22'), ['2022-08-22.json'])
+        self.assertEqual(loader.get_channel_days('general', end='2022-08-21'), ['2022-08-21.json'])
+        self.assertEqual(len(loader.get_channel_days('general')), 2)
+
+        # files outside the range are never opened
+        with open(os.path.join(self.root, 'general', '2022-08-21.json'), 'w') as f:
+            f.write('not json')
+        self.assertEqual(len(slack_parser(f"{self.root}/general/", start='2022-08-22')), 2)
+
+
+class TypedSlackParserTestCase(unittest.TestCase):
+    def test_typed_columns(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_export(root, {'2022-08-21': [
+            {'type': 'message', 'user': 'U1', 'text': 'a', 'ts': '1661072000.000100',
+             'thread_ts': '1661072000.000100', 'reply_count': 1, 'reply_users_count': 1,
+             'reply_users': ['U2'], 'latest_reply': '1661072100.000200', 'user_profile': {'real_name': 'Ann A'}},
+            {'type': 'message', 'user': 'U1', 'text': 'b', 'ts': '1661072200.000300',
+             'user_profile': {'real_name': 'Ann A'}},
+        ]})
+
+        df = slack_parser(f"{root}/general/", typed=True)
+        for column in ['msg_type', 'sender_name', 'msg_dist_type', 'channel']:
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(df['msg_sent_time'][0], pd.Timestamp('2022-08-21 08:53:20.000100', tz='UTC'))
+        self.assertTrue(pd.isna(df['time_thread_start'][1]))
+        self.assertTrue(pd.isna(df['tm_thread_end'][1]))
+        self.assertEqual(df['reply_users'][0], ['U2'])
+        self.assertTrue(pd.isna(df['reply_users'][1]))
+
+
+class ParallelSlackParserTestCase(unittest.TestCase):
+    def test_matches_serial_parser(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        write_export(root, {'2022-08-21': [{'type': 'message', 'user': 'U1', 'text': 'a',
+                                            'ts': '1661072000.000100', 'user_profile': {'real_name': 'Ann A'}}]})
+        shutil.copytree(os.path.join(root, 'general'), os.path.join(root, 'random'))
+
+        serial = pd.concat([slack_parser(f"{root}/{channel}/") for channel in ['general', 'random']],
+                           ignore_index=True)
+        parallel = parallel_slack_parser(root, ['general', 'random'], workers=2)
+        pd.testing.assert_frame_equal(serial, parallel)
+
+
+class ZipExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        export = os.path.join(self.root, 'anonymized')
+        os.makedirs(export)
+        write_export(export, {'2022-08-21': [
+            {'type': 'message', 'user': 'U1', 'text': 'a', 'ts': '1661072000.000100',
+             'user_profile': {'real_name': 'Ann A'},
+             'reactions': [{'name': 'tada', 'count': 1, 'users': ['U1']}]}]})
+
+        # slack exports are often zipped with a top level folder
+        self.zip_path = os.path.join(self.root, 'export.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as zf:
+            for dirpath, _, filenames in os.walk(export):
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    zf.write(full_path, os.path.relpath(full_path, self.root))
+        self.export = export
+
+    def test_loader_reads_zip(self):
+        loader = SlackDataLoader(self.zip_path)
+        self.assertEqual(loader.users[0]['id'], 'U1')
+        self.assertEqual([msg['text'] for msg in loader.get_channel_messages('general')], ['a'])
+
+    def test_parsers_read_zip(self):
+        pd.testing.assert_frame_equal(slack_parser(f"{self.zip_path}/general/"),
+                                      slack_parser(f"{self.export}/general/"))
+        pd.testing.assert_frame_equal(parse_slack_reaction(f"{self.zip_path}/general/", 'general'),
+                                      parse_slack_reaction(f"{self.export}/general/", 'general'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+import pandas as pd
+
+from src.markup import Token, tokenize, tokenize_column, markup_frame
+from src.utils import get_tagged_users
+
+
+TEXT = "Hi <@u03t89acuuw|ann>, see <https://example.com/a?b=1|docs> :tada: `pip install` in <#C1|general> <!here>"
+
+
+class MarkupTestCase(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize(TEXT), [
+            Token('word', 'Hi'), Token('mention', 'U03T89ACUUW'), Token('word', 'see'),
+            Token('link', 'https://example.com/a?b=1'), Token('emoji', 'tada'),
+            Token('code', '`pip install`'), Token('word', 'in'), Token('channel', 'C1'),
+        ])
+        self.assertEqual(tokenize('at 10:30:45'), [Token('word', value) for value in ['at', '10', '30', '45']])
+
+    def test_column_operations(self):
+        texts = pd.Series([TEXT, None, 'plain words'], index=[7, 8, 9])
+        tokens = tokenize_column(texts)
+        self.assertEqual(tokens.loc[9, 'value'].tolist(), ['plain', 'words'])
+        self.assertNotIn(8, tokens.index)
+
+        frame = markup_frame(texts)
+        self.assertEqual(frame.loc[7, 'mentions'], ['U03T89ACUUW'])
+        self.assertEqual(frame.loc[7, 'emojis'], ['tada'])
+        self.assertEqual(frame.loc[7, 'clean_text'], 'hi see in')
+        self.assertEqual(frame.loc[8, 'links'], [])
+
+    def test_tagged_users(self):
+        df = pd.DataFrame({'msg_content': [TEXT, 'no one']})
+        self.assertEqual(get_tagged_users(df).tolist(), [['@U03T89ACUUW'], []])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from src.sketches import SpaceSaving, heavy_hitters
+from tests.helpers import message, write_export
+
+
+class SpaceSavingTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.stream = [int(rng.paretovariate(1.1)) for _ in range(20000)]
+        self.counts = Counter(self.stream)
+
+    def check_bounds(self, summary):
+        self.assertEqual(summary.total, len(self.stream))
+        self.assertLessEqual(len(summary), summary.capacity)
+        for item, count, error in summary.top():
+            self.assertGreaterEqual(count, self.counts[item])
+            self.assertLessEqual(count - error, self.counts[item])
+            self.assertLessEqual(error, summary.total / summary.capacity)
+        for item, count in self.counts.items():
+            if count > summary.total / summary.capacity:
+                self.assertIn(item, summary)
+
+    def test_bounds(self):
+        summary = SpaceSaving(20).update(self.stream)
+        self.check_bounds(summary)
+        self.assertEqual(list(summary.value_counts(3).index), [item for item, _ in self.counts.most_common(3)])
+
+    def test_merge(self):
+        parts = [SpaceSaving(20).update(self.stream[i::3]) for i in range(3)]
+        self.check_bounds(parts[0] | parts[1] | parts[2])
+
+    def test_exact_below_capacity(self):
+        summary = SpaceSaving(10).update({'a': 3, 'b': 1})
+        summary.add('a')
+        self.assertEqual(summary.value_counts().to_dict(), {'a': 4, 'b': 1})
+        self.assertEqual(summary.frame()['lower_bound'].tolist(), [4, 1])
+        self.assertEqual(summary.min_count(), 0)
+
+
+class HeavyHittersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_export(self.root, {
+            '2022-08-21': [message(':tada: see <https://docs.python.org/3/|docs>', '1661072000.000100',
+                                   reactions=[{'name': 'tada', 'count': 2, 'users': ['U1', 'U2']}]),
+                           {'type': 'message', 'bot_id': 'B1', 'text': ':robot_face:', 'ts': '1661072100.000100'}],
+        })
+
+    def test_items(self):
+        self.assertEqual(heavy_hitters(self.root, 'senders').value_counts().to_dict(), {'Ann A': 1})
+        self.assertEqual(heavy_hitters(self.root, 'reactions').value_counts().to_dict(), {'tada': 2})
+        self.assertEqual(heavy_hitters(self.root, 'emojis').value_counts().to_dict(), {'tada': 1, 'robot_face': 1})
+        self.assertEqual(heavy_hitters(self.root, 'domains', workers=2).value_counts().to_dict(),
+                         {'docs.python.org': 1})
+        with self.assertRaises(ValueError):
+            heavy_hitters(self.root, 'words')
+
+
+if __name__ == '__main__':
+    unittest.main()
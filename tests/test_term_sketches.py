@@ -0,0 +1,52 @@
+import unittest
+
+from src.sketches import CountMinSketch
+from src.term_sketches import TermSketches
+from tests.helpers import ExportTestCase, message, write_day
+
+
+class CountMinSketchTestCase(unittest.TestCase):
+    def test_estimates_and_merge(self):
+        first = CountMinSketch(64, 4).update(['a'] * 50 + [str(i) for i in range(200)])
+        second = CountMinSketch(64, 4).update({'a': 10, 'b': 5})
+        merged = first | second
+        self.assertEqual(merged.total, 265)
+        self.assertGreaterEqual(merged['a'], 60)
+        self.assertLessEqual(merged['a'], 60 + merged.error_bound())
+        self.assertGreaterEqual(merged['b'], 5)
+        self.assertEqual(CountMinSketch(64, 4, first.to_bytes())['a'], first['a'])
+        with self.assertRaises(ValueError):
+            first.merge(CountMinSketch(32, 4))
+
+
+class TermSketchesTestCase(ExportTestCase):
+    DAYS = {
+        '2022-08-21': [message('The model works :tada: <https://github.com/a/b>', '1661072000.000100'),
+                       message('the MODEL :tada: :joy:', '1661072100.000100', user='U2'),
+                       message('joined', '1661072200.000100', user='U3', subtype='channel_join')],
+        '2022-08-22': [message('model <https://www.youtube.com/watch?v=1|video>', '1661158700.000200')],
+    }
+
+    def test_top(self):
+        sketches = TermSketches.refresh(self.export, self.folder)
+        self.assertEqual(sketches.top('words', 2).to_dict(), {'model': 3, 'the': 2})
+        self.assertEqual(sketches.top('emojis').to_dict(), {'tada': 2, 'joy': 1})
+        self.assertEqual(sketches.top('domains', start='2022-08-22').to_dict(), {'www.youtube.com': 1})
+        self.assertNotIn('joined', sketches.top('words', None))
+        self.assertEqual(list(sketches.frequencies('words', exclude={'the', 'model'})), ['works'])
+        with self.assertRaises(ValueError):
+            sketches.top('senders')
+
+    def test_incremental_update(self):
+        TermSketches.refresh(self.export, self.folder)
+        write_day(self.export, '2022-08-22', [message('data :joy:', '1661158700.000200')])
+
+        sketches = TermSketches(self.folder)
+        self.assertEqual(sketches.update(self.export), [('general', '2022-08-22')])
+        self.assertEqual(sketches.top('words', 1).to_dict(), {'the': 2})
+        self.assertEqual(sketches.top('emojis').to_dict(), {'tada': 2, 'joy': 2})
+        self.assertEqual(list(sketches.top('domains').index), ['github.com'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from src.text import TextNormalizer, normalize_texts
+
+
+class TextNormalizerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.normalizer = TextNormalizer(stop_words={'the', 'is'}, lemmatize=False)
+
+    def test_tokens(self):
+        text = "<@U03T89ACUUW> The running jobs is at <https://example.com/x?y=1> since 2022!"
+        self.assertEqual(self.normalizer.tokens(text), ['run', 'job', 'at', 'sinc'])
+        self.assertEqual(self.normalizer.normalize(text), 'run job at sinc')
+        self.assertEqual(self.normalizer.tokens(None), [])
+
+    def test_markup_left_out(self):
+        text = "jobs :tada: in <#C1|general> `running code` ```more code```"
+        self.assertEqual(self.normalizer.tokens(text), ['job', 'in'])
+
+    def test_memoized_per_token(self):
+        self.normalizer.tokens('running running')
+        self.assertEqual(self.normalizer._memo, {'running': 'run'})
+
+    def test_batch_over_workers(self):
+        texts = ['the jobs are running', 'Is it?', ''] * 5
+        serial = normalize_texts(texts, normalizer=self.normalizer)
+        self.assertEqual(serial[1][:3], ['job are run', 'it', ''])
+        self.assertEqual(normalize_texts(texts, workers=2, normalizer=self.normalizer, chunksize=4), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import unittest
+
+from src.threads import ThreadIndex
+from tests.helpers import message, write_export
+
+
+class ThreadIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_export(self.root, {
+            '2022-08-21': [
+                message('question', '1661072000.000100', thread_ts='1661072000.000100', reply_count=3),
+                message('later', '1661072300.000100', user='U3', thread_ts='1661072000.000100',
+                        parent_user_id='U1'),
+                message('answer', '1661072100.000100', user='U2', thread_ts='1661072000.000100',
+                        parent_user_id='U1'),
+                message('plain', '1661072150.000100'),
+            ],
+            '2022-08-22': [
+                message('again', '1661158700.000200', user='U2', thread_ts='1661072000.000100',
+                        parent_user_id='U1'),
+                # a reply whose parent was posted before the export starts
+                message('orphan', '1661158800.000200', thread_ts='1661000000.000100', parent_user_id='U9'),
+            ],
+        })
+        self.index = ThreadIndex.from_export(self.root)
+
+    def test_threads(self):
+        index = self.index
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.keys, ['channel', 'thread_ts'])
+        self.assertEqual(list(index.threads['n_replies']), [1, 3])
+        self.assertEqual(list(index.threads['n_repliers']), [1, 2])
+        self.assertEqual(list(index.threads['parent_user']), ['U9', 'U1'])
+
+        number = index.locate('1661072000.000100', 'general')
+        self.assertIn(('general', '1661072000.000100'), index)
+        self.assertEqual(index.messages['text'][index.parent_row(number)], 'question')
+        self.assertEqual(list(index.replies(number)['text']), ['answer', 'later', 'again'])
+        self.assertEqual(index.participants(number), ['U1', 'U2', 'U3'])
+        self.assertEqual(index.timings(number), (1661072000.0001, 1661072100.0001, 1661158700.0002))
+
+        orphan = index.locate('1661000000.000100', 'general')
+        self.assertEqual(index.parent_row(orphan), -1)
+        self.assertEqual(list(index.thread[:4]), [number, number, number, -1])
+
+    def test_reply_counts_and_edges(self):
+        self.assertEqual(self.index.reply_counts().to_dict(), {'U2': 2, 'U3': 1, 'U1': 1})
+        edges = self.index.reply_edges()
+        self.assertEqual(edges.iloc[0].to_dict(), {'user': 'U2', 'parent_user': 'U1', 'replies': 2})
+        self.assertEqual(edges['replies'].sum(), 4)
+
+    def test_single_channel_table(self):
+        index = ThreadIndex(self.index.messages.drop(columns='channel'))
+        self.assertEqual(index.keys, ['thread_ts'])
+        self.assertEqual(len(index.reply_rows(index.locate('1661072000.000100'))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.cache import compile_export
+from src.timegaps import message_times, time_gaps, gap_histogram, gap_histograms, to_micros
+from tests.helpers import message, write_export
+
+
+class TimeGapsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_export(self.root, {
+            '2022-08-21': [message('a', '1661072000.000100'),
+                           message('joined', '1661072001.000000', subtype='channel_join'),
+                           message('b', '1661079200.000100', user='U2')],
+            '2022-08-22': [message('c', '1661072600.000100'), message('d', '1661158700.000200')],
+        })
+
+    def test_message_times(self):
+        times = message_times(self.root)
+        self.assertEqual(list(times['ts']), [1661072000000100, 1661079200000100, 1661072600000100, 1661158700000200])
+        self.assertEqual(list(times['user']), ['U1', 'U2', 'U1', 'U1'])
+        self.assertEqual(len(message_times(self.root, subtypes=True)), 5)
+
+        cache = f'{self.root}/cache'
+        compile_export(self.root, cache)
+        cached = message_times(self.root, cache_dir=cache, start='2022-08-22')
+        self.assertEqual(list(cached['ts']), [1661072600000100, 1661158700000200])
+
+    def test_time_gaps(self):
+        ts = to_micros(['100.5', '0.5', '3600.5', None])[:3]
+        gaps, groups = time_gaps(ts, unit='s')
+        self.assertEqual(list(gaps), [100.0, 3500.0])
+        self.assertIsNone(groups)
+
+        gaps, groups = time_gaps([30, 10, 20, 5], ['b', 'a', 'a', 'b'], unit='s')
+        self.assertEqual(list(gaps * 1e6), [10.0, 25.0])
+        self.assertEqual(list(groups), ['a', 'b'])
+
+    def test_histograms(self):
+        counts, edges = gap_histogram([0, 1, 10, 100], bins=2, log=True)
+        self.assertEqual(list(edges), [1, 10, 100])
+        self.assertEqual(list(counts), [2, 2])
+        counts, edges = gap_histogram([0.5, 1.5], bins=[0, 1, 2])
+        self.assertEqual(list(counts), [1, 1])
+
+        # gaps outside explicit edges are left out, as np.histogram does
+        gaps = [-1, 0, 0.5, 2, 3, 250]
+        counts, _ = gap_histogram(gaps, bins=[0, 1, 2])
+        self.assertEqual(list(counts), list(np.histogram(gaps, bins=[0, 1, 2])[0]))
+        self.assertEqual(list(counts), [2, 1])
+        self.assertEqual(list(gap_histogram(gaps, bins=[1, 10, 100], log=True)[0]), [3, 0])
+
+        by_user = gap_histograms(message_times(self.root), 'user', bins=[0, 1, 100], unit='h')
+        self.assertEqual(by_user.loc['U1'].tolist(), [1, 1])
+        self.assertEqual(by_user.loc['U2'].tolist(), [0, 0])
+        np.testing.assert_array_equal(by_user.columns, [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
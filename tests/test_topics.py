@@ -0,0 +1,100 @@
+import os
+import unittest
+
+import pandas as pd
+
+from src.text import TextNormalizer
+from gensim.models import LdaModel, LdaMulticore
+
+from src.topics import (refresh_topics, load_model, sweep_topics, best_topic_counts, train_lda,
+                        topic_trends, TRENDS_FILE)
+from tests.helpers import ExportTestCase, message, write_day
+
+
+class TopicsTestCase(ExportTestCase):
+    DAYS = {
+        '2022-08-21': [message('python pandas dataframe', '1661072000.000100'),
+                       message('joined', '1661072050.000100', subtype='channel_join')],
+        '2022-08-22': [message('docker container image', '1661158700.000200'),
+                       message('the', '1661158800.000200')],
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.normalizer = TextNormalizer(stop_words={'the'}, lemmatize=False)
+
+    def refresh(self, **params):
+        return refresh_topics(self.export, self.folder, normalizer=self.normalizer,
+                              num_topics=2, passes=1, **params)
+
+    def test_incremental_refresh(self):
+        model, corpus, written = self.refresh()
+        self.assertEqual(written, [('general', '2022-08-21'), ('general', '2022-08-22')])
+        self.assertEqual(list(corpus.documents()['ts']),
+                         ['1661072000.000100', '1661158700.000200', '1661158800.000200'])
+        self.assertEqual(list(corpus)[2], [])
+        word_ids = dict(corpus.dictionary.token2id)
+
+        write_day(self.export, '2022-08-23', [message('python docker kubernetes', '1661245100.000100')])
+        updates = load_model(self.folder).num_updates
+
+        model, corpus, written = self.refresh()
+        self.assertEqual(written, [('general', '2022-08-23')])
+        self.assertEqual(len(corpus), 4)
+        # existing word ids are stable, new words are appended
+        self.assertEqual({word: corpus.dictionary.token2id[word] for word in word_ids}, word_ids)
+        self.assertIn('kubernet', corpus.dictionary.token2id)
+        self.assertEqual(model.num_updates, updates + 1)
+        self.assertEqual(self.refresh()[2], [])
+
+    def test_multicore_training(self):
+        self.assertIsInstance(self.refresh()[0], LdaMulticore)
+        model, corpus, _ = self.refresh(retrain=True, train_workers=2)
+        self.assertIsInstance(model, LdaMulticore)
+        self.assertIsInstance(load_model(self.folder), LdaMulticore)
+        self.assertIsInstance(self.refresh(retrain=True, train_workers=1)[0], LdaModel)
+        self.assertNotIsInstance(load_model(self.folder), LdaMulticore)
+
+    def test_topic_trends(self):
+        self.refresh()
+        daily = topic_trends(self.folder)
+        self.assertEqual(list(daily['channel']), ['general', 'general'])
+        # the empty document of 2022-08-22 is left out
+        self.assertEqual(list(daily['n_docs']), [1, 1])
+        for total in daily[['topic_0', 'topic_1']].sum(axis=1):
+            self.assertAlmostEqual(total, 1.0)
+        stored = pd.read_parquet(os.path.join(self.folder, TRENDS_FILE))
+
+        write_day(self.export, '2022-08-23', [message('python docker kubernetes', '1661245100.000100')])
+        self.refresh()
+
+        daily = topic_trends(self.folder)
+        self.assertEqual(len(daily), 3)
+        # the days already inferred are kept as they were
+        updated = pd.read_parquet(os.path.join(self.folder, TRENDS_FILE))
+        pd.testing.assert_frame_equal(updated.iloc[:2], stored)
+        weekly = topic_trends(self.folder, freq='week', by_channel=False)
+        # 2022-08-21 is a Sunday, the other two days start the next week
+        self.assertEqual([str(day.date()) for day in weekly['period']], ['2022-08-15', '2022-08-22'])
+        self.assertEqual(list(weekly['n_docs']), [1, 2])
+        self.assertTrue(topic_trends(self.folder, channels=['random']).empty)
+
+    def test_sweep(self):
+        model, corpus, _ = self.refresh()
+        # single-core models, so the serial and the parallel sweep train the same ones
+        sweep = dict(by='channel', measure='u_mass', min_docs=1, passes=1, train_workers=1)
+        results = sweep_topics(self.folder, [2, 3], workers=1, **sweep)
+        self.assertEqual(list(results['group']), ['general', 'general'])
+        self.assertEqual(list(results['num_topics']), [2, 3])
+        self.assertEqual(list(results['n_docs']), [2, 2])
+
+        parallel = sweep_topics(self.folder, [2, 3], workers=2, **sweep)
+        self.assertEqual(list(parallel['coherence']), list(results['coherence']))
+        self.assertEqual(len(best_topic_counts(results)), 1)
+        self.assertTrue(sweep_topics(self.folder, [2], min_docs=5).empty)
+
+        self.assertIsInstance(train_lda(list(corpus), corpus.dictionary, workers=2, num_topics=2), LdaMulticore)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.loader import SlackDataLoader
+from tests.helpers import write_export
+
+
+class UserDirectoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        write_export(self.root, {})
+        with open(os.path.join(self.root, 'users_old_new.json'), 'w') as f:
+            json.dump({'annie': {'id': 'U1', 'name': 'ann'}}, f)
+        self.loader = SlackDataLoader(self.root)
+
+    def test_lookups(self):
+        directory = self.loader.user_directory
+        self.assertIs(directory, self.loader.user_directory)
+        self.assertEqual(directory['U1'].real_name, 'Ann A')
+        for key in ('U1', 'ann', 'annie', 'Ann A'):
+            self.assertEqual(directory.resolve(key).id, 'U1')
+        self.assertIsNone(directory.resolve('bob'))
+        with self.assertRaises(TypeError):
+            directory.ids_by_name['bob'] = 'U2'
+
+    def test_user_map(self):
+        names_by_id, ids_by_name = self.loader.get_user_map()
+        self.assertEqual(dict(names_by_id), {'U1': 'ann'})
+        self.assertEqual(dict(ids_by_name), {'ann': 'U1'})
+
+    def test_vectorized_map(self):
+        names = self.loader.user_directory.map(pd.Series(['U1', 'U9', 'U1'], index=[3, 4, 5]))
+        self.assertEqual(list(names.index), [3, 4, 5])
+        self.assertEqual(names.tolist()[::2], ['Ann A', 'Ann A'])
+        self.assertTrue(pd.isna(names[4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
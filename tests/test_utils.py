@@ -0,0 +1,49 @@
+import unittest
+
+import pandas as pd
+
+from src.utils import convert_2_timestamp, map_userid_2_realname
+
+
+class ConvertTimestampTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({'msg_sent_time': ['1661072000.000100', '1661158800.999999'],
+                                'tm_thread_end': ['1661072100.000200', 0]})
+
+    def test_single_column(self):
+        converted = convert_2_timestamp('msg_sent_time', self.df)
+        self.assertEqual(str(converted.dtype), 'datetime64[ns, UTC]')
+        self.assertEqual(list(converted), [pd.Timestamp('2022-08-21 08:53:20.000100', tz='UTC'),
+                                           pd.Timestamp('2022-08-22 09:00:00.999999', tz='UTC')])
+
+    def test_several_columns(self):
+        converted = convert_2_timestamp(['msg_sent_time', 'tm_thread_end'], self.df, tz='Africa/Nairobi')
+        self.assertEqual(list(converted.columns), ['msg_sent_time', 'tm_thread_end'])
+        self.assertEqual(converted['tm_thread_end'][0].hour, 11)
+        self.assertTrue(pd.isna(converted['tm_thread_end'][1]))
+
+    def test_missing_column(self):
+        self.assertIsNone(convert_2_timestamp('time_thread_start', self.df))
+
+
+class MapUserIdTestCase(unittest.TestCase):
+    def setUp(self):
+        self.users = [{'id': 'U1', 'name': 'ann', 'profile': {'real_name': 'Ann A'}},
+                      {'id': 'U2', 'name': 'bob', 'profile': {'real_name': 'Bob B'}}]
+
+    def test_counts(self):
+        for users in (self.users, pd.DataFrame(self.users)):
+            df = map_userid_2_realname(users, {'U1': 2, 'U2': 5, 'U9': 7})
+            self.assertEqual(df.values.tolist(), [['Bob B', 5], ['Ann A', 2]])
+            self.assertEqual(list(df.columns), ['LearnerName', '# of Msg sent in Threads'])
+
+    def test_dataframe(self):
+        df = pd.DataFrame({'user': ['U2', 'U9'], 'text': ['hi', 'yo']}, index=[4, 7])
+        mapped = map_userid_2_realname(self.users, df)
+        self.assertEqual(list(mapped.index), [4, 7])
+        self.assertEqual(mapped['real_name'][4], 'Bob B')
+        self.assertTrue(pd.isna(mapped['real_name'][7]))
+
+
+if __name__ == '__main__':
+    unittest.main()
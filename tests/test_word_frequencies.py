@@ -0,0 +1,46 @@
+import unittest
+
+from src.active_users import week_folder
+from src.text import TextNormalizer
+from src.word_frequencies import WordFrequencies, word_counts, week_start, _Unstemmed
+from tests.helpers import ExportTestCase, message, write_day
+
+
+NORMALIZER = TextNormalizer(stop_words={'the', 'a'}, stemmer=_Unstemmed(), lemmatize=False)
+
+
+class WordFrequenciesTestCase(ExportTestCase):
+    # 2022-08-21 is a Sunday, 2022-08-22 a Monday
+    DAYS = {
+        '2022-08-21': [message('The models, the DATA!', '1661072000.000100'),
+                       message('joined', '1661072200.000100', user='U3', subtype='channel_join')],
+        '2022-08-22': [message('models <https://example.com> 42', '1661158700.000200')],
+    }
+
+    def test_word_counts(self):
+        self.assertEqual(word_counts(['The models', 'a model'], NORMALIZER), {'models': 1, 'model': 1})
+        self.assertEqual(week_start('2022-08-21'), '2022-08-15')
+        self.assertIsNone(week_start('tss'))
+
+    def test_frequencies(self):
+        frequencies = WordFrequencies.refresh(self.export, self.folder, normalizer=NORMALIZER)
+        self.assertEqual(list(frequencies.table['week'].unique()), ['2022-08-15', '2022-08-22'])
+        self.assertEqual(frequencies.frequencies(), {'models': 2, 'data': 1})
+        self.assertEqual(frequencies.frequencies(start='2022-08-22'), {'models': 1})
+        self.assertEqual(frequencies.frequencies(n=1), {'models': 2})
+        self.assertEqual(frequencies.clouds(), {'general': {'models': 2, 'data': 1}})
+        self.assertEqual(frequencies.clouds('workspace', n=1), {'workspace': {'models': 2}})
+        self.assertEqual(frequencies.clouds(week_folder), {})
+
+    def test_incremental_update(self):
+        WordFrequencies.refresh(self.export, self.folder, normalizer=NORMALIZER)
+        write_day(self.export, '2022-08-23', [message('data data', '1661245100.000100')])
+
+        frequencies = WordFrequencies(self.folder, NORMALIZER)
+        self.assertEqual(frequencies.update(self.export), [('general', '2022-08-22')])
+        self.assertEqual(frequencies.frequencies(start='2022-08-22'), {'data': 2, 'models': 1})
+        self.assertEqual(frequencies.frequencies(), {'data': 3, 'models': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()